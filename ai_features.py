@@ -0,0 +1,151 @@
+"""
+Схема признаков ИИ и предвыделенная матрица признаков (серии x признаки)
+Порядок признаков совпадает с индексами, которые использует AIPredictor
+"""
+
+import logging
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+FEATURE_DTYPE = np.float64
+
+# Источники значений признака
+SOURCE_CANDLE = 'candle'        # последняя свеча серии
+SOURCE_INDICATOR = 'indicator'  # словарь индикаторов (0 при отсутствии)
+
+# Схема: имя, источник, нормализация в AIPredictor
+#   unit         - 1.0 при положительной цене закрытия
+#   price_ratio  - отношение к цене закрытия
+#   volume_price - объем / (цена закрытия * 1000)
+#   tanh_x100    - tanh(x * 100)
+#   percent      - x / 100
+#   tanh         - tanh(x)
+#   clip01       - ограничение отрезком [0, 1]
+#   ratio5       - min(x / 5, 1)
+FEATURE_SCHEMA = [
+    ('close', SOURCE_CANDLE, 'unit'),
+    ('high', SOURCE_CANDLE, 'price_ratio'),
+    ('low', SOURCE_CANDLE, 'price_ratio'),
+    ('volume', SOURCE_CANDLE, 'volume_price'),
+    ('price_change', SOURCE_CANDLE, 'tanh_x100'),
+    ('rsi', SOURCE_INDICATOR, 'percent'),
+    ('macd', SOURCE_INDICATOR, 'tanh'),
+    ('macd_histogram', SOURCE_INDICATOR, 'tanh'),
+    ('bb_position', SOURCE_INDICATOR, 'clip01'),
+    ('volume_ratio', SOURCE_INDICATOR, 'ratio5'),
+    ('vwap_gradient', SOURCE_INDICATOR, 'tanh_x100'),
+    ('quantum_rsi', SOURCE_INDICATOR, 'tanh'),
+    ('neural_macd', SOURCE_INDICATOR, 'tanh'),
+    ('volume_tsunami', SOURCE_INDICATOR, 'tanh'),
+    ('stoch_k', SOURCE_INDICATOR, 'tanh'),
+    ('williams_r', SOURCE_INDICATOR, 'tanh'),
+    ('cci', SOURCE_INDICATOR, 'tanh'),
+    ('adx', SOURCE_INDICATOR, 'tanh'),
+    ('atr', SOURCE_INDICATOR, 'tanh')
+]
+
+FEATURE_NAMES = [name for name, _, _ in FEATURE_SCHEMA]
+FEATURE_INDEX = {name: i for i, name in enumerate(FEATURE_NAMES)}
+FEATURE_COUNT = len(FEATURE_SCHEMA)
+
+# Признаки из словаря индикаторов: (позиция, имя)
+INDICATOR_FEATURES = [
+    (i, name) for i, (name, source, _) in enumerate(FEATURE_SCHEMA) if source == SOURCE_INDICATOR
+]
+
+
+def write_features(out: np.ndarray, data: pd.DataFrame, indicators: Dict[str, Any]) -> np.ndarray:
+    """Запись признаков серии в строку out (FEATURE_COUNT значений)"""
+    try:
+        closes = data['close'].to_numpy()
+
+        out[0] = closes[-1]
+        out[1] = data['high'].iat[-1]
+        out[2] = data['low'].iat[-1]
+        out[3] = data['volume'].iat[-1]
+        # То же, что data['close'].pct_change().iloc[-1]
+        out[4] = closes[-1] / closes[-2] - 1 if len(closes) > 1 else np.nan
+
+        for i, name in INDICATOR_FEATURES:
+            out[i] = indicators.get(name, 0)
+
+    except Exception as e:
+        logger.error(f"Ошибка подготовки признаков: {e}")
+        out[:] = 0.0
+
+    return out
+
+
+def features_from_signal(signal_data: Dict[str, Any]) -> np.ndarray:
+    """Признаки сохраненного сигнала
+
+    Если сигнал не содержит вектора признаков, он восстанавливается по индикаторам;
+    свеча сигнала не хранится, поэтому high/low принимаются равными цене, а объем и
+    изменение цены - нулевыми.
+    """
+    stored = signal_data.get('features')
+    if stored is not None and len(stored) == FEATURE_COUNT:
+        return np.asarray(stored, dtype=FEATURE_DTYPE)
+
+    out = np.zeros(FEATURE_COUNT, dtype=FEATURE_DTYPE)
+    price = signal_data.get('current_price') or 0.0
+    out[FEATURE_INDEX['close']] = price
+    out[FEATURE_INDEX['high']] = price
+    out[FEATURE_INDEX['low']] = price
+
+    indicators = signal_data.get('indicators') or {}
+    for i, name in INDICATOR_FEATURES:
+        value = indicators.get(name, 0)
+        out[i] = value if value is not None else np.nan
+
+    return out
+
+
+class FeatureMatrix:
+    """Предвыделенная матрица признаков серий текущего цикла"""
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        self.matrix = np.zeros((self.capacity, FEATURE_COUNT), dtype=FEATURE_DTYPE)
+        self.rows = {}  # (pair, timeframe) -> строка
+
+    def reset(self):
+        """Начало нового цикла: строки переиспользуются"""
+        self.rows = {}
+
+    def add(self, pair: str, timeframe: str, data: pd.DataFrame, indicators: Dict[str, Any]) -> int:
+        """Запись признаков серии; возвращает номер строки"""
+        key = (pair, timeframe)
+        row = self.rows.get(key)
+
+        if row is None:
+            row = len(self.rows)
+            if row >= self.capacity:
+                self._grow()
+            self.rows[key] = row
+
+        write_features(self.matrix[row], data, indicators)
+        return row
+
+    def _grow(self):
+        self.capacity *= 2
+        matrix = np.zeros((self.capacity, FEATURE_COUNT), dtype=FEATURE_DTYPE)
+        matrix[:len(self.rows)] = self.matrix[:len(self.rows)]
+        self.matrix = matrix
+
+    def get(self, pair: str, timeframe: str) -> Optional[np.ndarray]:
+        """Строка признаков серии (представление) или None, если в цикле ее нет"""
+        row = self.rows.get((pair, timeframe))
+        return None if row is None else self.matrix[row]
+
+    def take(self, keys: List[Tuple[str, str]]) -> np.ndarray:
+        """Подматрица признаков для серий в заданном порядке"""
+        return self.matrix[[self.rows[key] for key in keys]]
+
+    @property
+    def size(self) -> int:
+        return len(self.rows)
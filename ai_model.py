@@ -3,17 +3,317 @@
 Простая реализация без сложных нейронных сетей
 """
 
+import asyncio
 import numpy as np
 import pandas as pd
 import logging
-from typing import Dict, List, Any, Optional
+import time
+from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime, timedelta
 import json
+import os
+from collections import OrderedDict
 
-from globals import AI_MODEL_CONFIG, STRATEGY_CONFIG
+from globals import AI_MODEL_CONFIG, STRATEGY_CONFIG, PREDICTION_CACHE_CONFIG
+from ai_features import FEATURE_SCHEMA, FEATURE_COUNT, FEATURE_INDEX
+from model_store import HISTORY_DTYPE, save_model_file, load_model_file
+from prediction_history import PredictionHistory
+from prediction_cache import PredictionCache
 
 logger = logging.getLogger(__name__)
 
+# Признак модели -> колонка матрицы признаков (индексы скалярного _calculate_base_prediction)
+MODEL_FEATURE_COLUMNS = {
+    'rsi': FEATURE_INDEX['rsi'],
+    'macd': FEATURE_INDEX['macd'],
+    'volume_ratio': FEATURE_INDEX['volume_ratio'],
+    'bb_position': FEATURE_INDEX['bb_position'],
+    'vwap_gradient': FEATURE_INDEX['vwap_gradient'],
+    'price_momentum': FEATURE_INDEX['price_change'],
+    'volume_momentum': FEATURE_INDEX['volume'],
+    'volatility': FEATURE_INDEX['volume_tsunami']
+}
+
+
+def _py_min(values: np.ndarray, limit: float) -> np.ndarray:
+    """Поэлементный min(values, limit) с семантикой Python для NaN"""
+    return np.where(limit < values, limit, values)
+
+
+def _py_clip(values: np.ndarray, low: float, high: float) -> np.ndarray:
+    """Поэлементный max(low, min(high, values)) с семантикой Python для NaN"""
+    values = np.where(values < high, values, high)
+    return np.where(values > low, values, low)
+
+
+def _sigmoid(values: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-np.clip(values, -500.0, 500.0)))
+
+
+class LogisticModel:
+    """Логистическая регрессия на нормализованных признаках, обучение мини-пакетным SGD"""
+    
+    def __init__(self, n_features: int = FEATURE_COUNT, config: Dict[str, Any] = None):
+        self.config = config or AI_MODEL_CONFIG
+        self.weights = np.zeros(n_features)
+        self.bias = 0.0
+        
+        # Стандартизация признаков (оценивается при полном обучении)
+        self.mean = np.zeros(n_features)
+        self.scale = np.ones(n_features)
+        
+        self.samples_seen = 0
+        
+    def _standardize(self, features: np.ndarray) -> np.ndarray:
+        features = np.nan_to_num(features, nan=0.0, posinf=0.0, neginf=0.0)
+        return (features - self.mean) / self.scale
+        
+    def predict_proba(self, features: np.ndarray) -> np.ndarray:
+        """Вероятности для матрицы (N x F)
+        
+        Сумма по строке вместо матричного умножения: результат строки не зависит от размера пакета.
+        """
+        logits = (self._standardize(features) * self.weights).sum(axis=1) + self.bias
+        return _sigmoid(logits)
+        
+    def fit(self, features: np.ndarray, labels: np.ndarray, seed: int = 0) -> Dict[str, Any]:
+        """Полное обучение с нуля"""
+        features = np.nan_to_num(features, nan=0.0, posinf=0.0, neginf=0.0)
+        
+        self.mean = features.mean(axis=0)
+        scale = features.std(axis=0)
+        self.scale = np.where(scale > 1e-12, scale, 1.0)
+        self.weights = np.zeros(features.shape[1])
+        self.bias = 0.0
+        self.samples_seen = 0
+        
+        return self._sgd(self._standardize(features), labels, self.config['epochs'], seed)
+        
+    def partial_fit(self, features: np.ndarray, labels: np.ndarray, seed: int = 0) -> Dict[str, Any]:
+        """Онлайн-обновление одной эпохой по новым примерам"""
+        return self._sgd(self._standardize(features), labels, 1, seed)
+        
+    def _sgd(self, features: np.ndarray, labels: np.ndarray, epochs: int, seed: int) -> Dict[str, Any]:
+        started = time.perf_counter()
+        labels = np.asarray(labels, dtype=np.float64)
+        
+        learning_rate = self.config['learning_rate']
+        batch_size = max(1, self.config['batch_size'])
+        l2 = self.config['l2']
+        rng = np.random.default_rng(seed)
+        n = len(features)
+        
+        for _ in range(epochs):
+            order = rng.permutation(n)
+            
+            for start in range(0, n, batch_size):
+                batch = order[start:start + batch_size]
+                x = features[batch]
+                error = _sigmoid(x @ self.weights + self.bias) - labels[batch]
+                
+                self.weights -= learning_rate * (x.T @ error / len(batch) + l2 * self.weights)
+                self.bias -= learning_rate * error.mean()
+                
+        self.samples_seen += n * epochs
+        elapsed = time.perf_counter() - started
+        
+        return {
+            'samples': n,
+            'epochs': epochs,
+            'seconds': elapsed,
+            'samples_per_second': n * epochs / elapsed if elapsed > 0 else 0.0
+        }
+        
+    def evaluate(self, features: np.ndarray, labels: np.ndarray) -> Dict[str, float]:
+        """Логистическая функция потерь и точность"""
+        labels = np.asarray(labels, dtype=np.float64)
+        probabilities = np.clip(self.predict_proba(features), 1e-12, 1 - 1e-12)
+        
+        return {
+            'log_loss': float(-np.mean(labels * np.log(probabilities) + (1 - labels) * np.log(1 - probabilities))),
+            'accuracy': float(np.mean((probabilities >= 0.5) == (labels >= 0.5)))
+        }
+        
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'weights': self.weights.tolist(),
+            'bias': self.bias,
+            'mean': self.mean.tolist(),
+            'scale': self.scale.tolist(),
+            'samples_seen': self.samples_seen
+        }
+        
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'LogisticModel':
+        model = cls(len(data['weights']))
+        model.weights = np.asarray(data['weights'], dtype=np.float64)
+        model.bias = float(data['bias'])
+        model.mean = np.asarray(data['mean'], dtype=np.float64)
+        model.scale = np.asarray(data['scale'], dtype=np.float64)
+        model.samples_seen = data.get('samples_seen', 0)
+        return model
+        
+    def copy(self) -> 'LogisticModel':
+        model = LogisticModel(len(self.weights), self.config)
+        model.weights = self.weights.copy()
+        model.bias = self.bias
+        model.mean = self.mean.copy()
+        model.scale = self.scale.copy()
+        model.samples_seen = self.samples_seen
+        return model
+
+
+class ModelVersion:
+    """Опубликованная версия модели (не изменяется после публикации)"""
+    
+    __slots__ = ('version', 'model', 'source', 'published_at')
+    
+    def __init__(self, version: int, model: Optional[LogisticModel], source: str, published_at: Optional[datetime] = None):
+        self.version = version
+        self.model = model
+        self.source = source
+        self.published_at = published_at
+
+
+class ModelRegistry:
+    """Реестр версий обученной модели
+    
+    Публикация и откат заменяют одну ссылку current, поэтому читатели берут снимок
+    версии без блокировок и используют его целиком, даже если модель заменится.
+    """
+    
+    def __init__(self, max_versions: int = None):
+        self.max_versions = max_versions or AI_MODEL_CONFIG['max_model_versions']
+        
+        # Версия 0 - модель не обучена, используется базовое предсказание по весам
+        self.current = ModelVersion(0, None, 'initial')
+        self.versions = OrderedDict([(0, self.current)])
+        self.last_version = 0
+        
+        # Ранее активные версии для отката
+        self.active_history = []
+        
+    def publish(self, model: Optional[LogisticModel], source: str, version: Optional[int] = None) -> int:
+        """Публикация новой версии; возвращает ее номер"""
+        version = self.last_version + 1 if version is None else version
+        entry = ModelVersion(version, model, source, datetime.now())
+        
+        self.versions[version] = entry
+        self.last_version = max(self.last_version, version)
+        
+        self.active_history.append(self.current.version)
+        self.current = entry
+        
+        self._trim()
+        return version
+        
+    def _trim(self):
+        """Ограничение числа хранимых версий (активная версия не удаляется)"""
+        while len(self.versions) > self.max_versions:
+            oldest = next(iter(self.versions))
+            if oldest == self.current.version:
+                self.versions.move_to_end(oldest)
+                continue
+            del self.versions[oldest]
+            
+        self.active_history = [version for version in self.active_history if version in self.versions]
+        
+    def get(self, version: Optional[int] = None) -> Optional[ModelVersion]:
+        """Версия по номеру (None - активная)"""
+        if version is None:
+            return self.current
+        return self.versions.get(version)
+        
+    def rollback(self) -> Optional[int]:
+        """Возврат к предыдущей активной версии"""
+        if not self.active_history:
+            return None
+            
+        self.current = self.versions[self.active_history.pop()]
+        return self.current.version
+        
+    @property
+    def previous_version(self) -> Optional[int]:
+        return self.active_history[-1] if self.active_history else None
+        
+    def list_versions(self) -> List[Dict[str, Any]]:
+        """Хранимые версии"""
+        return [
+            {
+                'version': entry.version,
+                'source': entry.source,
+                'trained': entry.model is not None,
+                'published_at': entry.published_at.isoformat() if entry.published_at else None,
+                'active': entry is self.current
+            }
+            for entry in self.versions.values()
+        ]
+
+
+def normalize_features_batch(features: np.ndarray) -> np.ndarray:
+    """Нормализация матрицы признаков по схеме ai_features.FEATURE_SCHEMA"""
+    normalized = np.zeros_like(features)
+    close = features[:, FEATURE_INDEX['close']]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Ценовые признаки нормализуются только при положительной цене
+        price_valid = close > 0
+
+        for i, (name, _, normalization) in enumerate(FEATURE_SCHEMA):
+            values = features[:, i]
+
+            if normalization == 'unit':
+                column = np.ones_like(values)
+            elif normalization == 'price_ratio':
+                column = values / close
+            elif normalization == 'volume_price':
+                column = values / (close * 1000)
+            elif normalization == 'tanh_x100':
+                column = np.tanh(values * 100)
+            elif normalization == 'percent':
+                column = values / 100.0
+            elif normalization == 'clip01':
+                column = _py_clip(values, 0.0, 1.0)
+            elif normalization == 'ratio5':
+                column = _py_min(values / 5.0, 1.0)
+            else:
+                column = np.tanh(values)
+
+            if i < 5:
+                column = np.where(price_valid, column, 0.0)
+
+            normalized[:, i] = column
+
+    return normalized
+
+
+def train_model_snapshot(features: np.ndarray, labels: np.ndarray, config: Dict[str, Any], seed: int = 0) -> Dict[str, Any]:
+    """Обучение модели на снимке выборки (выполняется в отдельном процессе)
+    
+    Возвращает параметры модели, статистику обучения и индексы отложенной валидационной выборки.
+    """
+    started = time.perf_counter()
+    
+    normalized = normalize_features_batch(np.asarray(features, dtype=np.float64))
+    labels = np.asarray(labels, dtype=np.float64)
+    
+    order = np.random.default_rng(seed).permutation(len(labels))
+    n_validation = int(len(labels) * config['validation_fraction'])
+    validation_rows = order[:n_validation]
+    training_rows = order[n_validation:]
+    
+    model = LogisticModel(FEATURE_COUNT, config)
+    stats = model.fit(normalized[training_rows], labels[training_rows], seed)
+    stats['validation'] = model.evaluate(normalized[validation_rows], labels[validation_rows]) if n_validation else {}
+    stats['training_seconds'] = time.perf_counter() - started
+    
+    return {
+        'model': model.to_dict(),
+        'stats': stats,
+        'validation_rows': validation_rows
+    }
+
+
 class AIPredictor:
     def __init__(self):
         self.config = AI_MODEL_CONFIG
@@ -31,9 +331,42 @@ class AIPredictor:
             'volatility': 0.05
         }
         
-        # Исторические данные для обучения
+        # Версии обученной модели; модель, прошедшая валидацию, ждет замены между циклами
+        self.registry = ModelRegistry()
+        self.training_stats = {}
+        
+        # Кэш базового предсказания по квантованным признакам (None - отключен)
+        self.prediction_cache = PredictionCache() if PREDICTION_CACHE_CONFIG['enabled'] else None
+        self.pending_model = None
+        self.pending_stats = None
+        self.model_status = {
+            'last_training_seconds': 0.0,
+            'last_swap_ms': 0.0,
+            'last_validation': {},
+            'accepted': 0,
+            'rejected': 0,
+            'rollbacks': 0
+        }
+        
+        # Примеры с известным результатом для онлайн-обновления модели
+        self.online_features = []
+        self.online_labels = []
+        
+        # История результатов предсказаний: по ключу pair_timeframe и общая
         self.historical_data = {}
-        self.performance_history = []
+        self.performance_history = self._new_history(self.config['performance_history_size'])
+        
+    def _new_history(self, capacity: int) -> PredictionHistory:
+        return PredictionHistory(capacity, self.config['recent_accuracy_window'])
+        
+    @property
+    def trained_model(self) -> Optional[LogisticModel]:
+        """Активная обученная модель (None - базовое предсказание по весам)"""
+        return self.registry.current.model
+        
+    @property
+    def model_version(self) -> int:
+        return self.registry.current.version
         
     async def predict(self, features: np.ndarray, pair: str, timeframe: str) -> float:
         """Предсказание движения цены"""
@@ -42,7 +375,12 @@ class AIPredictor:
             normalized_features = self._normalize_features(features)
             
             # Базовое предсказание
-            base_prediction = self._calculate_base_prediction(normalized_features)
+            if self.prediction_cache is not None:
+                base_prediction = float(self._calculate_base_prediction_cached(
+                    normalized_features[np.newaxis, :], [(pair, timeframe)], self.registry.current
+                )[0])
+            else:
+                base_prediction = self._calculate_base_prediction(normalized_features)
             
             # Коррекция на основе исторических данных
             historical_correction = self._get_historical_correction(pair, timeframe)
@@ -73,6 +411,124 @@ class AIPredictor:
             logger.error(f"Ошибка AI предсказания: {e}")
             return 0.5  # Нейтральное значение при ошибке
             
+    def predict_batch(self, features: np.ndarray, keys: List[Tuple[str, str]], version: Optional[int] = None) -> np.ndarray:
+        """Предсказания для матрицы признаков (N x FEATURE_COUNT)
+        
+        keys - (pair, timeframe) строк, version - версия модели (None - активная).
+        Результат совпадает с predict для каждой строки.
+        """
+        try:
+            features = np.asarray(features, dtype=np.float64)
+            if features.ndim != 2 or features.shape[1] != FEATURE_COUNT:
+                raise ValueError(f"Ожидается матрица (N x {FEATURE_COUNT}), получено {features.shape}")
+                
+            # Весь пакет считается одной версией модели
+            entry = self.registry.get(version)
+            if entry is None:
+                raise ValueError(f"Версия модели {version} не найдена")
+                
+            normalized = normalize_features_batch(features)
+            
+            if self.prediction_cache is not None:
+                base_prediction = self._calculate_base_prediction_cached(normalized, keys, entry)
+            else:
+                base_prediction = self._calculate_base_prediction_batch(normalized, entry.model)
+            
+            # Коррекция по истории - одна на пару и таймфрейм
+            corrections = {}
+            historical_correction = np.empty(len(keys))
+            for row, (pair, timeframe) in enumerate(keys):
+                if (pair, timeframe) not in corrections:
+                    corrections[(pair, timeframe)] = self._get_historical_correction(pair, timeframe)
+                historical_correction[row] = corrections[(pair, timeframe)]
+                
+            time_correction = self._get_time_correction()
+            market_correction = self._get_market_correction_batch(normalized)
+            
+            final_prediction = (
+                base_prediction * 0.6 +
+                historical_correction * 0.2 +
+                time_correction * 0.1 +
+                market_correction * 0.1
+            )
+            
+            return _py_clip(final_prediction, 0.0, 1.0)
+            
+        except Exception as e:
+            logger.error(f"Ошибка пакетного AI предсказания: {e}")
+            return np.full(len(keys), 0.5)
+            
+    def _calculate_base_prediction_cached(self, features: np.ndarray, keys: List[Tuple[str, str]], entry: ModelVersion) -> np.ndarray:
+        """Базовое предсказание через кэш: модель считает только промахи и проверочные попадания"""
+        cache = self.prediction_cache
+        prediction = np.empty(len(features))
+        
+        cache_keys = [
+            cache.make_key(entry.version, pair, timeframe, features[row])
+            for row, (pair, timeframe) in enumerate(keys)
+        ]
+        miss_rows = []
+        verify_rows = []
+        
+        for row, key in enumerate(cache_keys):
+            value = cache.get(key)
+            if value is None:
+                miss_rows.append(row)
+            else:
+                prediction[row] = value
+                if cache.should_verify():
+                    verify_rows.append(row)
+                    
+        if miss_rows or verify_rows:
+            # Строки считаются независимо, поэтому подматрица дает те же значения, что и полный пакет
+            computed = self._calculate_base_prediction_batch(features[miss_rows + verify_rows], entry.model)
+            
+            for row, value in zip(miss_rows, computed):
+                prediction[row] = value
+                cache.put(cache_keys[row], float(value))
+                
+            for row, value in zip(verify_rows, computed[len(miss_rows):]):
+                cache.record_error(prediction[row], value)
+                
+        return prediction
+        
+    def _calculate_base_prediction_batch(self, features: np.ndarray, model: Optional[LogisticModel] = None) -> np.ndarray:
+        """Базовое предсказание для матрицы нормализованных признаков"""
+        if model is not None:
+            return _py_clip(model.predict_proba(features), 0.0, 1.0)
+            
+        # Сумма накапливается в том же порядке, что и в скалярном пути
+        prediction = np.zeros(len(features))
+        
+        for feature, weight in self.model_weights.items():
+            column = MODEL_FEATURE_COLUMNS.get(feature)
+            values = features[:, column] if column is not None else np.zeros(len(features))
+            prediction += self._feature_to_signal_batch(feature, values) * weight
+            
+        return _py_clip(prediction, 0.0, 1.0)
+        
+    def _feature_to_signal_batch(self, feature_name: str, values: np.ndarray) -> np.ndarray:
+        """Кусочное преобразование колонки признака в сигнал (как _feature_to_signal)"""
+        if feature_name == 'rsi':
+            return np.where(values < 0.3, 0.8, np.where(values > 0.7, 0.2, 0.5))
+        elif feature_name in ('macd', 'vwap_gradient', 'price_momentum'):
+            return np.where(values > 0, 0.7, 0.3)
+        elif feature_name == 'volume_ratio':
+            return np.where(values > 0.6, 0.8, np.where(values < 0.2, 0.3, 0.5))
+        elif feature_name == 'bb_position':
+            return np.where(values < 0.2, 0.8, np.where(values > 0.8, 0.2, 0.5))
+        elif feature_name == 'volume_momentum':
+            return np.where(values > 0, 0.6, 0.4)
+        elif feature_name == 'volatility':
+            return np.where((values > 0.1) & (values < 0.5), 0.6, 0.4)
+        else:
+            return np.full(len(values), 0.5)
+            
+    def _get_market_correction_batch(self, features: np.ndarray) -> np.ndarray:
+        """Коррекция на рыночные условия для матрицы признаков"""
+        volatility = features[:, MODEL_FEATURE_COLUMNS['volatility']]
+        return np.where(volatility > 0.3, 0.4, np.where(volatility < 0.1, 0.6, 0.5))
+        
     def _normalize_features(self, features: np.ndarray) -> np.ndarray:
         """Нормализация признаков"""
         try:
@@ -128,6 +584,10 @@ class AIPredictor:
     def _calculate_base_prediction(self, features: np.ndarray) -> float:
         """Базовое предсказание на основе весов"""
         try:
+            model = self.trained_model
+            if model is not None:
+                return max(0.0, min(1.0, float(model.predict_proba(features[np.newaxis, :])[0])))
+                
             if len(features) < 15:
                 return 0.5
                 
@@ -222,25 +682,18 @@ class AIPredictor:
         try:
             key = f"{pair}_{timeframe}"
             
-            if key not in self.historical_data:
-                return 0.5
-                
-            # Анализ исторической производительности
-            history = self.historical_data[key]
+            history = self.historical_data.get(key)
             
-            if len(history) < 5:
+            if history is None or len(history) < 5:
                 return 0.5
                 
-            # Расчет средней точности
-            recent_accuracy = np.mean([h['accuracy'] for h in history[-10:]])
+            # Средняя точность последних результатов
+            recent_accuracy = history.recent_accuracy()
             
             # Коррекция на основе тренда
-            if len(history) >= 2:
-                trend = history[-1]['accuracy'] - history[-2]['accuracy']
-                trend_correction = trend * 0.1
-            else:
-                trend_correction = 0.0
-                
+            trend = history.last_accuracy(1) - history.last_accuracy(2)
+            trend_correction = trend * 0.1
+            
             # Финальная коррекция
             correction = recent_accuracy + trend_correction
             
@@ -286,35 +739,37 @@ class AIPredictor:
         except Exception as e:
             return 0.5
             
-    async def update_model_performance(self, pair: str, timeframe: str, prediction: float, actual_result: float):
-        """Обновление производительности модели"""
+    async def update_model_performance(self, pair: str, timeframe: str, prediction: float, actual_result: float,
+                                       features: Optional[np.ndarray] = None):
+        """Обновление производительности модели
+        
+        features - признаки сигнала; при наличии обученной модели они накапливаются
+        и применяются онлайн-обновлением пакетами по AI_MODEL_CONFIG['batch_size'].
+        """
         try:
             key = f"{pair}_{timeframe}"
             
-            if key not in self.historical_data:
-                self.historical_data[key] = []
+            if features is not None and self.trained_model is not None:
+                self.online_features.append(np.asarray(features, dtype=np.float64))
+                self.online_labels.append(1.0 if actual_result >= 0.5 else 0.0)
                 
-            # Добавление результата
-            result = {
-                'timestamp': datetime.now().isoformat(),
-                'prediction': prediction,
-                'actual': actual_result,
-                'accuracy': 1.0 if abs(prediction - actual_result) < 0.2 else 0.0,
-                'error': abs(prediction - actual_result)
-            }
-            
-            self.historical_data[key].append(result)
+                if len(self.online_features) >= self.config['batch_size']:
+                    self._apply_online_update()
             
-            # Ограничение размера истории
-            if len(self.historical_data[key]) > 100:
-                self.historical_data[key] = self.historical_data[key][-100:]
+            history = self.historical_data.get(key)
+            if history is None:
+                history = self.historical_data[key] = self._new_history(self.config['history_per_key'])
                 
+            # Добавление результата (вытесняет самый старый при заполнении буфера)
+            timestamp = datetime.now().timestamp()
+            accuracy = 1.0 if abs(prediction - actual_result) < 0.2 else 0.0
+            error = abs(prediction - actual_result)
+            
+            history.append(timestamp, prediction, actual_result, accuracy, error)
+            
             # Обновление общей производительности
-            self.performance_history.append(result)
+            self.performance_history.append(timestamp, prediction, actual_result, accuracy, error)
             
-            if len(self.performance_history) > 1000:
-                self.performance_history = self.performance_history[-1000:]
-                
             logger.debug(f"Обновлена производительность модели: {key}")
             
         except Exception as e:
@@ -323,7 +778,7 @@ class AIPredictor:
     def get_model_performance(self) -> Dict[str, Any]:
         """Получение статистики производительности модели"""
         try:
-            if not self.performance_history:
+            if not len(self.performance_history):
                 return {
                     'total_predictions': 0,
                     'average_accuracy': 0.0,
@@ -331,17 +786,17 @@ class AIPredictor:
                 }
                 
             total_predictions = len(self.performance_history)
-            average_accuracy = np.mean([p['accuracy'] for p in self.performance_history])
-            average_error = np.mean([p['error'] for p in self.performance_history])
+            average_accuracy = self.performance_history.mean_accuracy()
+            average_error = self.performance_history.mean_error()
             
             # Производительность по парам
             pair_performance = {}
             for key, history in self.historical_data.items():
-                if history:
+                if len(history):
                     pair_performance[key] = {
                         'predictions': len(history),
-                        'accuracy': np.mean([h['accuracy'] for h in history]),
-                        'error': np.mean([h['error'] for h in history])
+                        'accuracy': history.mean_accuracy(),
+                        'error': history.mean_error()
                     }
                     
             return {
@@ -355,70 +810,321 @@ class AIPredictor:
             logger.error(f"Ошибка получения статистики: {e}")
             return {}
             
-    async def retrain_model(self):
-        """Переобучение модели (упрощенная версия)"""
+    def _apply_online_update(self):
+        """Онлайн SGD-обновление обученной модели накопленными примерами
+        
+        Обновляется копия активной модели и публикуется новой версией:
+        опубликованные версии не изменяются.
+        """
+        features = normalize_features_batch(np.vstack(self.online_features))
+        labels = np.asarray(self.online_labels)
+        self.online_features = []
+        self.online_labels = []
+        
+        model = self.trained_model.copy()
+        stats = model.partial_fit(features, labels)
+        version = self.registry.publish(model, 'online')
+        
+        logger.debug(f"Онлайн-обновление модели: {stats['samples']} примеров, версия {version}")
+        
+    def fit(self, features: np.ndarray, labels: np.ndarray) -> Dict[str, Any]:
+        """Обучение модели на признаках сигналов (N x FEATURE_COUNT) и их результатах
+        
+        Синхронный расчет: из цикла событий вызывать через retrain_model.
+        """
+        normalized = normalize_features_batch(np.asarray(features, dtype=np.float64))
+        labels = np.asarray(labels, dtype=np.float64)
+        
+        model = LogisticModel(FEATURE_COUNT, self.config)
+        stats = model.fit(normalized, labels)
+        stats.update(model.evaluate(normalized, labels))
+        
+        self.registry.publish(model, 'fit')
+        self.training_stats = stats
+        
+        return stats
+        
+    async def retrain_model(self, features: Optional[np.ndarray] = None, labels: Optional[np.ndarray] = None, executor=None):
+        """Переобучение модели на сигналах с известным результатом
+        
+        Обучение выполняется в executor (процесс) на снимке выборки. Прошедшая валидацию
+        модель ставится в очередь и вступает в силу в apply_pending_model между циклами анализа.
+        """
         try:
-            if not self.performance_history:
+            if features is None or len(features) < self.config['min_training_samples']:
+                logger.info(f"Недостаточно данных для переобучения: {0 if features is None else len(features)}")
                 return
                 
-            # Анализ производительности
-            recent_performance = self.performance_history[-50:]
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(executor, train_model_snapshot, features, labels, dict(self.config))
+            
+            stats = result['stats']
+            self.model_status['last_training_seconds'] = stats['training_seconds']
+            self.model_status['last_validation'] = stats['validation']
             
-            if len(recent_performance) < 10:
+            if not self._validate_candidate(stats, features, labels, result['validation_rows']):
+                self.model_status['rejected'] += 1
+                logger.warning(f"⚠️ Новая модель не прошла валидацию: {stats['validation']}")
                 return
                 
-            # Корректировка весов на основе производительности
-            avg_accuracy = np.mean([p['accuracy'] for p in recent_performance])
+            self.pending_model = LogisticModel.from_dict(result['model'])
+            self.pending_stats = stats
             
-            if avg_accuracy < 0.6:
-                # Снижение весов неэффективных индикаторов
-                for feature in self.model_weights:
-                    self.model_weights[feature] *= 0.95
-                    
-            elif avg_accuracy > 0.8:
-                # Усиление весов эффективных индикаторов
-                for feature in self.model_weights:
-                    self.model_weights[feature] *= 1.05
-                    
-            # Нормализация весов
-            total_weight = sum(self.model_weights.values())
-            for feature in self.model_weights:
-                self.model_weights[feature] /= total_weight
-                
-            logger.info(f"Модель переобучена. Средняя точность: {avg_accuracy:.3f}")
+            logger.info(
+                f"Модель переобучена: {stats['samples']} примеров за {stats['training_seconds']:.2f}с, "
+                f"валидация {stats['validation']}"
+            )
             
         except Exception as e:
             logger.error(f"Ошибка переобучения модели: {e}")
             
-    def save_model(self, filepath: str):
-        """Сохранение модели"""
-        try:
-            model_data = {
-                'weights': self.model_weights,
-                'historical_data': self.historical_data,
-                'performance_history': self.performance_history[-100:],  # Последние 100 записей
-                'timestamp': datetime.now().isoformat()
-            }
+    def _validate_candidate(self, stats: Dict[str, Any], features: np.ndarray, labels: np.ndarray, validation_rows: np.ndarray) -> bool:
+        """Проверка новой модели на отложенной выборке против текущей"""
+        validation = stats['validation']
+        if not validation:
+            return False
             
-            with open(filepath, 'w') as f:
-                json.dump(model_data, f, indent=2)
-                
-            logger.info(f"Модель сохранена: {filepath}")
+        if validation['accuracy'] < self.config['min_validation_accuracy']:
+            return False
+            
+        current = self.trained_model
+        if current is None:
+            return True
+            
+        normalized = normalize_features_batch(np.asarray(features, dtype=np.float64)[validation_rows])
+        current_loss = current.evaluate(normalized, np.asarray(labels)[validation_rows])['log_loss']
+        
+        return validation['log_loss'] <= current_loss * (1 + self.config['max_validation_loss_increase'])
+        
+    def apply_pending_model(self) -> bool:
+        """Замена модели прошедшей валидацию (вызывается между циклами анализа)"""
+        if self.pending_model is None:
+            return False
+            
+        started = time.perf_counter()
+        
+        self.registry.publish(self.pending_model, 'retrain')
+        self.training_stats = self.pending_stats
+        
+        self.pending_model = None
+        self.pending_stats = None
+        self.online_features = []
+        self.online_labels = []
+        
+        self.model_status['last_swap_ms'] = (time.perf_counter() - started) * 1000
+        self.model_status['accepted'] += 1
+        
+        logger.info(f"🔄 Модель обновлена до версии {self.model_version}")
+        return True
+        
+    def rollback_model(self) -> bool:
+        """Возврат к предыдущей версии модели"""
+        if self.registry.rollback() is None:
+            return False
+            
+        self.model_status['rollbacks'] += 1
+        
+        logger.warning(f"↩️ Модель возвращена к версии {self.model_version}")
+        return True
+        
+    def get_model_status(self) -> Dict[str, Any]:
+        """Версия модели, время обучения и замены"""
+        return {
+            'version': self.model_version,
+            'previous_version': self.registry.previous_version,
+            'pending': self.pending_model is not None,
+            'trained': self.trained_model is not None,
+            'samples_seen': self.trained_model.samples_seen if self.trained_model else 0,
+            'versions': self.registry.list_versions(),
+            'prediction_cache': self.prediction_cache.get_statistics() if self.prediction_cache else None,
+            **self.model_status
+        }
+        
+    def save_model(self, filepath: Optional[str] = None):
+        """Сохранение модели в бинарный файл (AI_MODEL_CONFIG['model_path'])"""
+        try:
+            header, arrays = self.snapshot_model()
+            self.write_model_snapshot(header, arrays, filepath)
             
         except Exception as e:
             logger.error(f"Ошибка сохранения модели: {e}")
             
-    def load_model(self, filepath: str):
-        """Загрузка модели"""
+    def snapshot_model(self) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+        """Заголовок и массивы модели - копия состояния на момент вызова
+        
+        Вызывается в цикле событий: история дополняется там же, поэтому запись
+        файла в другом потоке (write_model_snapshot) не видит ее изменений.
+        """
+        history_keys, history, performance = self._history_arrays()
+        model = self.trained_model
+        
+        header = {
+            'weights': dict(self.model_weights),
+            'model_version': self.model_version,
+            'samples_seen': model.samples_seen if model else 0,
+            'history_keys': history_keys,
+            'timestamp': datetime.now().isoformat()
+        }
+        arrays = {
+            'history': history,
+            'performance': performance
+        }
+        
+        if model is not None:
+            arrays['model_weights'] = model.weights.copy()
+            arrays['model_bias'] = np.array([model.bias])
+            arrays['model_mean'] = model.mean.copy()
+            arrays['model_scale'] = model.scale.copy()
+            
+        return header, arrays
+        
+    def write_model_snapshot(self, header: Dict[str, Any], arrays: Dict[str, np.ndarray], filepath: Optional[str] = None):
+        """Запись снимка snapshot_model в файл (можно выполнять вне цикла событий)"""
+        filepath = filepath or self.config['model_path']
+        started = time.perf_counter()
+        
+        save_model_file(filepath, header, arrays, self.config['compress_model'])
+        
+        logger.info(f"Модель сохранена: {filepath} за {(time.perf_counter() - started) * 1000:.1f}мс")
+        
+    def load_model(self, filepath: Optional[str] = None):
+        """Загрузка модели (бинарный файл или прежний JSON-формат)"""
         try:
-            with open(filepath, 'r') as f:
-                model_data = json.load(f)
+            filepath = filepath or self.config['model_path']
+            
+            if not os.path.exists(filepath) and os.path.exists(self.config['legacy_model_path']):
+                filepath = self.config['legacy_model_path']
+                
+            if filepath.endswith('.json'):
+                self._load_legacy_model(filepath)
+                return
+                
+            started = time.perf_counter()
+            mmap_members = ('history', 'performance') if self.config['mmap_history'] else ()
+            header, arrays = load_model_file(filepath, mmap_members)
+            
+            self.model_weights = header.get('weights', self.model_weights)
+            
+            if 'model_weights' in arrays:
+                model = LogisticModel(len(arrays['model_weights']), self.config)
+                model.weights = np.array(arrays['model_weights'], dtype=np.float64)
+                model.bias = float(arrays['model_bias'][0])
+                model.mean = np.array(arrays['model_mean'], dtype=np.float64)
+                model.scale = np.array(arrays['model_scale'], dtype=np.float64)
+                model.samples_seen = header.get('samples_seen', 0)
+                self._publish_loaded_model(model, header.get('model_version', 0))
                 
-            self.model_weights = model_data.get('weights', self.model_weights)
-            self.historical_data = model_data.get('historical_data', {})
-            self.performance_history = model_data.get('performance_history', [])
+            self._restore_history(header.get('history_keys', []), arrays['history'], arrays['performance'])
             
-            logger.info(f"Модель загружена: {filepath}")
+            logger.info(f"Модель загружена: {filepath} за {(time.perf_counter() - started) * 1000:.1f}мс")
             
         except Exception as e:
             logger.error(f"Ошибка загрузки модели: {e}")
+            
+    def _load_legacy_model(self, filepath: str):
+        """Загрузка модели из JSON (до перехода на бинарный формат)"""
+        with open(filepath, 'r') as f:
+            model_data = json.load(f)
+            
+        self.model_weights = model_data.get('weights', self.model_weights)
+        if model_data.get('trained_model'):
+            self._publish_loaded_model(LogisticModel.from_dict(model_data['trained_model']), model_data.get('model_version', 0))
+        history_keys = list(model_data.get('historical_data', {}))
+        history = self._records_to_array([
+            (index, record)
+            for index, key in enumerate(history_keys)
+            for record in model_data['historical_data'][key]
+        ])
+        performance = self._records_to_array([(0, record) for record in model_data.get('performance_history', [])])
+        self._restore_history(history_keys, history, performance)
+        
+        logger.info(f"Модель загружена из JSON: {filepath}")
+        
+    def _publish_loaded_model(self, model: LogisticModel, version: int):
+        self.registry.publish(model, 'file', max(version, self.registry.last_version + 1))
+        
+    def _history_arrays(self) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """История предсказаний в виде массивов HISTORY_DTYPE"""
+        history_keys = list(self.historical_data)
+        
+        parts = []
+        for index, key in enumerate(history_keys):
+            records = self.historical_data[key].to_array()
+            records['key'] = index
+            parts.append(records)
+            
+        history = np.concatenate(parts) if parts else np.empty(0, dtype=HISTORY_DTYPE)
+        return history_keys, history, self.performance_history.to_array()
+        
+    @staticmethod
+    def _records_to_array(records: List[Tuple[int, Dict[str, Any]]]) -> np.ndarray:
+        """Записи прежнего JSON-формата в массив HISTORY_DTYPE"""
+        array = np.empty(len(records), dtype=HISTORY_DTYPE)
+        for row, (index, record) in enumerate(records):
+            array[row] = (
+                index,
+                datetime.fromisoformat(record['timestamp']).timestamp(),
+                record['prediction'],
+                record['actual'],
+                record['accuracy'],
+                record['error']
+            )
+        return array
+        
+    def _restore_history(self, history_keys: List[str], history: np.ndarray, performance: np.ndarray):
+        """Восстановление истории предсказаний из массивов HISTORY_DTYPE"""
+        self.historical_data = {}
+        keys = np.asarray(history['key'])
+        
+        for index, key in enumerate(history_keys):
+            self.historical_data[key] = self._new_history(self.config['history_per_key'])
+            self.historical_data[key].extend(history[keys == index])
+            
+        self.performance_history = self._new_history(self.config['performance_history_size'])
+        self.performance_history.extend(performance)
+
+
+def benchmark_model(n_samples: int = 50000, n_series: int = 49, repeats: int = 200, seed: int = 0) -> Dict[str, Any]:
+    """Пропускная способность обучения и задержка инференса на синтетических данных"""
+    rng = np.random.default_rng(seed)
+    
+    features = rng.normal(0.0, 1.0, (n_samples, FEATURE_COUNT))
+    features[:, FEATURE_INDEX['close']] = rng.uniform(10.0, 1000.0, n_samples)
+    features[:, FEATURE_INDEX['rsi']] = rng.uniform(0.0, 100.0, n_samples)
+    
+    # Метки от скрытой линейной зависимости
+    hidden = rng.normal(0.0, 1.0, FEATURE_COUNT)
+    labels = (rng.random(n_samples) < _sigmoid(np.tanh(features) @ hidden)).astype(np.float64)
+    
+    predictor = AIPredictor()
+    training = predictor.fit(features, labels)
+    
+    batch = features[:n_series]
+    keys = [('BTCUSDT', '1m')] * n_series
+    
+    started = time.perf_counter()
+    for _ in range(repeats):
+        predictor.predict_batch(batch, keys)
+    batch_seconds = (time.perf_counter() - started) / repeats
+    
+    async def predict_scalar():
+        for row in batch:
+            await predictor.predict(row, 'BTCUSDT', '1m')
+            
+    started = time.perf_counter()
+    asyncio.run(predict_scalar())
+    scalar_seconds = (time.perf_counter() - started) / n_series
+    
+    return {
+        'training': training,
+        'inference': {
+            'batch_size': n_series,
+            'batch_ms': batch_seconds * 1000,
+            'per_series_batch_us': batch_seconds / n_series * 1e6,
+            'per_series_scalar_us': scalar_seconds * 1e6
+        }
+    }
+
+
+if __name__ == "__main__":
+    print(json.dumps(benchmark_model(), indent=2))
@@ -0,0 +1,80 @@
+"""
+Расчет индикаторов в рабочих потоках и процессах
+Функции модуля не используют состояние анализатора и безопасны для пула исполнителей
+"""
+
+import logging
+from typing import List, Tuple, Any, Optional
+
+import pandas as pd
+
+from indicators import TechnicalIndicators
+
+logger = logging.getLogger(__name__)
+
+# Свечей в хвосте серии, достаточных для стадии стратегии
+# (изменение цены, уровни пробоя за 20 свечей, признаки ИИ)
+STRATEGY_TAIL_ROWS = 50
+
+# Минимум свечей для анализа серии
+MIN_SERIES_LENGTH = 200
+
+_indicators = None
+_shared_store = None
+_shared_store_name = None
+
+
+def init_worker(shared_memory_name: Optional[str] = None):
+    """Инициализация рабочего процесса"""
+    global _shared_store_name
+    _shared_store_name = shared_memory_name
+
+
+def _get_indicators() -> TechnicalIndicators:
+    global _indicators
+    if _indicators is None:
+        _indicators = TechnicalIndicators()
+    return _indicators
+
+
+def _get_shared_store():
+    global _shared_store
+    if _shared_store is None:
+        from shared_market_data import SharedCandleStore
+
+        _shared_store = SharedCandleStore.attach(_shared_store_name)
+    return _shared_store
+
+
+def compute_indicators_chunk(jobs: List[Tuple[str, str, Optional[pd.DataFrame]]]) -> List[Tuple[str, str, dict, Any]]:
+    """Расчет индикаторов для пакета серий
+
+    Каждое задание - (pair, timeframe, data); data=None означает чтение из разделяемой памяти.
+    Возвращает (pair, timeframe, indicators, tail), где tail - последние свечи той же
+    серии, на которой считались индикаторы; indicators=None - согласованный снимок
+    из разделяемой памяти получить не удалось.
+    """
+    results = []
+
+    for pair, timeframe, data in jobs:
+        try:
+            if data is None:
+                data = _get_shared_store().read_frame(pair, timeframe)
+                if data is None:
+                    results.append((pair, timeframe, None, None))
+                    continue
+
+            if data is None or len(data) < MIN_SERIES_LENGTH:
+                results.append((pair, timeframe, {}, None))
+                continue
+
+            indicators = _get_indicators().calculate_all_indicators(data)
+            tail = data.iloc[-STRATEGY_TAIL_ROWS:].reset_index(drop=True)
+
+            results.append((pair, timeframe, indicators, tail))
+
+        except Exception as e:
+            logger.error(f"Ошибка расчета индикаторов {pair} {timeframe} в пуле: {e}")
+            results.append((pair, timeframe, {}, None))
+
+    return results
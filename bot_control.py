@@ -9,8 +9,10 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional
 import signal
 import sys
+import time
 
-from globals import STRATEGY_CONFIG, SAFETY_LIMITS, performance_stats, trading_active
+from globals import STRATEGY_CONFIG, SAFETY_LIMITS, SCHEDULER_CONFIG, performance_stats, trading_active
+from latency import stamp, SIGNAL_STAGES, STAGE_DELIVERED, STAGE_PERSISTED
 
 logger = logging.getLogger(__name__)
 
@@ -29,6 +31,7 @@ class BotController:
         self.total_cycles = 0
         self.successful_cycles = 0
         self.errors_count = 0
+        self.cycle_overruns = 0
         
         # Безопасность
         self.emergency_stop = False
@@ -182,8 +185,11 @@ class BotController:
                         await asyncio.sleep(10)
                         continue
                         
+                    # Переобученная модель вступает в силу между циклами анализа
+                    await self.core.apply_model_update()
+                    
                     # Анализ рынка и поиск сигналов
-                    signals = await self.core.signal_analyzer.analyze_all_pairs(market_data)
+                    signals = await self._analyze_scheduled(market_data)
                     
                     # Обработка найденных сигналов
                     if signals:
@@ -217,6 +223,31 @@ class BotController:
         finally:
             logger.info("🔄 Основной торговый цикл завершен")
             
+    async def _analyze_scheduled(self, market_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Анализ серий, выбранных планировщиком"""
+        if not SCHEDULER_CONFIG['enabled']:
+            return await self.core.signal_analyzer.analyze_all_pairs(market_data)
+            
+        scheduler = self.core.scheduler
+        analyzer = self.core.signal_analyzer
+        
+        analysis_start = time.monotonic()
+        due_data = scheduler.select_due(market_data)
+        
+        if not due_data:
+            scheduler.record_cycle(0.0)
+            return []
+            
+        # Серии анализируются по убыванию приоритета до дедлайна цикла
+        signals = await analyzer.analyze_all_pairs(
+            due_data,
+            order=scheduler.get_order(),
+            deadline=scheduler.get_deadline(analysis_start)
+        )
+        scheduler.record_cycle(time.monotonic() - analysis_start, analyzer.last_analyzed, analyzer.last_deferred)
+        
+        return signals
+        
     async def _process_signals(self, signals: List[Dict[str, Any]]):
         """Обработка найденных сигналов"""
         try:
@@ -237,8 +268,17 @@ class BotController:
                     success = await self.telegram.send_signal(signal)
                     
                     if success:
+                        timestamps = signal.setdefault('latency', {})
+                        stamp(timestamps, STAGE_DELIVERED)
+                        
                         # Сохранение в базу данных
                         signal_id = await self.core.database.save_signal(signal)
+                        if self.core.feature_store:
+                            self.core.feature_store.append_signal(signal_id, signal)
+                        self.core.track_signal(signal_id, signal)
+                        stamp(timestamps, STAGE_PERSISTED)
+                        
+                        self.core.latency_tracker.record(timestamps, signal['timeframe'], SIGNAL_STAGES)
                         
                         # Обновление счетчиков
                         self.signals_sent_today += 1
@@ -357,6 +397,10 @@ class BotController:
             cycle_duration = (datetime.now() - cycle_start).total_seconds()
             wait_time = max(0, STRATEGY_CONFIG['update_interval'] - cycle_duration)
             
+            if cycle_duration > STRATEGY_CONFIG['update_interval']:
+                self.cycle_overruns += 1
+                logger.warning(f"⏱️ Цикл превысил интервал: {cycle_duration:.1f}с (всего превышений: {self.cycle_overruns})")
+            
             if wait_time > 0:
                 await asyncio.sleep(wait_time)
                 
@@ -386,6 +430,7 @@ class BotController:
             self.total_cycles = 0
             self.successful_cycles = 0
             self.errors_count = 0
+            self.cycle_overruns = 0
             self.signals_sent_today = 0
             self.signals_sent_hour = 0
             self.errors_this_hour = 0
@@ -412,6 +457,7 @@ class BotController:
                 'signals_sent_hour': self.signals_sent_hour,
                 'errors_count': self.errors_count,
                 'errors_this_hour': self.errors_this_hour,
+                'cycle_overruns': self.cycle_overruns,
                 'last_signal_time': self.last_signal_time.isoformat() if self.last_signal_time else None
             }
             
@@ -5,14 +5,23 @@
 
 import asyncio
 import logging
-from datetime import datetime
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
 from typing import Dict, List, Any, Optional
 
-from globals import TRADING_PAIRS, TIMEFRAMES, STRATEGY_CONFIG
+from globals import TRADING_PAIRS, TIMEFRAMES, STRATEGY_CONFIG, REPLAY_CONFIG, AI_MODEL_CONFIG, ANALYSIS_CONFIG, FEATURE_STORE_CONFIG, RETENTION_CONFIG, \
+    OUTCOME_CONFIG
 from database import Database
 from websocket import BinanceWebSocket
+from replay import FeedRecorder, ReplayWebSocket
 from signal_analyzer import SignalAnalyzer
 from ai_model import AIPredictor
+from ai_features import features_from_signal
+from feature_store import FeatureStore
+from latency import LatencyTracker
+from scheduler import AnalysisScheduler
+from retention import RetentionManager
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +34,19 @@ class TradingCore:
         self.websocket = None
         self.signal_analyzer = None
         self.ai_predictor = None
+        self.latency_tracker = LatencyTracker()
+        self.scheduler = AnalysisScheduler()
+        self.retention = RetentionManager(database)
+        
+        # Пул для переобучения AI модели вне цикла событий
+        self.training_executor = None
+        
+        # Признаки и версия модели отправленных сигналов
+        self.feature_store = None
+        
+        # Открытые сигналы: id -> сигнал, цена входа и время закрытия (UTC)
+        self.open_signals = {}
+        self.outcome_stats = {'closed': 0, 'success': 0, 'failed': 0, 'expired': 0}
         
         # Настройки
         self.pairs = TRADING_PAIRS
@@ -49,12 +71,18 @@ class TradingCore:
             # Инициализация WebSocket
             await self._initialize_websocket()
             
-            # Инициализация анализатора сигналов
-            await self._initialize_signal_analyzer()
+            # Хранилище признаков сигналов
+            self._initialize_feature_store()
             
-            # Инициализация AI предсказателя
+            # Сигналы, открытые до перезапуска
+            await self._restore_open_signals()
+            
+            # Инициализация AI предсказателя (общий для анализатора сигналов)
             await self._initialize_ai_predictor()
             
+            # Инициализация анализатора сигналов
+            await self._initialize_signal_analyzer()
+            
             # Финальная проверка
             if not await self._validate_initialization():
                 raise Exception("Не удалось завершить инициализацию")
@@ -73,7 +101,18 @@ class TradingCore:
         try:
             logger.info("🔌 Инициализация WebSocket...")
             
-            self.websocket = BinanceWebSocket()
+            if REPLAY_CONFIG['replay_path']:
+                # Воспроизведение записанного потока вместо живых данных
+                self.websocket = ReplayWebSocket(REPLAY_CONFIG['replay_path'], REPLAY_CONFIG['replay_speed'])
+                self.websocket.attach_latency_tracker(self.latency_tracker)
+            else:
+                self.websocket = BinanceWebSocket()
+                
+                if REPLAY_CONFIG['record_enabled']:
+                    recorder = FeedRecorder(REPLAY_CONFIG['record_path'], self.websocket.pairs, self.websocket.timeframes)
+                    recorder.open()
+                    self.websocket.attach_recorder(recorder)
+                    
             await self.websocket.initialize()
             
             logger.info("✅ WebSocket инициализирован")
@@ -82,12 +121,24 @@ class TradingCore:
             logger.error(f"Ошибка инициализации WebSocket: {e}")
             raise
             
+    def _initialize_feature_store(self):
+        """Открытие хранилища признаков (при ошибке обучение использует signal_data)"""
+        if not FEATURE_STORE_CONFIG['enabled']:
+            return
+            
+        try:
+            store = FeatureStore()
+            store.open()
+            self.feature_store = store
+        except Exception as e:
+            logger.error(f"Ошибка открытия хранилища признаков: {e}")
+            
     async def _initialize_signal_analyzer(self):
         """Инициализация анализатора сигналов"""
         try:
             logger.info("🔍 Инициализация анализатора сигналов...")
             
-            self.signal_analyzer = SignalAnalyzer(self.telegram, self.database)
+            self.signal_analyzer = SignalAnalyzer(self.telegram, self.database, self.latency_tracker, self.ai_predictor)
             
             logger.info("✅ Анализатор сигналов инициализирован")
             
@@ -104,8 +155,7 @@ class TradingCore:
             
             # Попытка загрузки сохраненной модели
             try:
-                model_path = "/app/data/models/trading_model.json"
-                self.ai_predictor.load_model(model_path)
+                self.ai_predictor.load_model(AI_MODEL_CONFIG['model_path'])
                 logger.info("📁 Модель загружена из файла")
             except Exception as e:
                 logger.info("🆕 Используется новая модель")
@@ -186,6 +236,12 @@ class TradingCore:
             # Запуск мониторинга производительности
             monitoring_task = asyncio.create_task(self._performance_monitoring_loop())
             
+            # Запуск очистки устаревшей истории
+            retention_task = asyncio.create_task(self._retention_loop())
+            
+            # Запуск закрытия сигналов по истечении времени удержания
+            outcome_task = asyncio.create_task(self._signal_outcome_loop())
+            
             self.is_running = True
             
             logger.info("✅ Торговля запущена")
@@ -195,6 +251,8 @@ class TradingCore:
                 websocket_task,
                 ai_retrain_task,
                 monitoring_task,
+                retention_task,
+                outcome_task,
                 return_exceptions=True
             )
             
@@ -217,14 +275,16 @@ class TradingCore:
                     if not self.is_running:
                         break
                         
-                    # Переобучение модели
-                    await self.ai_predictor.retrain_model()
+                    # Ежечасное сохранение модели и накопленной истории предсказаний:
+                    # без него история пережила бы только замену модели или штатную остановку
+                    await self.save_model()
                     
-                    # Сохранение модели
-                    model_path = "/app/data/models/trading_model.json"
-                    self.ai_predictor.save_model(model_path)
+                    # Переобучение модели на закрытых сигналах; новая модель
+                    # вступает в силу между циклами анализа (apply_pending_model)
+                    features, labels = await self.database.get_training_data(AI_MODEL_CONFIG['training_limit'], self.feature_store)
+                    await self.ai_predictor.retrain_model(features, labels, self._get_training_executor())
                     
-                    logger.info("🤖 AI модель переобучена и сохранена")
+                    logger.info("🤖 Переобучение AI модели завершено")
                     
                 except Exception as e:
                     logger.error(f"Ошибка переобучения AI: {e}")
@@ -233,6 +293,36 @@ class TradingCore:
         except Exception as e:
             logger.error(f"Ошибка цикла переобучения AI: {e}")
             
+    def _get_training_executor(self):
+        """Пул переобучения согласно AI_MODEL_CONFIG['training_executor'] (None - пул потоков цикла событий)"""
+        if self.training_executor is None and AI_MODEL_CONFIG['training_executor'] == 'process':
+            self.training_executor = ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=multiprocessing.get_context(ANALYSIS_CONFIG['process_start_method'])
+            )
+        return self.training_executor
+        
+    async def apply_model_update(self):
+        """Замена AI модели между циклами анализа и сохранение новой версии"""
+        if not self.ai_predictor or not self.ai_predictor.apply_pending_model():
+            return
+            
+        await self.save_model()
+        
+    async def save_model(self):
+        """Сохранение AI модели и истории предсказаний без блокировки цикла событий"""
+        if not self.ai_predictor:
+            return
+            
+        try:
+            # Снимок берется в цикле событий, где меняется история; в потоке только запись файла
+            header, arrays = self.ai_predictor.snapshot_model()
+            await asyncio.get_running_loop().run_in_executor(
+                None, self.ai_predictor.write_model_snapshot, header, arrays, AI_MODEL_CONFIG['model_path']
+            )
+        except Exception as e:
+            logger.error(f"Ошибка сохранения AI модели: {e}")
+            
     async def _performance_monitoring_loop(self):
         """Цикл мониторинга производительности"""
         try:
@@ -261,6 +351,31 @@ class TradingCore:
         except Exception as e:
             logger.error(f"Ошибка цикла мониторинга: {e}")
             
+    async def _retention_loop(self):
+        """Цикл очистки устаревших сигналов и рыночных данных"""
+        try:
+            if not RETENTION_CONFIG['enabled']:
+                return
+                
+            logger.info("🗑 Запуск цикла очистки истории...")
+            
+            # Первый проход не задерживает запуск торговли
+            await asyncio.sleep(RETENTION_CONFIG['initial_delay'])
+            
+            while self.is_running:
+                try:
+                    await self.retention.run_once()
+                    
+                    # Ожидание интервала очистки
+                    await asyncio.sleep(RETENTION_CONFIG['interval'])
+                    
+                except Exception as e:
+                    logger.error(f"Ошибка очистки истории: {e}")
+                    await asyncio.sleep(300)  # 5 минут пауза при ошибке
+                    
+        except Exception as e:
+            logger.error(f"Ошибка цикла очистки истории: {e}")
+            
     async def _collect_performance_stats(self) -> Dict[str, Any]:
         """Сбор статистики производительности"""
         try:
@@ -358,6 +473,109 @@ class TradingCore:
             logger.error(f"Ошибка анализа рынка: {e}")
             return []
             
+    def track_signal(self, signal_id: int, signal: Dict[str, Any], opened_at: Optional[datetime] = None):
+        """Постановка отправленного сигнала на закрытие через hold_duration минут"""
+        if not signal_id or not signal.get('current_price'):
+            return
+            
+        opened_at = opened_at or datetime.now(timezone.utc)
+        self.open_signals[signal_id] = {
+            'signal': signal,
+            'entry_price': float(signal['current_price']),
+            'close_at': opened_at + timedelta(minutes=signal['hold_duration'])
+        }
+        
+    async def _restore_open_signals(self):
+        """Загрузка сигналов без результата, сохраненных до перезапуска"""
+        try:
+            for signal in await self.database.get_pending_signals():
+                opened_at = datetime.strptime(signal['created_at'], '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+                self.track_signal(signal['id'], signal['signal_data'], opened_at)
+                
+            if self.open_signals:
+                logger.info(f"📂 Восстановлено открытых сигналов: {len(self.open_signals)}")
+                
+        except Exception as e:
+            logger.error(f"Ошибка восстановления открытых сигналов: {e}")
+            
+    async def _resolve_signal_outcomes(self):
+        """Закрытие сигналов, у которых истекло время удержания, по текущей цене"""
+        now = datetime.now(timezone.utc)
+        
+        for signal_id, entry in list(self.open_signals.items()):
+            if now < entry['close_at']:
+                continue
+                
+            signal = entry['signal']
+            
+            # Цена намного позже закрытия (нет данных по паре, сигнал из прошлого запуска)
+            # не отражает результат - такой сигнал не учитывается в обучении
+            if (now - entry['close_at']).total_seconds() > OUTCOME_CONFIG['expire_after']:
+                del self.open_signals[signal_id]
+                await self.database.update_signal_result(signal_id, 'expired', 0.0)
+                self.outcome_stats['expired'] += 1
+                continue
+                
+            price = await self.get_latest_price(signal['pair'])
+            if price is None:
+                continue
+                
+            # Изменение цены в сторону сигнала, %
+            move = (float(price) - entry['entry_price']) / entry['entry_price']
+            if signal['direction'] == 'SELL':
+                move = -move
+                
+            result = 'success' if move > OUTCOME_CONFIG['min_move'] else 'failed'
+            
+            del self.open_signals[signal_id]
+            await self.record_signal_result(signal_id, signal, result, move * 100)
+            
+            self.outcome_stats['closed'] += 1
+            self.outcome_stats[result] += 1
+            logger.info(f"🏁 Сигнал {signal_id} закрыт: {signal['pair']} {signal['timeframe']} -> {result} ({move:+.2%})")
+            
+    async def _signal_outcome_loop(self):
+        """Цикл закрытия сигналов по истечении времени удержания"""
+        try:
+            if not OUTCOME_CONFIG['enabled']:
+                return
+                
+            logger.info("🏁 Запуск цикла закрытия сигналов...")
+            
+            while self.is_running:
+                try:
+                    await self._resolve_signal_outcomes()
+                    
+                    # Ожидание интервала проверки
+                    await asyncio.sleep(OUTCOME_CONFIG['check_interval'])
+                    
+                except Exception as e:
+                    logger.error(f"Ошибка закрытия сигналов: {e}")
+                    await asyncio.sleep(60)  # 1 минута пауза при ошибке
+                    
+        except Exception as e:
+            logger.error(f"Ошибка цикла закрытия сигналов: {e}")
+            
+    async def record_signal_result(self, signal_id: int, signal: Dict[str, Any], result: str, profit: float):
+        """Результат сигнала: сохранение в БД и онлайн-обновление модели"""
+        try:
+            await self.database.update_signal_result(signal_id, result, profit)
+            
+            if self.ai_predictor:
+                await self.ai_predictor.update_model_performance(
+                    signal['pair'],
+                    signal['timeframe'],
+                    signal.get('ai_score', 50) / 100,
+                    1.0 if result == 'success' else 0.0,
+                    features_from_signal(signal)
+                )
+                
+            if self.signal_analyzer:
+                self.signal_analyzer.shadow_models.record_outcome(signal, 1.0 if result == 'success' else 0.0)
+                
+        except Exception as e:
+            logger.error(f"Ошибка учета результата сигнала {signal_id}: {e}")
+            
     async def get_market_data(self) -> Dict[str, Dict[str, Any]]:
         """Получение рыночных данных"""
         try:
@@ -394,11 +612,23 @@ class TradingCore:
             if self.websocket:
                 await self.websocket.shutdown()
                 
+            # Остановка пула анализа
+            if self.signal_analyzer:
+                self.signal_analyzer.shutdown()
+                
+            # Запись буфера хранилища признаков
+            if self.feature_store:
+                self.feature_store.close()
+                
+            # Остановка пула переобучения
+            if self.training_executor:
+                self.training_executor.shutdown(wait=False, cancel_futures=True)
+                self.training_executor = None
+                
             # Сохранение AI модели
             if self.ai_predictor:
                 try:
-                    model_path = "/app/data/models/trading_model.json"
-                    self.ai_predictor.save_model(model_path)
+                    self.ai_predictor.save_model(AI_MODEL_CONFIG['model_path'])
                     logger.info("💾 AI модель сохранена")
                 except Exception as e:
                     logger.error(f"Ошибка сохранения AI модели: {e}")
@@ -425,7 +655,15 @@ class TradingCore:
                 'pairs_count': len(self.pairs),
                 'timeframes_count': len(self.timeframes),
                 'websocket_status': self.websocket.get_connection_status() if self.websocket else {},
-                'ai_model_performance': self.ai_predictor.get_model_performance() if self.ai_predictor else {}
+                'ai_model_performance': self.ai_predictor.get_model_performance() if self.ai_predictor else {},
+                'ai_model': self.ai_predictor.get_model_status() if self.ai_predictor else {},
+                'latency': self.latency_tracker.get_histograms(),
+                'analysis': self.signal_analyzer.get_analysis_stats() if self.signal_analyzer else {},
+                'scheduler': self.scheduler.get_statistics(),
+                'feature_store': self.feature_store.get_statistics() if self.feature_store else {},
+                'database': self.database.get_statistics() if self.database else {},
+                'retention': self.retention.get_statistics(),
+                'outcomes': {**self.outcome_stats, 'open': len(self.open_signals)}
             }
             
         except Exception as e:
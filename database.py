@@ -3,38 +3,93 @@
 Хранение истории сигналов и статистики
 """
 
-import sqlite3
 import asyncio
+import sqlite3
 import logging
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Any, Tuple
 import json
 
+import numpy as np
+
 from globals import DB_PATH, DATABASE_CONFIG
+from ai_features import FEATURE_COUNT, FEATURE_DTYPE, features_from_signal
+from db_worker import DatabaseWorker
+from indicator_codec import IndicatorCodec, INDICATOR_DTYPE, to_epoch_ms
 
 logger = logging.getLogger(__name__)
 
+# Параметров в одном запросе IN (...) (лимит SQLite - 999)
+SQL_PARAMETER_CHUNK = 500
+
+# Строк за один шаг переноса старой таблицы рыночных данных
+LEGACY_MIGRATION_CHUNK = 5000
+
+# Столбцы свечи в market_candles и в результате get_market_data_range
+CANDLE_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
+# Суммируемые столбцы агрегатов сигналов и вклад в них строки сигнала ({row} - NEW или OLD)
+AGGREGATE_COLUMNS = [
+    ('total_signals', "1"),
+    ('successful_signals', "({row}.result = 'success')"),
+    ('failed_signals', "({row}.result = 'failed')"),
+    ('success_profit_sum', "(CASE WHEN {row}.result = 'success' THEN {row}.profit ELSE 0.0 END)"),
+    ('accuracy_sum', "{row}.accuracy")
+]
+
+# Столбцы, добавленные в таблицу производительности после ее создания
+PERFORMANCE_SUM_COLUMNS = [('success_profit_sum', 'REAL DEFAULT 0.0'), ('accuracy_sum', 'REAL DEFAULT 0.0')]
+
+# Типизированные поля сигнала: столбец, ключ словаря сигнала, тип
+SIGNAL_VALUE_COLUMNS = [
+    ('ai_score', 'ai_score', 'REAL'),
+    ('current_price', 'current_price', 'REAL'),
+    ('vwap_gradient', 'vwap_gradient', 'REAL'),
+    ('volume_tsunami', 'volume_tsunami', 'REAL'),
+    ('neural_macd', 'neural_macd', 'REAL'),
+    ('quantum_rsi', 'quantum_rsi', 'REAL'),
+    ('model_version', 'model_version', 'INTEGER'),
+    ('signal_time', 'timestamp', 'TEXT')
+]
+
+# Снимок индикаторов (IndicatorCodec) и вектор признаков - упакованные float64
+SIGNAL_BLOB_COLUMNS = [('indicators', 'BLOB'), ('features', 'BLOB')]
+
+# Формат строки сигнала: NULL или 0 - весь сигнал в JSON signal_data, 1 - типизированные столбцы
+SIGNAL_STORAGE_FORMAT = 1
+
+# Ключи сигнала, которые хранятся в отдельных столбцах, а не в signal_data
+SIGNAL_STORED_KEYS = {'pair', 'timeframe', 'direction', 'accuracy', 'entry_time', 'hold_duration', 'indicators', 'features'} | \
+    {key for _, key, _ in SIGNAL_VALUE_COLUMNS}
+
 class Database:
     def __init__(self):
         self.db_path = DB_PATH
         self.config = DATABASE_CONFIG
-        self.connection = None
-        self.lock = asyncio.Lock()
+        
+        # Соединение принадлежит потоку базы данных; методы ожидают результат запроса
+        self.worker = None
+        
+        # Справочники рыночных данных: (pair, timeframe) -> id серии и имена индикаторов
+        self.series_ids = {}
+        self.indicator_codec = IndicatorCodec()
         
     async def initialize(self):
         """Инициализация базы данных"""
         try:
             logger.info("📊 Инициализация базы данных...")
             
-            # Создание подключения
-            self.connection = sqlite3.connect(self.db_path, check_same_thread=False)
-            self.connection.row_factory = sqlite3.Row
+            # Запуск потока базы данных с собственным соединением
+            self.worker = DatabaseWorker(self.db_path)
+            self.worker.start()
             
             # Создание таблиц
             await self._create_tables()
-            
-            # Очистка старых данных
-            await self._cleanup_old_data()
+            await self._backfill_aggregates()
+            await self._load_dictionaries()
+            await self._migrate_legacy_market_data()
             
             logger.info("✅ База данных инициализирована")
             
@@ -45,102 +100,302 @@ class Database:
     async def _create_tables(self):
         """Создание таблиц"""
         try:
-            cursor = self.connection.cursor()
+            await self.worker.run('create_tables', self._create_tables_sync)
+        except Exception as e:
+            logger.error(f"Ошибка создания таблиц: {e}")
+            raise
             
-            # Таблица сигналов
+    def _create_tables_sync(self, connection: sqlite3.Connection):
+        cursor = connection.cursor()
+        
+        # Таблица сигналов
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {self.config['signals_table']} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                pair TEXT NOT NULL,
+                timeframe TEXT NOT NULL,
+                direction TEXT NOT NULL,
+                accuracy REAL NOT NULL,
+                entry_time TEXT NOT NULL,
+                hold_duration INTEGER NOT NULL,
+                signal_data TEXT NOT NULL,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                result TEXT DEFAULT 'pending',
+                profit REAL DEFAULT 0.0,
+                closed_at DATETIME NULL
+            )
+        """)
+        
+        # Горячие поля сигнала - отдельные столбцы, индикаторы и признаки - двоичные;
+        # в signal_data остаются только прочие ключи (в строках до этих столбцов - весь сигнал)
+        added = self._add_missing_columns(cursor, self.config['signals_table'], [
+            (column, column_type) for column, _, column_type in SIGNAL_VALUE_COLUMNS
+        ] + SIGNAL_BLOB_COLUMNS + [('storage_format', 'INTEGER')])
+        
+        if 'storage_format' in added and 'signal_time' not in added:
+            # Типизированные строки, записанные до столбца формата: signal_time есть только у них
             cursor.execute(f"""
-                CREATE TABLE IF NOT EXISTS {self.config['signals_table']} (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    pair TEXT NOT NULL,
-                    timeframe TEXT NOT NULL,
-                    direction TEXT NOT NULL,
-                    accuracy REAL NOT NULL,
-                    entry_time TEXT NOT NULL,
-                    hold_duration INTEGER NOT NULL,
-                    signal_data TEXT NOT NULL,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    result TEXT DEFAULT 'pending',
-                    profit REAL DEFAULT 0.0,
-                    closed_at DATETIME NULL
-                )
+                UPDATE {self.config['signals_table']} SET storage_format = {SIGNAL_STORAGE_FORMAT}
+                WHERE signal_time IS NOT NULL
             """)
+        
+        # Рыночные данные: серия (пара, таймфрейм) - целое число, время - мс эпохи,
+        # снимок индикаторов - упакованный float64 по справочнику имен
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {self.config['market_series_table']} (
+                id INTEGER PRIMARY KEY,
+                pair TEXT NOT NULL,
+                timeframe TEXT NOT NULL,
+                UNIQUE(pair, timeframe)
+            )
+        """)
+        
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {self.config['indicator_names_table']} (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL UNIQUE
+            )
+        """)
+        
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {self.config['market_data_table']} (
+                series_id INTEGER NOT NULL,
+                timestamp_ms INTEGER NOT NULL,
+                open REAL NOT NULL,
+                high REAL NOT NULL,
+                low REAL NOT NULL,
+                close REAL NOT NULL,
+                volume REAL NOT NULL,
+                indicators BLOB NOT NULL,
+                PRIMARY KEY (series_id, timestamp_ms)
+            ) WITHOUT ROWID
+        """)
+        
+        # Таблица производительности: дневные итоги сигналов (поддерживаются триггерами)
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {self.config['performance_table']} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                date DATE NOT NULL,
+                total_signals INTEGER DEFAULT 0,
+                successful_signals INTEGER DEFAULT 0,
+                failed_signals INTEGER DEFAULT 0,
+                accuracy REAL DEFAULT 0.0,
+                avg_profit REAL DEFAULT 0.0,
+                best_pair TEXT NULL,
+                best_timeframe TEXT NULL,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(date)
+            )
+        """)
+        
+        self._add_missing_columns(cursor, self.config['performance_table'], PERFORMANCE_SUM_COLUMNS)
+        
+        # Агрегаты сигналов по дню (DATE(created_at)), паре и таймфрейму
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {self.config['aggregates_table']} (
+                date TEXT NOT NULL,
+                pair TEXT NOT NULL,
+                timeframe TEXT NOT NULL,
+                total_signals INTEGER NOT NULL DEFAULT 0,
+                successful_signals INTEGER NOT NULL DEFAULT 0,
+                failed_signals INTEGER NOT NULL DEFAULT 0,
+                success_profit_sum REAL NOT NULL DEFAULT 0.0,
+                accuracy_sum REAL NOT NULL DEFAULT 0.0,
+                PRIMARY KEY (date, pair, timeframe)
+            ) WITHOUT ROWID
+        """)
+        
+        self._create_aggregate_triggers(cursor)
+        
+        # Индексы для оптимизации
+        cursor.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_signals_pair_time 
+            ON {self.config['signals_table']} (pair, timeframe, created_at)
+        """)
+        
+        # Поиск сигналов для удаления по возрасту
+        cursor.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_signals_created_at 
+            ON {self.config['signals_table']} (created_at)
+        """)
+        
+        connection.commit()
+        
+    @staticmethod
+    def _add_missing_columns(cursor: sqlite3.Cursor, table: str, columns: List[Tuple[str, str]]) -> List[str]:
+        """Добавление столбцов, которых нет в таблице, созданной предыдущей версией; возвращает добавленные"""
+        existing = {row['name'] for row in cursor.execute(f"PRAGMA table_info({table})")}
+        added = []
+        for column, definition in columns:
+            if column not in existing:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+                added.append(column)
+        return added
+                
+    def _aggregate_upserts(self, row: str, sign: str) -> str:
+        """Добавление (sign = '+') или вычитание (sign = '-') строки сигнала row из агрегатов"""
+        columns = ', '.join(column for column, _ in AGGREGATE_COLUMNS)
+        values = ', '.join(f"{sign}{expression.format(row=row)}" for _, expression in AGGREGATE_COLUMNS)
+        updates = ', '.join(f"{column} = {column} + excluded.{column}" for column, _ in AGGREGATE_COLUMNS)
+        date = f"DATE({row}.created_at)"
+        
+        return f"""
+            INSERT INTO {self.config['aggregates_table']} (date, pair, timeframe, {columns})
+            VALUES ({date}, {row}.pair, {row}.timeframe, {values})
+            ON CONFLICT (date, pair, timeframe) DO UPDATE SET {updates};
             
-            # Таблица рыночных данных
-            cursor.execute(f"""
-                CREATE TABLE IF NOT EXISTS {self.config['market_data_table']} (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    pair TEXT NOT NULL,
-                    timeframe TEXT NOT NULL,
-                    timestamp DATETIME NOT NULL,
-                    open_price REAL NOT NULL,
-                    high_price REAL NOT NULL,
-                    low_price REAL NOT NULL,
-                    close_price REAL NOT NULL,
-                    volume REAL NOT NULL,
-                    indicators_data TEXT NOT NULL,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
+            INSERT INTO {self.config['performance_table']} (date, {columns})
+            VALUES ({date}, {values})
+            ON CONFLICT (date) DO UPDATE SET {updates};
             
-            # Таблица производительности
-            cursor.execute(f"""
-                CREATE TABLE IF NOT EXISTS {self.config['performance_table']} (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    date DATE NOT NULL,
-                    total_signals INTEGER DEFAULT 0,
-                    successful_signals INTEGER DEFAULT 0,
-                    failed_signals INTEGER DEFAULT 0,
-                    accuracy REAL DEFAULT 0.0,
-                    avg_profit REAL DEFAULT 0.0,
-                    best_pair TEXT NULL,
-                    best_timeframe TEXT NULL,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(date)
-                )
-            """)
+            {self._performance_derived_sql(date)};
+        """
+        
+    def _performance_derived_sql(self, date: str) -> str:
+        """Пересчет производных столбцов дневной строки: точность, средняя прибыль, лучшие пара и таймфрейм"""
+        def best(column: str) -> str:
+            return f"""(
+                SELECT {column} FROM {self.config['aggregates_table']}
+                WHERE date = {self.config['performance_table']}.date
+                GROUP BY {column}
+                HAVING SUM(total_signals) > 0
+                ORDER BY SUM(successful_signals) * 1.0 / SUM(total_signals) DESC,
+                         SUM(success_profit_sum) / SUM(total_signals) DESC
+                LIMIT 1
+            )"""
             
-            # Индексы для оптимизации
-            cursor.execute(f"""
-                CREATE INDEX IF NOT EXISTS idx_signals_pair_time 
-                ON {self.config['signals_table']} (pair, timeframe, created_at)
-            """)
+        return f"""
+            UPDATE {self.config['performance_table']} SET
+                accuracy = CASE WHEN total_signals > 0 THEN successful_signals * 100.0 / total_signals ELSE 0.0 END,
+                avg_profit = CASE WHEN total_signals > 0 THEN success_profit_sum / total_signals ELSE 0.0 END,
+                best_pair = {best('pair')},
+                best_timeframe = {best('timeframe')}
+            WHERE date = {date}
+        """
+        
+    def _aggregate_cleanup_sql(self, row: str) -> str:
+        """Удаление опустевших строк агрегатов дня сигнала row"""
+        date = f"DATE({row}.created_at)"
+        return f"""
+            DELETE FROM {self.config['aggregates_table']} WHERE date = {date} AND total_signals = 0;
+            DELETE FROM {self.config['performance_table']} WHERE date = {date} AND total_signals = 0;
+        """
+        
+    def _create_aggregate_triggers(self, cursor: sqlite3.Cursor):
+        """Триггеры, поддерживающие агрегаты в одной транзакции с изменением сигнала
+        
+        Пересоздаются при каждом запуске, чтобы изменения их текста применялись к существующей базе.
+        """
+        table = self.config['signals_table']
+        
+        cursor.executescript(f"""
+            DROP TRIGGER IF EXISTS trg_{table}_aggregate_insert;
+            DROP TRIGGER IF EXISTS trg_{table}_aggregate_update;
+            DROP TRIGGER IF EXISTS trg_{table}_aggregate_delete;
             
-            cursor.execute(f"""
-                CREATE INDEX IF NOT EXISTS idx_market_data_pair_time 
-                ON {self.config['market_data_table']} (pair, timeframe, timestamp)
-            """)
+            CREATE TRIGGER trg_{table}_aggregate_insert AFTER INSERT ON {table}
+            BEGIN
+                {self._aggregate_upserts('NEW', '+')}
+            END;
+            
+            CREATE TRIGGER trg_{table}_aggregate_update
+            AFTER UPDATE OF pair, timeframe, accuracy, created_at, result, profit ON {table}
+            BEGIN
+                {self._aggregate_upserts('OLD', '-')}
+                {self._aggregate_upserts('NEW', '+')}
+                {self._aggregate_cleanup_sql('OLD')}
+            END;
             
-            self.connection.commit()
+            CREATE TRIGGER trg_{table}_aggregate_delete AFTER DELETE ON {table}
+            BEGIN
+                {self._aggregate_upserts('OLD', '-')}
+                {self._aggregate_cleanup_sql('OLD')}
+            END;
+        """)
+        
+    def _rebuild_aggregates_sync(self, connection: sqlite3.Connection) -> Dict[str, int]:
+        cursor = connection.cursor()
+        columns = ', '.join(column for column, _ in AGGREGATE_COLUMNS)
+        sums = ', '.join(f"SUM({expression.format(row=self.config['signals_table'])})" for _, expression in AGGREGATE_COLUMNS)
+        totals = ', '.join(f"SUM({column})" for column, _ in AGGREGATE_COLUMNS)
+        
+        cursor.execute(f"DELETE FROM {self.config['aggregates_table']}")
+        cursor.execute(f"DELETE FROM {self.config['performance_table']}")
+        
+        cursor.execute(f"""
+            INSERT INTO {self.config['aggregates_table']} (date, pair, timeframe, {columns})
+            SELECT DATE(created_at), pair, timeframe, {sums}
+            FROM {self.config['signals_table']}
+            GROUP BY DATE(created_at), pair, timeframe
+        """)
+        
+        cursor.execute(f"""
+            INSERT INTO {self.config['performance_table']} (date, {columns})
+            SELECT date, {totals} FROM {self.config['aggregates_table']} GROUP BY date
+        """)
+        
+        cursor.execute(self._performance_derived_sql(f"{self.config['performance_table']}.date"))
+        connection.commit()
+        
+        return {
+            'aggregates': cursor.execute(f"SELECT COUNT(*) FROM {self.config['aggregates_table']}").fetchone()[0],
+            'days': cursor.execute(f"SELECT COUNT(*) FROM {self.config['performance_table']}").fetchone()[0]
+        }
+        
+    async def rebuild_aggregates(self) -> Dict[str, int]:
+        """Пересчет агрегатов сигналов и дневных итогов по таблице сигналов"""
+        try:
+            counts = await self.worker.run('rebuild_aggregates', self._rebuild_aggregates_sync)
+            logger.info(f"🧮 Агрегаты сигналов пересчитаны: {counts['days']} дней, {counts['aggregates']} строк")
+            return counts
         except Exception as e:
-            logger.error(f"Ошибка создания таблиц: {e}")
-            raise
+            logger.error(f"Ошибка пересчета агрегатов: {e}")
+            return {}
+            
+    async def _backfill_aggregates(self):
+        """Заполнение агрегатов, если сигналы есть, а агрегаты еще не велись"""
+        def needs_backfill(connection: sqlite3.Connection) -> bool:
+            has_signals = connection.execute(f"SELECT 1 FROM {self.config['signals_table']} LIMIT 1").fetchone()
+            has_aggregates = connection.execute(f"SELECT 1 FROM {self.config['aggregates_table']} LIMIT 1").fetchone()
+            return has_signals is not None and has_aggregates is None
+            
+        if await self.worker.run('check_aggregates', needs_backfill):
+            await self.rebuild_aggregates()
             
     async def save_signal(self, signal_data: Dict[str, Any]) -> int:
         """Сохранение сигнала"""
         try:
-            async with self.lock:
-                cursor = self.connection.cursor()
-                
-                cursor.execute(f"""
-                    INSERT INTO {self.config['signals_table']} 
-                    (pair, timeframe, direction, accuracy, entry_time, hold_duration, signal_data)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    signal_data['pair'],
-                    signal_data['timeframe'],
-                    signal_data['direction'],
-                    signal_data['accuracy'],
-                    signal_data['entry_time'],
-                    signal_data['hold_duration'],
-                    json.dumps(signal_data)
-                ))
-                
-                signal_id = cursor.lastrowid
-                self.connection.commit()
-                
-                logger.info(f"💾 Сигнал сохранен: {signal_data['pair']} {signal_data['timeframe']}")
-                return signal_id
+            features = signal_data.get('features')
+            extra = {key: value for key, value in signal_data.items() if key not in SIGNAL_STORED_KEYS}
+            
+            row = (
+                signal_data['pair'],
+                signal_data['timeframe'],
+                signal_data['direction'],
+                signal_data['accuracy'],
+                signal_data['entry_time'],
+                signal_data['hold_duration'],
+                json.dumps(extra),
+                *(signal_data.get(key) for _, key, _ in SIGNAL_VALUE_COLUMNS),
+                await self._encode_indicators(signal_data.get('indicators')),
+                np.asarray(features, dtype=INDICATOR_DTYPE).tobytes() if features is not None else None,
+                SIGNAL_STORAGE_FORMAT
+            )
+            
+            columns = ['pair', 'timeframe', 'direction', 'accuracy', 'entry_time', 'hold_duration', 'signal_data'] + \
+                [column for column, _, _ in SIGNAL_VALUE_COLUMNS] + [column for column, _ in SIGNAL_BLOB_COLUMNS] + \
+                ['storage_format']
                 
+            # Идентификатор нужен сразу, поэтому строка ждет групповой фиксации
+            signal_id = await self.worker.write('save_signal', f"""
+                INSERT INTO {self.config['signals_table']} 
+                ({', '.join(columns)})
+                VALUES ({', '.join('?' * len(columns))})
+            """, row, returns_id=True)
+            
+            logger.info(f"💾 Сигнал сохранен: {signal_data['pair']} {signal_data['timeframe']}")
+            return signal_id
+            
         except Exception as e:
             logger.error(f"Ошибка сохранения сигнала: {e}")
             return 0
@@ -148,209 +403,531 @@ class Database:
     async def update_signal_result(self, signal_id: int, result: str, profit: float):
         """Обновление результата сигнала"""
         try:
-            async with self.lock:
-                cursor = self.connection.cursor()
+            await self.worker.write('update_signal_result', f"""
+                UPDATE {self.config['signals_table']} 
+                SET result = ?, profit = ?, closed_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, (result, profit, signal_id))
+            
+            logger.info(f"📊 Результат сигнала обновлен: {signal_id} -> {result}")
+            
+        except Exception as e:
+            logger.error(f"Ошибка обновления результата: {e}")
+            
+    async def _load_dictionaries(self):
+        """Загрузка справочников серий и имен индикаторов"""
+        def select(connection: sqlite3.Connection):
+            series = connection.execute(f"SELECT id, pair, timeframe FROM {self.config['market_series_table']}").fetchall()
+            names = connection.execute(f"SELECT id, name FROM {self.config['indicator_names_table']}").fetchall()
+            return series, names
+            
+        series, names = await self.worker.run('load_dictionaries', select)
+        
+        self.series_ids = {(row['pair'], row['timeframe']): row['id'] for row in series}
+        self.indicator_codec.load([(row['id'], row['name']) for row in names])
+        
+    async def _get_series_id(self, pair: str, timeframe: str) -> int:
+        """Id серии; новая серия записывается в справочник перед строками, которые на нее ссылаются"""
+        series_id = self.series_ids.get((pair, timeframe))
+        if series_id is None:
+            series_id = max(self.series_ids.values(), default=0) + 1
+            self.series_ids[(pair, timeframe)] = series_id
+            await self.worker.write('save_market_series', f"""
+                INSERT OR IGNORE INTO {self.config['market_series_table']} (id, pair, timeframe) VALUES (?, ?, ?)
+            """, (series_id, pair, timeframe), wait=False)
+        return series_id
+        
+    async def _encode_indicators(self, indicators: Dict[str, Any]) -> bytes:
+        """Упаковка снимка индикаторов; новые имена записываются в справочник"""
+        blob, added = self.indicator_codec.encode(indicators or {})
+        for column, name in added:
+            await self.worker.write('save_indicator_name', f"""
+                INSERT OR IGNORE INTO {self.config['indicator_names_table']} (id, name) VALUES (?, ?)
+            """, (column, name), wait=False)
+        return blob
+        
+    async def _market_data_row(self, market_data: Dict[str, Any]) -> tuple:
+        series_id = await self._get_series_id(market_data['pair'], market_data['timeframe'])
+        
+        return (
+            series_id,
+            to_epoch_ms(market_data['timestamp']),
+            market_data['open'],
+            market_data['high'],
+            market_data['low'],
+            market_data['close'],
+            market_data['volume'],
+            await self._encode_indicators(market_data['indicators'])
+        )
+        
+    async def save_market_data(self, market_data: Dict[str, Any]):
+        """Сохранение свечи и снимка индикаторов (повторная запись той же свечи заменяет ее)"""
+        try:
+            row = await self._market_data_row(market_data)
+            
+            # Снимки рынка пишутся пачками: по умолчанию без ожидания фиксации
+            await self.worker.write('save_market_data', f"""
+                INSERT OR REPLACE INTO {self.config['market_data_table']} 
+                (series_id, timestamp_ms, open, high, low, close, volume, indicators)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, row, wait=self.config['market_data_wait_commit'])
+            
+        except Exception as e:
+            logger.error(f"Ошибка сохранения рыночных данных: {e}")
+            
+    async def get_market_data_range(self, pair: str, timeframe: str, start_ms: Optional[int] = None,
+                                    end_ms: Optional[int] = None, indicator_names: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Свечи серии за [start_ms, end_ms) массивами NumPy
+        
+        Возвращает 'timestamp_ms' (int64), 'open'/'high'/'low'/'close'/'volume' (float64),
+        'indicators' (N x len(indicator_names)) и 'indicator_names'; без indicator_names - все известные индикаторы.
+        """
+        names = list(indicator_names) if indicator_names is not None else list(self.indicator_codec.names)
+        empty = {
+            'timestamp_ms': np.empty(0, dtype=np.int64),
+            **{column: np.empty(0) for column in CANDLE_COLUMNS},
+            'indicators': np.empty((0, len(names))),
+            'indicator_names': names
+        }
+        
+        try:
+            series_id = self.series_ids.get((pair, timeframe))
+            if series_id is None:
+                return empty
                 
+            def select(connection: sqlite3.Connection):
+                # Курсор без sqlite3.Row: кортежи разбираются в столбцы быстрее
+                cursor = connection.cursor()
+                cursor.row_factory = None
                 cursor.execute(f"""
-                    UPDATE {self.config['signals_table']} 
-                    SET result = ?, profit = ?, closed_at = CURRENT_TIMESTAMP
-                    WHERE id = ?
-                """, (result, profit, signal_id))
+                    SELECT timestamp_ms, open, high, low, close, volume, indicators
+                    FROM {self.config['market_data_table']}
+                    WHERE series_id = ? AND timestamp_ms >= ? AND timestamp_ms < ?
+                    ORDER BY timestamp_ms
+                """, (series_id, start_ms if start_ms is not None else -2 ** 63, end_ms if end_ms is not None else 2 ** 63 - 1))
+                return cursor.fetchall()
                 
-                self.connection.commit()
+            rows = await self.worker.run('get_market_data_range', select)
+            if not rows:
+                return empty
                 
-                logger.info(f"📊 Результат сигнала обновлен: {signal_id} -> {result}")
+            columns = list(zip(*rows))
+            result = {'timestamp_ms': np.array(columns[0], dtype=np.int64)}
+            for position, column in enumerate(CANDLE_COLUMNS, start=1):
+                result[column] = np.array(columns[position], dtype=np.float64)
                 
+            result['indicators'] = self.indicator_codec.decode_matrix(columns[6], names)
+            result['indicator_names'] = names
+            return result
+            
         except Exception as e:
-            logger.error(f"Ошибка обновления результата: {e}")
+            logger.error(f"Ошибка чтения рыночных данных {pair} {timeframe}: {e}")
+            return empty
+            
+    async def _migrate_legacy_market_data(self):
+        """Перенос строк старой таблицы market_data (индикаторы в JSON) в market_candles"""
+        legacy = self.config['legacy_market_data_table']
+        if legacy == self.config['market_data_table']:
+            return
             
-    async def save_market_data(self, market_data: Dict[str, Any]):
-        """Сохранение рыночных данных"""
         try:
-            async with self.lock:
-                cursor = self.connection.cursor()
+            def table_exists(connection: sqlite3.Connection) -> bool:
+                return connection.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (legacy,)
+                ).fetchone() is not None
                 
-                cursor.execute(f"""
-                    INSERT INTO {self.config['market_data_table']} 
-                    (pair, timeframe, timestamp, open_price, high_price, low_price, 
-                     close_price, volume, indicators_data)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    market_data['pair'],
-                    market_data['timeframe'],
-                    market_data['timestamp'],
-                    market_data['open'],
-                    market_data['high'],
-                    market_data['low'],
-                    market_data['close'],
-                    market_data['volume'],
-                    json.dumps(market_data['indicators'])
-                ))
+            if not await self.worker.run('legacy_market_data_exists', table_exists):
+                return
                 
-                self.connection.commit()
+            migrated = 0
+            last_id = 0
+            
+            while True:
+                def select(connection: sqlite3.Connection):
+                    return connection.execute(f"""
+                        SELECT id, pair, timeframe, timestamp, open_price, high_price, low_price,
+                               close_price, volume, indicators_data
+                        FROM {legacy}
+                        WHERE id > ?
+                        ORDER BY id
+                        LIMIT ?
+                    """, (last_id, LEGACY_MIGRATION_CHUNK)).fetchall()
+                    
+                rows = await self.worker.run('legacy_market_data_select', select)
+                if not rows:
+                    break
+                    
+                for row in rows:
+                    await self.worker.write('legacy_market_data_insert', f"""
+                        INSERT OR REPLACE INTO {self.config['market_data_table']} 
+                        (series_id, timestamp_ms, open, high, low, close, volume, indicators)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    """, await self._market_data_row({
+                        'pair': row['pair'],
+                        'timeframe': row['timeframe'],
+                        'timestamp': row['timestamp'],
+                        'open': row['open_price'],
+                        'high': row['high_price'],
+                        'low': row['low_price'],
+                        'close': row['close_price'],
+                        'volume': row['volume'],
+                        'indicators': json.loads(row['indicators_data'])
+                    }), wait=False)
+                    
+                last_id = rows[-1]['id']
+                migrated += len(rows)
                 
+            await self.worker.run('legacy_market_data_drop', lambda connection: connection.execute(f"DROP TABLE {legacy}"))
+            
+            logger.info(f"📦 Рыночные данные перенесены в компактный формат: {migrated} строк")
+            
         except Exception as e:
-            logger.error(f"Ошибка сохранения рыночных данных: {e}")
+            logger.error(f"Ошибка переноса рыночных данных: {e}")
             
     async def get_daily_stats(self, date: str = None) -> Dict[str, Any]:
-        """Получение дневной статистики"""
+        """Получение дневной статистики (строка дневных итогов, без просмотра сигналов)"""
         try:
             if not date:
                 date = datetime.now().strftime('%Y-%m-%d')
                 
-            async with self.lock:
-                cursor = self.connection.cursor()
-                
-                cursor.execute(f"""
-                    SELECT 
-                        COUNT(*) as total_signals,
-                        SUM(CASE WHEN result = 'success' THEN 1 ELSE 0 END) as successful_signals,
-                        SUM(CASE WHEN result = 'failed' THEN 1 ELSE 0 END) as failed_signals,
-                        AVG(CASE WHEN result = 'success' THEN profit ELSE 0 END) as avg_profit,
-                        AVG(accuracy) as avg_accuracy
-                    FROM {self.config['signals_table']}
-                    WHERE DATE(created_at) = ?
+            def select(connection: sqlite3.Connection):
+                cursor = connection.execute(f"""
+                    SELECT total_signals, successful_signals, failed_signals, accuracy, avg_profit, accuracy_sum
+                    FROM {self.config['performance_table']}
+                    WHERE date = ?
                 """, (date,))
                 
-                row = cursor.fetchone()
+                return cursor.fetchone()
+                
+            row = await self.worker.run('get_daily_stats', select)
+            
+            if row and row['total_signals']:
+                total = row['total_signals']
+                
+                return {
+                    'date': date,
+                    'total_signals': total,
+                    'successful_signals': row['successful_signals'],
+                    'failed_signals': row['failed_signals'],
+                    'accuracy': row['accuracy'],
+                    'avg_profit': row['avg_profit'],
+                    'avg_accuracy': row['accuracy_sum'] / total
+                }
+            else:
+                return {
+                    'date': date,
+                    'total_signals': 0,
+                    'successful_signals': 0,
+                    'failed_signals': 0,
+                    'accuracy': 0.0,
+                    'avg_profit': 0.0,
+                    'avg_accuracy': 0.0
+                }
                 
-                if row:
-                    total = row['total_signals'] or 0
-                    successful = row['successful_signals'] or 0
-                    
-                    return {
-                        'date': date,
-                        'total_signals': total,
-                        'successful_signals': successful,
-                        'failed_signals': row['failed_signals'] or 0,
-                        'accuracy': (successful / total * 100) if total > 0 else 0.0,
-                        'avg_profit': row['avg_profit'] or 0.0,
-                        'avg_accuracy': row['avg_accuracy'] or 0.0
-                    }
-                else:
-                    return {
-                        'date': date,
-                        'total_signals': 0,
-                        'successful_signals': 0,
-                        'failed_signals': 0,
-                        'accuracy': 0.0,
-                        'avg_profit': 0.0,
-                        'avg_accuracy': 0.0
-                    }
-                    
         except Exception as e:
             logger.error(f"Ошибка получения статистики: {e}")
             return {}
             
     async def get_best_pairs(self, limit: int = 5) -> List[Dict[str, Any]]:
-        """Получение лучших торговых пар"""
+        """Получение лучших торговых пар (по агрегатам текущего дня)"""
         try:
-            async with self.lock:
-                cursor = self.connection.cursor()
-                
-                cursor.execute(f"""
+            def select(connection: sqlite3.Connection):
+                cursor = connection.execute(f"""
                     SELECT 
                         pair,
-                        COUNT(*) as total_signals,
-                        SUM(CASE WHEN result = 'success' THEN 1 ELSE 0 END) as successful_signals,
-                        AVG(CASE WHEN result = 'success' THEN profit ELSE 0 END) as avg_profit
-                    FROM {self.config['signals_table']}
-                    WHERE DATE(created_at) = DATE('now')
+                        SUM(total_signals) as total_signals,
+                        SUM(successful_signals) as successful_signals,
+                        SUM(success_profit_sum) / SUM(total_signals) as avg_profit
+                    FROM {self.config['aggregates_table']}
+                    WHERE date = DATE('now')
                     GROUP BY pair
-                    HAVING total_signals > 0
-                    ORDER BY (successful_signals * 1.0 / total_signals) DESC, avg_profit DESC
+                    HAVING SUM(total_signals) > 0
+                    ORDER BY (SUM(successful_signals) * 1.0 / SUM(total_signals)) DESC, avg_profit DESC
                     LIMIT ?
                 """, (limit,))
                 
-                rows = cursor.fetchall()
-                
-                result = []
-                for row in rows:
-                    total = row['total_signals']
-                    successful = row['successful_signals']
-                    accuracy = (successful / total * 100) if total > 0 else 0.0
-                    
-                    result.append({
-                        'pair': row['pair'],
-                        'total_signals': total,
-                        'successful_signals': successful,
-                        'accuracy': accuracy,
-                        'avg_profit': row['avg_profit'] or 0.0
-                    })
+                return cursor.fetchall()
                 
-                return result
+            rows = await self.worker.run('get_best_pairs', select)
+            
+            result = []
+            for row in rows:
+                total = row['total_signals']
+                successful = row['successful_signals']
+                accuracy = (successful / total * 100) if total > 0 else 0.0
                 
+                result.append({
+                    'pair': row['pair'],
+                    'total_signals': total,
+                    'successful_signals': successful,
+                    'accuracy': accuracy,
+                    'avg_profit': row['avg_profit'] or 0.0
+                })
+            
+            return result
+            
         except Exception as e:
             logger.error(f"Ошибка получения лучших пар: {e}")
             return []
             
-    async def get_recent_signals(self, limit: int = 10) -> List[Dict[str, Any]]:
-        """Получение последних сигналов"""
-        try:
-            async with self.lock:
-                cursor = self.connection.cursor()
+    def _signal_from_row(self, row: sqlite3.Row, details: bool) -> Dict[str, Any]:
+        """Сигнал из строки таблицы; индикаторы, признаки и signal_data разбираются только при details"""
+        signal = {
+            'id': row['id'],
+            'pair': row['pair'],
+            'timeframe': row['timeframe'],
+            'direction': row['direction'],
+            'accuracy': row['accuracy'],
+            'entry_time': row['entry_time'],
+            'hold_duration': row['hold_duration'],
+            'result': row['result'],
+            'profit': row['profit'],
+            'created_at': row['created_at']
+        }
+        
+        # Строка, записанная до типизированных столбцов, хранит весь сигнал в JSON
+        legacy = not row['storage_format']
+        stored = json.loads(row['signal_data']) if legacy or details else None
+        
+        for column, key, _ in SIGNAL_VALUE_COLUMNS:
+            signal[key] = stored.get(key) if legacy else row[column]
+            
+        if details:
+            if legacy:
+                signal['indicators'] = stored.get('indicators') or {}
+                signal['signal_data'] = stored
+            else:
+                signal['indicators'] = self.indicator_codec.decode(row['indicators'])
+                features = np.frombuffer(row['features'], dtype=INDICATOR_DTYPE).tolist() if row['features'] else None
                 
-                cursor.execute(f"""
+                signal['signal_data'] = {
+                    **stored,
+                    **{key: signal[key] for key in SIGNAL_STORED_KEYS if key in signal},
+                    'indicators': signal['indicators'],
+                    'features': features
+                }
+                
+        return signal
+        
+    async def get_recent_signals(self, limit: int = 10, details: bool = False) -> List[Dict[str, Any]]:
+        """Получение последних сигналов
+        
+        Типизированные поля читаются из столбцов; details=True добавляет 'indicators' и полный 'signal_data'.
+        """
+        try:
+            def select(connection: sqlite3.Connection):
+                cursor = connection.execute(f"""
                     SELECT * FROM {self.config['signals_table']}
                     ORDER BY created_at DESC
                     LIMIT ?
                 """, (limit,))
                 
-                rows = cursor.fetchall()
-                
-                result = []
-                for row in rows:
-                    signal_data = json.loads(row['signal_data'])
-                    result.append({
-                        'id': row['id'],
-                        'pair': row['pair'],
-                        'timeframe': row['timeframe'],
-                        'direction': row['direction'],
-                        'accuracy': row['accuracy'],
-                        'entry_time': row['entry_time'],
-                        'hold_duration': row['hold_duration'],
-                        'result': row['result'],
-                        'profit': row['profit'],
-                        'created_at': row['created_at'],
-                        'signal_data': signal_data
-                    })
-                
-                return result
+                return cursor.fetchall()
                 
+            rows = await self.worker.run('get_recent_signals', select)
+            
+            return [self._signal_from_row(row, details) for row in rows]
+            
         except Exception as e:
             logger.error(f"Ошибка получения последних сигналов: {e}")
             return []
             
-    async def _cleanup_old_data(self):
-        """Очистка старых данных"""
+    async def get_pending_signals(self) -> List[Dict[str, Any]]:
+        """Сигналы без результата (для закрытия после перезапуска) с полным signal_data"""
         try:
-            async with self.lock:
-                cursor = self.connection.cursor()
+            def select(connection: sqlite3.Connection):
+                return connection.execute(f"""
+                    SELECT * FROM {self.config['signals_table']}
+                    WHERE result = 'pending'
+                    ORDER BY id
+                """).fetchall()
                 
-                # Удаление старых сигналов (старше 30 дней)
-                cursor.execute(f"""
-                    DELETE FROM {self.config['signals_table']}
-                    WHERE created_at < datetime('now', '-30 days')
-                """)
+            rows = await self.worker.run('get_pending_signals', select)
+            return [self._signal_from_row(row, details=True) for row in rows]
+            
+        except Exception as e:
+            logger.error(f"Ошибка получения открытых сигналов: {e}")
+            return []
+            
+    async def get_signal(self, signal_id: int) -> Optional[Dict[str, Any]]:
+        """Сигнал по id со снимком индикаторов и полным signal_data"""
+        try:
+            def select(connection: sqlite3.Connection):
+                return connection.execute(f"""
+                    SELECT * FROM {self.config['signals_table']} WHERE id = ?
+                """, (signal_id,)).fetchone()
                 
-                # Удаление старых рыночных данных (старше 7 дней)
-                cursor.execute(f"""
-                    DELETE FROM {self.config['market_data_table']}
-                    WHERE created_at < datetime('now', '-7 days')
-                """)
+            row = await self.worker.run('get_signal', select)
+            return self._signal_from_row(row, details=True) if row else None
+            
+        except Exception as e:
+            logger.error(f"Ошибка получения сигнала {signal_id}: {e}")
+            return None
+            
+    async def get_training_data(self, limit: int = 50000, feature_store=None) -> Tuple[np.ndarray, np.ndarray]:
+        """Признаки и результаты закрытых сигналов для обучения модели
+        
+        Возвращает матрицу (N x FEATURE_COUNT) и метки (1 - success, 0 - failed).
+        Признаки берутся из хранилища признаков; сигналы, которых там нет, - из столбцов сигнала.
+        """
+        try:
+            def select_results(connection: sqlite3.Connection):
+                cursor = connection.execute(f"""
+                    SELECT id, result FROM {self.config['signals_table']}
+                    WHERE result IN ('success', 'failed')
+                    ORDER BY created_at DESC
+                    LIMIT ?
+                """, (limit,))
                 
-                self.connection.commit()
+                return cursor.fetchall()
                 
-                logger.info("🗑 Очистка старых данных выполнена")
+            rows = await self.worker.run('get_training_results', select_results)
+            
+            signal_ids = np.array([row['id'] for row in rows], dtype=np.int64)
+            labels = np.array([1.0 if row['result'] == 'success' else 0.0 for row in rows], dtype=np.float64)
+            features = np.zeros((len(rows), FEATURE_COUNT), dtype=FEATURE_DTYPE)
+            
+            found = feature_store.fill(signal_ids, features) if feature_store else np.zeros(len(rows), dtype=bool)
+            missing = [int(signal_ids[row]) for row in np.flatnonzero(~found)]
+            
+            if missing:
+                def select_signal_data(connection: sqlite3.Connection):
+                    signal_rows = []
+                    
+                    for start in range(0, len(missing), SQL_PARAMETER_CHUNK):
+                        chunk = missing[start:start + SQL_PARAMETER_CHUNK]
+                        cursor = connection.execute(f"""
+                            SELECT id, features, indicators, current_price, storage_format, signal_data
+                            FROM {self.config['signals_table']}
+                            WHERE id IN ({','.join('?' * len(chunk))})
+                        """, chunk)
+                        signal_rows.extend(cursor.fetchall())
+                        
+                    return signal_rows
+                    
+                rows_by_id = {signal_id: row for row, signal_id in enumerate(signal_ids)}
                 
+                for row in await self.worker.run('get_training_signal_data', select_signal_data):
+                    if not row['storage_format']:
+                        signal = json.loads(row['signal_data'])
+                    elif row['features']:
+                        signal = {'features': np.frombuffer(row['features'], dtype=INDICATOR_DTYPE)}
+                    else:
+                        signal = {'current_price': row['current_price'], 'indicators': self.indicator_codec.decode(row['indicators'])}
+                        
+                    features[rows_by_id[row['id']]] = features_from_signal(signal)
+                    
+            return features, labels
+            
         except Exception as e:
-            logger.error(f"Ошибка очистки данных: {e}")
+            logger.error(f"Ошибка получения обучающей выборки: {e}")
+            return np.empty((0, FEATURE_COUNT), dtype=FEATURE_DTYPE), np.empty(0)
+            
+    async def delete_expired_signals(self, days: int, limit: int) -> int:
+        """Удаление не больше limit сигналов старше days дней; возвращает число удаленных"""
+        def delete(connection: sqlite3.Connection) -> int:
+            cursor = connection.execute(f"""
+                DELETE FROM {self.config['signals_table']}
+                WHERE id IN (
+                    SELECT id FROM {self.config['signals_table']}
+                    WHERE created_at < datetime('now', ?)
+                    LIMIT ?
+                )
+            """, (f'-{days} days', limit))
             
+            connection.commit()
+            return cursor.rowcount
+            
+        return await self.worker.run('delete_expired_signals', delete)
+        
+    async def delete_expired_market_data(self, days: int, limit: int) -> int:
+        """Удаление не больше limit свечей старше days дней (по ключу series_id, timestamp_ms)"""
+        # Время свечей - UTC, поэтому граница считается от time.time(), а не от местного времени
+        cutoff = int((time.time() - days * 86400) * 1000)
+        
+        def delete(connection: sqlite3.Connection) -> int:
+            cursor = connection.execute(f"""
+                DELETE FROM {self.config['market_data_table']}
+                WHERE (series_id, timestamp_ms) IN (
+                    SELECT series_id, timestamp_ms FROM {self.config['market_data_table']}
+                    WHERE series_id IN (SELECT id FROM {self.config['market_series_table']})
+                    AND timestamp_ms < ?
+                    LIMIT ?
+                )
+            """, (cutoff, limit))
+            
+            connection.commit()
+            return cursor.rowcount
+            
+        return await self.worker.run('delete_expired_market_data', delete)
+        
+    async def get_auto_vacuum_mode(self) -> int:
+        """Режим auto_vacuum: 0 - NONE, 1 - FULL, 2 - INCREMENTAL"""
+        return await self.worker.run('auto_vacuum_mode', lambda connection: connection.execute("PRAGMA auto_vacuum").fetchone()[0])
+        
+    async def convert_to_incremental_vacuum(self) -> int:
+        """Перевод базы в auto_vacuum = INCREMENTAL: новый режим вступает в силу только после VACUUM"""
+        def convert(connection: sqlite3.Connection) -> int:
+            connection.executescript("PRAGMA auto_vacuum = INCREMENTAL; VACUUM;")
+            return connection.execute("PRAGMA auto_vacuum").fetchone()[0]
+            
+        return await self.worker.run('convert_auto_vacuum', convert)
+        
+    async def incremental_vacuum(self, pages: int) -> Dict[str, Any]:
+        """Возврат не больше pages свободных страниц файлу (только при auto_vacuum = INCREMENTAL)"""
+        def vacuum(connection: sqlite3.Connection) -> Dict[str, Any]:
+            mode = connection.execute("PRAGMA auto_vacuum").fetchone()[0]
+            before = connection.execute("PRAGMA freelist_count").fetchone()[0]
+            
+            if mode == 2:
+                # execute выполняет только первый шаг прагмы (одна страница); executescript - до конца
+                connection.executescript(f"PRAGMA incremental_vacuum({int(pages)})")
+                
+            after = connection.execute("PRAGMA freelist_count").fetchone()[0]
+            return {'incremental': mode == 2, 'freed_pages': before - after, 'free_pages': after}
+            
+        return await self.worker.run('incremental_vacuum', vacuum)
+        
+    def get_statistics(self) -> Dict[str, Any]:
+        """Очередь, время запросов и групповые фиксации потока базы данных"""
+        return self.worker.get_statistics() if self.worker else {}
+        
     async def close(self):
         """Закрытие соединения с базой данных"""
         try:
-            if self.connection:
-                self.connection.close()
+            if self.worker:
+                await self.worker.stop()
                 logger.info("📊 Соединение с БД закрыто")
         except Exception as e:
             logger.error(f"Ошибка закрытия БД: {e}")
+
+
+async def _rebuild_aggregates_main():
+    database = Database()
+    await database.initialize()
+    print(json.dumps(await database.rebuild_aggregates()))
+    await database.close()
+
+
+async def _convert_vacuum_main():
+    database = Database()
+    await database.initialize()
+    
+    mode = await database.get_auto_vacuum_mode()
+    if mode == 2:
+        print("auto_vacuum уже INCREMENTAL")
+    else:
+        started = time.perf_counter()
+        mode = await database.convert_to_incremental_vacuum()
+        print(f"auto_vacuum = {mode}, VACUUM за {time.perf_counter() - started:.1f}с")
+        
+    await database.close()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ['vacuum']:
+        # Однократный перевод базы в auto_vacuum = INCREMENTAL (при остановленном боте)
+        asyncio.run(_convert_vacuum_main())
+    else:
+        # Пересчет агрегатов сигналов и дневных итогов по таблице сигналов
+        asyncio.run(_rebuild_aggregates_main())
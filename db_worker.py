@@ -0,0 +1,349 @@
+"""
+Поток базы данных
+Соединение SQLite принадлежит отдельному потоку; цикл событий ставит запросы в очередь и ожидает future.
+Записи накапливаются и фиксируются группой: одна транзакция на batch_max_rows строк или batch_max_delay_ms
+"""
+
+import asyncio
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Any, Callable, Optional
+
+from globals import DATABASE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseWorker:
+    """Выполнение запросов SQLite в выделенном потоке
+
+    Запросы выполняются по одному в порядке постановки, поэтому запись и чтение
+    не требуют блокировок, а цикл событий не ждет диска.
+
+    Записи (write) не фиксируются по одной: они копятся до batch_max_rows строк или
+    batch_max_delay_ms от первой записи и выполняются одной транзакцией - подряд идущие
+    одинаковые запросы через executemany. Запись, результат которой ожидается, фиксируется
+    сразу, как только очередь опустела, вместе со всем накопленным. Перед любым запросом run накопленные записи
+    фиксируются, поэтому чтение всегда видит ранее поставленные записи.
+    """
+
+    def __init__(self, db_path: str, name: str = 'sqlite-worker', config: Dict[str, Any] = None):
+        self.db_path = db_path
+        self.name = name
+        self.config = config or DATABASE_CONFIG
+
+        self.batch_max_rows = self.config['batch_max_rows']
+        self.batch_max_delay = self.config['batch_max_delay_ms'] / 1000
+        self.pending = []  # записи, ожидающие фиксации
+        self.pending_since = None
+
+        self.queue = queue.Queue()
+        self.thread = None
+        self.connection = None
+
+        self.stats_lock = threading.Lock()
+        self.stats = {
+            'requests': 0,
+            'errors': 0,
+            'max_queue_depth': 0
+        }
+        self.query_stats = {}  # имя запроса -> время ожидания в очереди и выполнения
+        self.flush_stats = {
+            'flushes': 0,
+            'rows': 0,
+            'max_rows': 0,
+            'total_ms': 0.0,
+            'max_ms': 0.0,
+            'failed_batches': 0,
+            'reasons': {'rows': 0, 'delay': 0, 'waiter': 0, 'read': 0, 'stop': 0}
+        }
+
+    def start(self):
+        """Запуск потока и открытие соединения"""
+        ready = threading.Event()
+        startup = {}
+
+        self.thread = threading.Thread(target=self._run, args=(ready, startup), name=self.name, daemon=True)
+        self.thread.start()
+        ready.wait()
+
+        if 'error' in startup:
+            raise startup['error']
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.db_path)
+        connection.row_factory = sqlite3.Row
+
+        # auto_vacuum применяется только к базе без таблиц, поэтому задается первым
+        connection.execute(f"PRAGMA auto_vacuum = {self.config['auto_vacuum']}")
+
+        # WAL: читатели не блокируют запись; synchronous=NORMAL в WAL синхронизирует диск
+        # только на контрольных точках - сбой питания может потерять последние транзакции, но не повредить базу
+        connection.execute(f"PRAGMA journal_mode = {self.config['journal_mode']}")
+        connection.execute(f"PRAGMA synchronous = {self.config['synchronous']}")
+        return connection
+
+    def _run(self, ready: threading.Event, startup: Dict[str, Any]):
+        try:
+            self.connection = self._connect()
+        except Exception as e:
+            startup['error'] = e
+            ready.set()
+            return
+
+        ready.set()
+
+        while True:
+            timeout = None
+            if self.pending:
+                timeout = max(self.pending_since + self.batch_max_delay - time.perf_counter(), 0)
+
+            try:
+                request = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                self._flush('delay')
+                continue
+
+            if request is None:
+                break
+
+            if request[0] == 'write':
+                self._enqueue_write(request[1:])
+            else:
+                self._flush('read')
+                self._execute(*request[1:])
+
+        self._flush('stop')
+        self.connection.close()
+        self.connection = None
+
+    def _execute(self, name: str, fn: Callable, future: asyncio.Future, loop: asyncio.AbstractEventLoop, enqueued: float):
+        started = time.perf_counter()
+        result = None
+        error = None
+
+        try:
+            result = fn(self.connection)
+        except Exception as e:
+            error = e
+            try:
+                self.connection.rollback()
+            except Exception:
+                pass
+
+        self._record(name, started - enqueued, time.perf_counter() - started, error is not None)
+
+        try:
+            loop.call_soon_threadsafe(self._resolve, future, result, error)
+        except RuntimeError:
+            # Цикл событий уже закрыт - результат некому передать
+            pass
+
+    def _enqueue_write(self, request: tuple):
+        if not self.pending:
+            self.pending_since = time.perf_counter()
+        self.pending.append(request)
+
+        if len(self.pending) >= self.batch_max_rows:
+            self._flush('rows')
+        elif request[4] is not None and self.queue.empty():
+            # Запись ждет вызывающий код, а группировать больше не с чем - фиксация без задержки
+            self._flush('waiter')
+
+    def _flush(self, reason: str):
+        """Фиксация накопленных записей одной транзакцией"""
+        if not self.pending:
+            return
+
+        batch, self.pending = self.pending, []
+        started = time.perf_counter()
+
+        try:
+            results = self._write_batch(batch)
+            self.connection.commit()
+            errors = [None] * len(batch)
+
+        except Exception as e:
+            try:
+                self.connection.rollback()
+            except Exception:
+                pass
+
+            # Одна ошибочная запись не должна отменять остальные - повтор по одной
+            logger.error(f"Ошибка групповой записи (строк: {len(batch)}), повтор по одной: {e}")
+            with self.stats_lock:
+                self.flush_stats['failed_batches'] += 1
+            results, errors = self._write_one_by_one(batch)
+
+        elapsed = time.perf_counter() - started
+        self._record_flush(reason, len(batch), elapsed)
+
+        for request, result, error in zip(batch, results, errors):
+            name, sql, params, returns_id, future, loop, enqueued = request
+            self._record(name, started - enqueued, elapsed / len(batch), error is not None)
+
+            if future is None:
+                if error is not None:
+                    logger.error(f"Ошибка записи {name}: {error}")
+                continue
+
+            try:
+                loop.call_soon_threadsafe(self._resolve, future, result, error)
+            except RuntimeError:
+                pass
+
+    def _write_batch(self, batch: List[tuple]) -> List[Optional[int]]:
+        """Выполнение записей без фиксации: подряд идущие одинаковые запросы - одним executemany"""
+        cursor = self.connection.cursor()
+        results = []
+        start = 0
+
+        while start < len(batch):
+            _, sql, params, returns_id, *_ = batch[start]
+
+            if returns_id:
+                # executemany не возвращает rowid каждой строки
+                cursor.execute(sql, params)
+                results.append(cursor.lastrowid)
+                start += 1
+                continue
+
+            end = start + 1
+            while end < len(batch) and batch[end][1] == sql and not batch[end][3]:
+                end += 1
+
+            cursor.executemany(sql, [request[2] for request in batch[start:end]])
+            results.extend([None] * (end - start))
+            start = end
+
+        return results
+
+    def _write_one_by_one(self, batch: List[tuple]) -> tuple:
+        results = []
+        errors = []
+
+        for request in batch:
+            try:
+                result = self._write_batch([request])[0]
+                self.connection.commit()
+                results.append(result)
+                errors.append(None)
+            except Exception as e:
+                try:
+                    self.connection.rollback()
+                except Exception:
+                    pass
+                results.append(None)
+                errors.append(e)
+
+        return results, errors
+
+    def _record_flush(self, reason: str, rows: int, elapsed: float):
+        elapsed_ms = elapsed * 1000
+        with self.stats_lock:
+            stats = self.flush_stats
+            stats['flushes'] += 1
+            stats['rows'] += rows
+            stats['max_rows'] = max(stats['max_rows'], rows)
+            stats['total_ms'] += elapsed_ms
+            stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+            stats['reasons'][reason] += 1
+
+    @staticmethod
+    def _resolve(future: asyncio.Future, result: Any, error: Exception):
+        if future.cancelled():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def _record(self, name: str, wait: float, elapsed: float, failed: bool):
+        with self.stats_lock:
+            self.stats['requests'] += 1
+            if failed:
+                self.stats['errors'] += 1
+
+            stats = self.query_stats.get(name)
+            if stats is None:
+                stats = self.query_stats[name] = {'count': 0, 'wait_ms': 0.0, 'total_ms': 0.0, 'max_ms': 0.0}
+
+            elapsed_ms = elapsed * 1000
+            stats['count'] += 1
+            stats['wait_ms'] += wait * 1000
+            stats['total_ms'] += elapsed_ms
+            stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+
+    def _put(self, request: tuple):
+        if self.thread is None or not self.thread.is_alive():
+            raise RuntimeError("Поток базы данных не запущен")
+
+        self.queue.put(request)
+
+        depth = self.queue.qsize()
+        if depth > self.stats['max_queue_depth']:
+            with self.stats_lock:
+                self.stats['max_queue_depth'] = max(self.stats['max_queue_depth'], depth)
+
+    async def run(self, name: str, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Выполнение fn(connection) в потоке базы данных (после фиксации накопленных записей)"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._put(('run', name, fn, future, loop, time.perf_counter()))
+        return await future
+
+    async def write(self, name: str, sql: str, params: tuple, returns_id: bool = False, wait: bool = True) -> Optional[int]:
+        """Групповая запись одной строки
+
+        returns_id - вернуть lastrowid (такая строка выполняется отдельным execute в той же транзакции).
+        wait=False - не ждать фиксации: ошибка записи только попадает в лог.
+        """
+        if not wait:
+            self._put(('write', name, sql, params, returns_id, None, None, time.perf_counter()))
+            return None
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._put(('write', name, sql, params, returns_id, future, loop, time.perf_counter()))
+        return await future
+
+    async def stop(self):
+        """Выполнение оставшихся запросов и остановка потока"""
+        if self.thread is None:
+            return
+
+        self.queue.put(None)
+        await asyncio.get_running_loop().run_in_executor(None, self.thread.join)
+        self.thread = None
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Глубина очереди, время запросов и групповые фиксации"""
+        with self.stats_lock:
+            flushes = self.flush_stats['flushes']
+            return {
+                **self.stats,
+                'queue_depth': self.queue.qsize(),
+                'pending_writes': len(self.pending),
+                'flush': {
+                    'flushes': flushes,
+                    'rows': self.flush_stats['rows'],
+                    'avg_rows': self.flush_stats['rows'] / flushes if flushes else 0.0,
+                    'max_rows': self.flush_stats['max_rows'],
+                    'avg_ms': self.flush_stats['total_ms'] / flushes if flushes else 0.0,
+                    'max_ms': self.flush_stats['max_ms'],
+                    'failed_batches': self.flush_stats['failed_batches'],
+                    'reasons': dict(self.flush_stats['reasons'])
+                },
+                'queries': {
+                    name: {
+                        'count': stats['count'],
+                        'avg_wait_ms': stats['wait_ms'] / stats['count'],
+                        'avg_ms': stats['total_ms'] / stats['count'],
+                        'max_ms': stats['max_ms']
+                    }
+                    for name, stats in self.query_stats.items()
+                }
+            }
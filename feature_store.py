@@ -0,0 +1,181 @@
+"""
+Хранилище признаков сигналов
+Append-only колонки фиксированной ширины: признаки ИИ и версия модели на момент сигнала
+"""
+
+import json
+import logging
+import os
+from typing import Dict, Any, Optional
+
+import numpy as np
+
+from globals import FEATURE_STORE_CONFIG
+from ai_features import FEATURE_NAMES, FEATURE_COUNT, FEATURE_DTYPE
+
+logger = logging.getLogger(__name__)
+
+FEATURE_STORE_VERSION = 1
+
+SCHEMA_FILE = 'schema.json'
+
+# Колонки: имя, тип, ширина записи (значений)
+COLUMNS = [
+    ('signal_id', np.dtype('<i8'), 1),
+    ('timestamp_ms', np.dtype('<i8'), 1),
+    ('model_version', np.dtype('<i4'), 1),
+    ('features', np.dtype(FEATURE_DTYPE).newbyteorder('<'), FEATURE_COUNT)
+]
+
+
+class FeatureStore:
+    """Признаки сигналов по signal_id и времени
+
+    Записи добавляются в порядке сохранения сигналов, поэтому signal_id и время не убывают,
+    и выборка диапазона или набора сигналов - бинарный поиск по отображенной в память колонке.
+    """
+
+    def __init__(self, directory: str = None, flush_every: int = None):
+        self.directory = directory or FEATURE_STORE_CONFIG['path']
+        self.flush_every = flush_every or FEATURE_STORE_CONFIG['flush_every']
+
+        self.buffers = {name: [] for name, _, _ in COLUMNS}
+        self.buffered = 0
+        self.rows = 0
+        self.last_signal_id = 0
+
+    def _column_path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.col")
+
+    def open(self):
+        """Открытие хранилища: проверка схемы и выравнивание колонок после сбоя"""
+        os.makedirs(self.directory, exist_ok=True)
+        schema_path = os.path.join(self.directory, SCHEMA_FILE)
+
+        schema = {
+            'version': FEATURE_STORE_VERSION,
+            'features': FEATURE_NAMES,
+            'columns': [[name, dtype.str, width] for name, dtype, width in COLUMNS]
+        }
+
+        if os.path.exists(schema_path):
+            with open(schema_path, 'r') as f:
+                stored = json.load(f)
+            if stored != schema:
+                raise ValueError(f"Схема хранилища признаков не совпадает: {schema_path}")
+        else:
+            with open(schema_path, 'w') as f:
+                json.dump(schema, f)
+
+        # Незавершенная запись оставляет колонки разной длины - лишний хвост отбрасывается
+        counts = []
+        for name, dtype, width in COLUMNS:
+            path = self._column_path(name)
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            counts.append(size // (dtype.itemsize * width))
+
+        self.rows = min(counts)
+        for name, dtype, width in COLUMNS:
+            path = self._column_path(name)
+            with open(path, 'ab') as f:
+                f.truncate(self.rows * dtype.itemsize * width)
+
+        if self.rows:
+            self.last_signal_id = int(self._column('signal_id')[-1])
+
+        logger.info(f"🗃 Хранилище признаков открыто: {self.rows} сигналов")
+
+    def append(self, signal_id: int, timestamp_ms: int, model_version: int, features: np.ndarray):
+        """Добавление признаков сигнала"""
+        if signal_id <= self.last_signal_id:
+            logger.warning(f"Сигнал {signal_id} уже есть в хранилище признаков")
+            return
+
+        self.buffers['signal_id'].append(signal_id)
+        self.buffers['timestamp_ms'].append(timestamp_ms)
+        self.buffers['model_version'].append(model_version)
+        self.buffers['features'].append(np.asarray(features, dtype=FEATURE_DTYPE))
+        self.last_signal_id = signal_id
+        self.buffered += 1
+
+        if self.buffered >= self.flush_every:
+            self.flush()
+
+    def append_signal(self, signal_id: int, signal: Dict[str, Any]):
+        """Добавление признаков из словаря сигнала ('features', 'model_version', 'timestamp')"""
+        try:
+            features = signal.get('features')
+            if not signal_id or features is None or len(features) != FEATURE_COUNT:
+                return
+
+            timestamp = np.datetime64(signal['timestamp'], 'ms').astype(np.int64)
+            self.append(signal_id, int(timestamp), signal.get('model_version', 0), features)
+
+        except Exception as e:
+            logger.error(f"Ошибка записи признаков сигнала {signal_id}: {e}")
+
+    def flush(self):
+        """Запись буферов в колонки"""
+        if not self.buffered:
+            return
+
+        for name, dtype, width in COLUMNS:
+            values = np.asarray(self.buffers[name], dtype=dtype).reshape(-1, width) if width > 1 \
+                else np.asarray(self.buffers[name], dtype=dtype)
+            with open(self._column_path(name), 'ab') as f:
+                f.write(values.tobytes())
+            self.buffers[name] = []
+
+        self.rows += self.buffered
+        self.buffered = 0
+
+    def close(self):
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Ошибка закрытия хранилища признаков: {e}")
+
+    def _column(self, name: str) -> np.ndarray:
+        """Колонка, отображенная в память (только записанные строки)"""
+        dtype, width = next((dtype, width) for column, dtype, width in COLUMNS if column == name)
+        if not self.rows:
+            return np.empty((0, width) if width > 1 else 0, dtype=dtype)
+
+        shape = (self.rows, width) if width > 1 else (self.rows,)
+        return np.memmap(self._column_path(name), dtype=dtype, mode='r', shape=shape)
+
+    def load_range(self, start_ms: Optional[int] = None, end_ms: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Признаки сигналов за интервал времени [start_ms, end_ms) одной матрицей"""
+        self.flush()
+
+        timestamps = self._column('timestamp_ms')
+        start = 0 if start_ms is None else int(np.searchsorted(timestamps, start_ms, side='left'))
+        end = self.rows if end_ms is None else int(np.searchsorted(timestamps, end_ms, side='left'))
+
+        return {
+            name: np.array(self._column(name)[start:end])
+            for name, _, _ in COLUMNS
+        }
+
+    def fill(self, signal_ids: np.ndarray, out: np.ndarray) -> np.ndarray:
+        """Запись признаков сигналов в строки out; возвращает маску найденных сигналов"""
+        self.flush()
+
+        signal_ids = np.asarray(signal_ids, dtype=np.int64)
+        stored_ids = self._column('signal_id')
+
+        positions = np.searchsorted(stored_ids, signal_ids)
+        positions = np.minimum(positions, max(self.rows - 1, 0))
+        found = (stored_ids[positions] == signal_ids) if self.rows else np.zeros(len(signal_ids), dtype=bool)
+
+        if found.any():
+            out[found] = self._column('features')[positions[found]]
+
+        return found
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {
+            'rows': self.rows + self.buffered,
+            'buffered': self.buffered,
+            'bytes_per_row': sum(dtype.itemsize * width for _, dtype, width in COLUMNS)
+        }
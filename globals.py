@@ -15,12 +15,79 @@ CHAT_ID = 123456789
 # WebSocket Binance
 BINANCE_WS_URL = "wss://stream.binance.com:9443/ws"
 
+# Запись и воспроизведение потока данных
+REPLAY_CONFIG = {
+    "record_enabled": False,
+    "record_path": "./data/feed/market_feed.qpf",  # занятый файл не дописывается: сеанс пишется в файл с меткой времени
+    "flush_every": 500,  # событий между сбросами на диск
+    "replay_path": None,  # путь к записи: включает режим воспроизведения
+    "replay_speed": 1.0,  # 1.0 - реальное время, N - ускорение, 0 - максимальная скорость
+    "yield_every": 1000,  # событий между передачей управления циклу при max скорости
+    "latency_window": 10000
+}
+
+# Хранение свечей в разделяемой памяти для рабочих процессов
+SHARED_MEMORY_CONFIG = {
+    "enabled": False,
+    "name": "qp_market_data",  # префикс: сегмент экземпляра называется <name>_<pid>
+    "capacity": 1000,  # свечей на серию
+    "read_retries": 50,  # попыток получить согласованный снимок
+    "retry_spin": 10,  # первые повторы только уступают процессор (sleep(0))
+    "retry_sleep": 0.0001,  # затем пауза, удваивается до retry_max_sleep
+    "retry_max_sleep": 0.001
+}
+
+# Измерение задержек конвейера
+LATENCY_CONFIG = {
+    "window": 2048  # последних измерений на стадию и таймфрейм
+}
+
 # База данных
 DB_PATH = "./trading_signals.db"
 DATABASE_CONFIG = {
     "signals_table": "signals",
-    "market_data_table": "market_data",
-    "performance_table": "performance"
+    "market_data_table": "market_candles",
+    "market_series_table": "market_series",
+    "indicator_names_table": "indicator_names",
+    # Таблица рыночных данных со снимками индикаторов в JSON (переносится в market_candles при запуске)
+    "legacy_market_data_table": "market_data",
+    "performance_table": "performance",
+    # Агрегаты сигналов по (дата, пара, таймфрейм); дневные итоги - в performance_table
+    "aggregates_table": "signal_aggregates",
+    # Надежность: synchronous FULL - синхронизация диска на каждой фиксации, NORMAL - на контрольных точках WAL
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    # INCREMENTAL - освобожденные страницы возвращаются по частям (действует для новой базы)
+    "auto_vacuum": "INCREMENTAL",
+    # Групповая фиксация записей: не больше batch_max_rows строк и batch_max_delay_ms от первой записи
+    "batch_max_rows": 200,
+    "batch_max_delay_ms": 50,
+    # Ждать ли фиксации рыночных данных (False - запись ставится в очередь без ожидания)
+    "market_data_wait_commit": False
+}
+
+# Закрытие сигналов: результат по цене после hold_duration минут
+OUTCOME_CONFIG = {
+    "enabled": True,
+    "check_interval": 15,  # секунд между проверками открытых сигналов
+    "min_move": 0.0,  # минимальное движение цены в сторону сигнала (доля) для 'success'
+    "expire_after": 600  # секунд после закрытия, после которых цена уже не отражает результат ('expired')
+}
+
+# Хранение истории: удаление порциями по расписанию, без ожидания при запуске
+RETENTION_CONFIG = {
+    "enabled": True,
+    "signals_days": 30,
+    "market_data_days": 7,
+    "chunk_rows": 500,  # строк в одной транзакции удаления
+    "chunk_pause": 0.05,  # секунд между порциями
+    "vacuum_pages": 256,  # страниц за один шаг incremental_vacuum
+    # Перевод существующей базы в auto_vacuum = INCREMENTAL одним VACUUM при первом проходе.
+    # VACUUM переписывает весь файл, и все запросы ждут его окончания - по умолчанию
+    # база переводится отдельно командой: python database.py vacuum
+    "convert_auto_vacuum": False,
+    "initial_delay": 60,  # секунд после запуска торговли до первого прохода
+    "interval": 3600  # секунд между проходами
 }
 
 # Стратегия и параметры безопасности
@@ -29,11 +96,47 @@ STRATEGY_CONFIG = {
     "daily_signals_target": 35,
     "update_interval": 10,  # секунд между циклами
     "signal_threshold": 0.87,
+    "min_final_score": 0.70,  # минимальный финальный скор сигнала
     "rsi_upper_limit": 65,
     "vwap_gradient_threshold": 0.002,
     "volume_multiplier": 2.5  # для Volume Tsunami
 }
 
+# Исполнение анализа всех пар
+ANALYSIS_CONFIG = {
+    "executor_mode": "sequential",  # sequential | thread | process
+    "max_workers": None,  # None - по числу ядер
+    "chunk_size": 4,  # серий в одном задании пула
+    "task_timeout": 30.0,  # секунд на задание
+    "process_start_method": "spawn",
+    "batch_strategy": True  # оценка стратегии сразу для всех серий цикла
+}
+
+# Кэш индикаторов неизменившихся серий
+INDICATOR_CACHE_CONFIG = {
+    "enabled": True,
+    "max_entries": 128  # серий (пара x таймфрейм)
+}
+
+# Планировщик анализа по таймфреймам
+SCHEDULER_CONFIG = {
+    "enabled": True,
+    # Максимальный интервал между анализами серии, секунд
+    "timeframe_intervals": {
+        "1m": 10, "5m": 30, "15m": 60, "30m": 120, "1h": 300, "4h": 900, "1d": 1800
+    },
+    "pair_intervals": {},  # переопределение по парам: {"BTCUSDT": {"1m": 5}}
+    "trigger_on_candle_close": True,
+    # Относительное движение цены с прошлого анализа, запускающее анализ досрочно
+    "min_price_move": {
+        "1m": 0.001, "5m": 0.002, "15m": 0.003, "30m": 0.004, "1h": 0.005, "4h": 0.01, "1d": 0.02
+    },
+    "cpu_budget": 0.5,  # доля update_interval, отводимая на анализ
+    "cycle_deadline": 8.0,  # секунд от начала цикла; остальное откладывается
+    # Веса слагаемых приоритета серии
+    "priority_weights": {"trigger": 1.0, "volume_ratio": 0.5, "price_change": 1.0, "staleness": 1.0}
+}
+
 SAFETY_LIMITS = {
     "max_signals_per_hour": 8,
     "max_daily_signals": 40,
@@ -114,7 +217,45 @@ MESSAGE_FORMATS = {
 AI_MODEL_CONFIG = {
     "learning_rate": 0.01,
     "epochs": 10,
-    "batch_size": 32
+    "batch_size": 32,
+    "l2": 0.0001,  # L2-регуляризация логистической регрессии
+    "min_training_samples": 50,  # минимум закрытых сигналов для обучения
+    "training_limit": 50000,  # последних закрытых сигналов в выборке
+    "training_executor": "process",  # process | thread
+    "validation_fraction": 0.2,  # доля выборки для валидации новой модели
+    "min_validation_accuracy": 0.5,
+    "max_validation_loss_increase": 0.05,  # допустимый рост log loss относительно текущей модели
+    "max_model_versions": 5,  # версий модели в реестре (для отката и запросов по версии)
+    "model_path": "/app/data/models/trading_model.npz",
+    "legacy_model_path": "/app/data/models/trading_model.json",  # читается, если бинарного файла еще нет
+    "compress_model": False,  # сжатие .npz (отключает отображение истории в память)
+    "mmap_history": True,  # отображение истории предсказаний в память при загрузке
+    "history_per_key": 100,  # результатов предсказаний на пару и таймфрейм
+    "performance_history_size": 1000,  # результатов в общей статистике модели
+    "recent_accuracy_window": 10  # последних результатов для исторической коррекции
+}
+
+# Кэш предсказаний AI модели по квантованным признакам
+PREDICTION_CACHE_CONFIG = {
+    "enabled": False,
+    "tolerance": 0.001,  # шаг квантования нормализованных признаков
+    "max_entries": 1024,
+    "verify_every": 20  # каждое N-е попадание пересчитывается для оценки ошибки
+}
+
+# Хранилище признаков сигналов для обучения
+FEATURE_STORE_CONFIG = {
+    "enabled": True,
+    "path": "./data/features",
+    "flush_every": 10  # сигналов между записями на диск
+}
+
+# Теневые модели: оценивают те же серии, что и основная, без влияния на сигналы
+SHADOW_CONFIG = {
+    "enabled": True,
+    "latency_cap_ms": 2.0,  # суммарная добавка к циклу анализа
+    "outcome_window": 1000,  # результатов сигналов для сравнения моделей
+    "models": []  # [{"name": ..., "weights": {...}} | {"name": ..., "model_path": ...}]
 }
 
 # Глобальные переменные для статистики и состояния
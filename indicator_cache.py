@@ -0,0 +1,89 @@
+"""
+Кэш результатов индикаторов
+Серия, не изменившаяся с прошлого цикла, не пересчитывается
+"""
+
+import logging
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+import pandas as pd
+
+from globals import INDICATOR_CACHE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Поля последней свечи, по которым определяется версия серии
+VERSION_FIELDS = ['open', 'high', 'low', 'close', 'volume']
+
+
+def series_version(data: pd.DataFrame) -> Tuple:
+    """Версия серии: длина, время открытия последней свечи и хэш ее содержимого
+
+    Обновления потока меняют только последнюю свечу или добавляют новую,
+    поэтому этого достаточно, чтобы заметить любое изменение серии.
+    """
+    last_row = data[VERSION_FIELDS].iloc[-1].to_numpy(dtype='float64')
+    return len(data), data['timestamp'].iloc[-1], hash(last_row.tobytes())
+
+
+class IndicatorCache:
+    """Ограниченный LRU-кэш индикаторов: одна запись на (pair, timeframe)"""
+
+    def __init__(self, max_entries: int = None):
+        self.max_entries = max_entries or INDICATOR_CACHE_CONFIG['max_entries']
+        self.entries = OrderedDict()  # (pair, timeframe) -> (version, indicators)
+
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'invalidations': 0,
+            'evictions': 0
+        }
+
+    def get(self, pair: str, timeframe: str, version: Tuple) -> Optional[Dict[str, Any]]:
+        """Индикаторы серии, если она не изменилась с момента расчета"""
+        key = (pair, timeframe)
+        entry = self.entries.get(key)
+
+        if entry is not None:
+            if entry[0] == version:
+                self.entries.move_to_end(key)
+                self.stats['hits'] += 1
+                # Копия: результат уходит в сигнал и не должен менять кэш
+                return dict(entry[1])
+
+            # Серия обновилась - устаревшая запись удаляется
+            del self.entries[key]
+            self.stats['invalidations'] += 1
+
+        self.stats['misses'] += 1
+        return None
+
+    def put(self, pair: str, timeframe: str, version: Tuple, indicators: Dict[str, Any]):
+        """Сохранение индикаторов для версии серии"""
+        if not indicators:
+            return
+
+        key = (pair, timeframe)
+        self.entries[key] = (version, dict(indicators))
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def clear(self):
+        """Очистка кэша"""
+        self.entries.clear()
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Статистика кэша"""
+        lookups = self.stats['hits'] + self.stats['misses']
+
+        return {
+            **self.stats,
+            'entries': len(self.entries),
+            'max_entries': self.max_entries,
+            'hit_rate': self.stats['hits'] / lookups if lookups else 0.0
+        }
@@ -0,0 +1,111 @@
+"""
+Двоичное представление снимков индикаторов
+Словарь индикаторов хранится упакованным массивом float64 по общему справочнику имен
+"""
+
+import logging
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Тип значений в упакованном снимке (little-endian, одинаковый на всех платформах)
+INDICATOR_DTYPE = np.dtype('<f8')
+
+
+def to_epoch_ms(value: Any) -> int:
+    """Время в миллисекундах эпохи: число (уже мс), datetime, Timestamp или строка"""
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        return int(value)
+
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert('UTC').tz_localize(None)
+    return int(timestamp.value // 1_000_000)
+
+
+def from_epoch_ms(value: int) -> datetime:
+    return pd.Timestamp(int(value), unit='ms').to_pydatetime()
+
+
+class IndicatorCodec:
+    """Справочник имен индикаторов и упаковка снимков
+
+    Имени навсегда присваивается номер столбца; новые имена добавляются в конец,
+    поэтому ранее упакованные снимки остаются читаемыми - недостающие столбцы равны NaN.
+    """
+
+    def __init__(self):
+        self.names = []  # номер столбца -> имя
+        self.index = {}  # имя -> номер столбца
+
+    def load(self, rows: List[Tuple[int, str]]):
+        """Загрузка справочника: пары (номер, имя)"""
+        self.names = []
+        self.index = {}
+        for column, name in sorted(rows):
+            if column != len(self.names):
+                raise ValueError(f"Пропуск в справочнике индикаторов: {column}")
+            self.names.append(name)
+            self.index[name] = column
+
+    def encode(self, indicators: Dict[str, Any]) -> Tuple[bytes, List[Tuple[int, str]]]:
+        """Упаковка словаря индикаторов; возвращает байты и новые (номер, имя) для справочника"""
+        added = []
+        for name in indicators:
+            if name not in self.index:
+                column = len(self.names)
+                self.names.append(name)
+                self.index[name] = column
+                added.append((column, name))
+
+        values = np.full(len(self.names), np.nan, dtype=INDICATOR_DTYPE)
+        for name, value in indicators.items():
+            try:
+                values[self.index[name]] = np.nan if value is None else float(value)
+            except (TypeError, ValueError):
+                logger.debug(f"Нечисловой индикатор {name} не упакован")
+
+        return values.tobytes(), added
+
+    def decode(self, blob: Optional[bytes]) -> Dict[str, float]:
+        """Словарь индикаторов из упакованного снимка (NaN - индикатор отсутствовал)"""
+        if not blob:
+            return {}
+
+        values = np.frombuffer(blob, dtype=INDICATOR_DTYPE)
+        return {
+            self.names[column]: float(value)
+            for column, value in enumerate(values)
+            if value == value
+        }
+
+    def decode_matrix(self, blobs: List[bytes], names: Optional[List[str]] = None) -> np.ndarray:
+        """Матрица (N x столбцы) из упакованных снимков; names - выбрать и упорядочить столбцы"""
+        width = len(self.names)
+        out = np.full((len(blobs), width), np.nan, dtype=INDICATOR_DTYPE)
+
+        if blobs:
+            row_width = INDICATOR_DTYPE.itemsize * width
+            if all(len(blob) == row_width for blob in blobs):
+                out[:] = np.frombuffer(b''.join(blobs), dtype=INDICATOR_DTYPE).reshape(len(blobs), width)
+            else:
+                # Снимки, записанные до появления новых имен, короче
+                for row, blob in enumerate(blobs):
+                    values = np.frombuffer(blob, dtype=INDICATOR_DTYPE)
+                    out[row, :len(values)] = values
+
+        if names is None:
+            return out
+
+        result = np.full((len(blobs), len(names)), np.nan, dtype=INDICATOR_DTYPE)
+        for position, name in enumerate(names):
+            column = self.index.get(name)
+            if column is not None:
+                result[:, position] = out[:, column]
+        return result
@@ -0,0 +1,141 @@
+"""
+Модуль измерения задержек от биржевого события до доставки сигнала
+Скользящие гистограммы задержек по стадиям и таймфреймам
+"""
+
+import logging
+import time
+from collections import deque
+from typing import Dict, Any, Iterable, Optional
+
+import numpy as np
+
+from globals import LATENCY_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Стадии конвейера в порядке прохождения
+STAGE_EXCHANGE_EVENT = 'exchange_event'
+STAGE_RECEIVED = 'received'
+STAGE_DECODED = 'decoded'
+STAGE_INDICATORS_DONE = 'indicators_done'
+STAGE_STRATEGY_DONE = 'strategy_done'
+STAGE_PERSISTED = 'persisted'
+STAGE_DELIVERED = 'delivered'
+
+LATENCY_STAGES = [
+    STAGE_EXCHANGE_EVENT,
+    STAGE_RECEIVED,
+    STAGE_DECODED,
+    STAGE_INDICATORS_DONE,
+    STAGE_STRATEGY_DONE,
+    STAGE_DELIVERED,
+    STAGE_PERSISTED
+]
+
+# Стадии, которые проходит каждое обновление свечи при анализе
+CANDLE_STAGES = [STAGE_RECEIVED, STAGE_DECODED, STAGE_INDICATORS_DONE, STAGE_STRATEGY_DONE]
+
+# Стадии, которые проходит только отправленный сигнал: в базу сохраняются доставленные сигналы
+SIGNAL_STAGES = [STAGE_DELIVERED, STAGE_PERSISTED]
+
+
+def stamp(timestamps: Dict[str, float], stage: str) -> Dict[str, float]:
+    """Отметка времени прохождения стадии"""
+    timestamps[stage] = time.time()
+    return timestamps
+
+
+class LatencyTracker:
+    """Скользящие гистограммы задержки (возраст данных относительно биржевого события)"""
+
+    def __init__(self, window: int = None):
+        self.window = window or LATENCY_CONFIG['window']
+        self.stage_samples = {stage: deque(maxlen=self.window) for stage in LATENCY_STAGES[1:]}
+        # Время стадии от предыдущей отмеченной стадии конвейера
+        self.delta_samples = {stage: deque(maxlen=self.window) for stage in LATENCY_STAGES[1:]}
+        self.timeframe_samples = {}
+        self.records_count = 0
+
+    def record(self, timestamps: Dict[str, float], timeframe: str, stages: Iterable[str] = None):
+        """Учет отметок времени одного обновления или сигнала"""
+        try:
+            origin = timestamps.get(STAGE_EXCHANGE_EVENT)
+            if origin is None:
+                return
+
+            if timeframe not in self.timeframe_samples:
+                self.timeframe_samples[timeframe] = {
+                    stage: deque(maxlen=self.window) for stage in LATENCY_STAGES[1:]
+                }
+
+            tf_samples = self.timeframe_samples[timeframe]
+
+            for stage in (stages or LATENCY_STAGES[1:]):
+                value = timestamps.get(stage)
+                if value is None:
+                    continue
+
+                latency_ms = (value - origin) * 1000
+                self.stage_samples[stage].append(latency_ms)
+                tf_samples[stage].append(latency_ms)
+
+                previous = self._previous_stamp(timestamps, stage)
+                if previous is not None:
+                    self.delta_samples[stage].append((value - previous) * 1000)
+
+            self.records_count += 1
+
+        except Exception as e:
+            logger.error(f"Ошибка учета задержки: {e}")
+
+    @staticmethod
+    def _previous_stamp(timestamps: Dict[str, float], stage: str) -> Optional[float]:
+        """Отметка ближайшей предыдущей стадии в порядке LATENCY_STAGES"""
+        for previous in reversed(LATENCY_STAGES[:LATENCY_STAGES.index(stage)]):
+            if previous in timestamps:
+                return timestamps[previous]
+        return None
+
+    def _summarize(self, samples: deque) -> Dict[str, Any]:
+        """Перцентили одной выборки"""
+        if not samples:
+            return {'count': 0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0}
+
+        values = np.fromiter(samples, dtype=float, count=len(samples))
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+
+        return {
+            'count': len(values),
+            'p50': float(p50),
+            'p95': float(p95),
+            'p99': float(p99)
+        }
+
+    def get_histograms(self) -> Dict[str, Any]:
+        """Перцентили задержек (мс) от биржевого события и от предыдущей стадии, по таймфреймам"""
+        try:
+            return {
+                'window': self.window,
+                'records': self.records_count,
+                'stages': {
+                    stage: self._summarize(samples)
+                    for stage, samples in self.stage_samples.items()
+                },
+                'stage_deltas': {
+                    stage: self._summarize(samples)
+                    for stage, samples in self.delta_samples.items()
+                },
+                'timeframes': {
+                    timeframe: {
+                        stage: self._summarize(samples)
+                        for stage, samples in stages.items()
+                        if samples
+                    }
+                    for timeframe, stages in self.timeframe_samples.items()
+                }
+            }
+
+        except Exception as e:
+            logger.error(f"Ошибка получения гистограмм задержек: {e}")
+            return {}
@@ -0,0 +1,118 @@
+"""
+Бинарное хранение AI модели
+Файл .npz: заголовок (JSON) + массивы модели и истории, атомарная запись через временный файл
+"""
+
+import json
+import logging
+import os
+import zipfile
+from typing import Dict, Any, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MODEL_FORMAT = 'qp-model'
+MODEL_FORMAT_VERSION = 1
+
+# Имя массива с заголовком внутри .npz
+HEADER_MEMBER = 'header'
+
+# Запись истории предсказаний: индекс ключа (pair_timeframe) в заголовке, время (epoch, с) и результат
+HISTORY_DTYPE = np.dtype([
+    ('key', '<u2'),
+    ('timestamp', '<f8'),
+    ('prediction', '<f8'),
+    ('actual', '<f8'),
+    ('accuracy', '<f8'),
+    ('error', '<f8')
+])
+
+
+def save_model_file(filepath: str, header: Dict[str, Any], arrays: Dict[str, np.ndarray], compress: bool = False):
+    """Атомарная запись файла модели: временный файл, fsync и замена
+
+    При сбое во время записи на диске остается предыдущая версия файла.
+    """
+    directory = os.path.dirname(filepath)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    header = {**header, 'format': MODEL_FORMAT, 'format_version': MODEL_FORMAT_VERSION}
+    members = {HEADER_MEMBER: np.frombuffer(json.dumps(header).encode('utf-8'), dtype=np.uint8)}
+    members.update(arrays)
+
+    temp_path = f"{filepath}.tmp"
+    try:
+        with open(temp_path, 'wb') as f:
+            if compress:
+                np.savez_compressed(f, **members)
+            else:
+                np.savez(f, **members)
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(temp_path, filepath)
+
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def load_model_file(filepath: str, mmap_members: Tuple[str, ...] = ()) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+    """Загрузка заголовка и массивов файла модели
+
+    Массивы из mmap_members отображаются в память (только для несжатых членов архива),
+    остальные читаются целиком.
+    """
+    with np.load(filepath, allow_pickle=False) as npz:
+        header = json.loads(npz[HEADER_MEMBER].tobytes().decode('utf-8'))
+
+        if header.get('format') != MODEL_FORMAT:
+            raise ValueError(f"Неизвестный формат файла модели: {filepath}")
+        if header.get('format_version') != MODEL_FORMAT_VERSION:
+            raise ValueError(f"Неподдерживаемая версия файла модели: {header.get('format_version')}")
+
+        arrays = {}
+        for name in npz.files:
+            if name == HEADER_MEMBER:
+                continue
+            mapped = _memmap_member(filepath, name) if name in mmap_members else None
+            arrays[name] = mapped if mapped is not None else npz[name]
+
+    return header, arrays
+
+
+def _memmap_member(filepath: str, name: str):
+    """Отображение несжатого массива .npz в память (None, если член архива сжат)"""
+    try:
+        with zipfile.ZipFile(filepath) as archive:
+            info = archive.getinfo(f"{name}.npy")
+            if info.compress_type != zipfile.ZIP_STORED:
+                return None
+
+        with open(filepath, 'rb') as f:
+            # Локальный заголовок zip: 30 байт + имя файла + дополнительное поле
+            f.seek(info.header_offset + 26)
+            name_length, extra_length = np.frombuffer(f.read(4), dtype='<u2')
+            f.seek(info.header_offset + 30 + int(name_length) + int(extra_length))
+
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            offset = f.tell()
+
+        if fortran_order or dtype.hasobject:
+            return None
+        if int(np.prod(shape)) == 0:
+            return np.empty(shape, dtype=dtype)
+
+        return np.memmap(filepath, dtype=dtype, mode='r', offset=offset, shape=shape)
+
+    except Exception as e:
+        logger.debug(f"Отображение {name} в память недоступно: {e}")
+        return None
@@ -0,0 +1,107 @@
+"""
+Кэш предсказаний модели по квантованным признакам
+Серия, признаки которой с прошлого цикла изменились меньше допуска, не пересчитывается моделью
+"""
+
+import logging
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from globals import PREDICTION_CACHE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class PredictionCache:
+    """Ограниченный LRU-кэш базового предсказания: (версия модели, пара, таймфрейм, квантованные признаки)
+
+    Попадание возвращает предсказание для соседней точки сетки квантования, поэтому каждое
+    verify_every-е попадание пересчитывается и расхождение учитывается как ожидаемая ошибка кэша.
+
+    Точки одной ячейки сетки отличаются меньше чем на tolerance по каждому признаку, поэтому
+    для обученной логистической модели ошибка базового предсказания при попадании не больше
+    0.25 * tolerance * sum(|weights| / scale) (см. max_hit_error), а итогового - 0.6 от нее.
+    Для модели весов (кусочно-постоянной) попадание у порога может вернуть значение по другую сторону порога.
+    """
+
+    def __init__(self, config: Dict[str, Any] = None):
+        self.config = config or PREDICTION_CACHE_CONFIG
+        self.tolerance = self.config['tolerance']
+        self.max_entries = self.config['max_entries']
+        self.verify_every = self.config['verify_every']
+
+        self.entries = OrderedDict()  # ключ -> предсказание
+
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'verified': 0,
+            'error_sum': 0.0,
+            'max_error': 0.0
+        }
+
+    def max_hit_error(self, model) -> float:
+        """Верхняя граница ошибки базового предсказания логистической модели при попадании"""
+        return 0.25 * self.tolerance * float(np.sum(np.abs(model.weights) / model.scale))
+
+    def make_key(self, version: int, pair: str, timeframe: str, normalized: np.ndarray) -> Tuple:
+        """Ключ кэша для строки нормализованных признаков"""
+        # + 0.0 сводит -0.0 к 0.0, чтобы одинаковые точки сетки давали одинаковые байты
+        quantized = np.round(normalized / self.tolerance) + 0.0
+        return version, pair, timeframe, quantized.tobytes()
+
+    def get(self, key: Tuple) -> Optional[float]:
+        value = self.entries.get(key)
+
+        if value is None:
+            self.stats['misses'] += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.stats['hits'] += 1
+        return value
+
+    def should_verify(self) -> bool:
+        """Нужно ли пересчитать текущее попадание для оценки ошибки"""
+        return self.verify_every > 0 and self.stats['hits'] % self.verify_every == 0
+
+    def record_error(self, cached: float, actual: float):
+        error = abs(float(cached) - float(actual))
+        if error != error:  # NaN
+            return
+
+        self.stats['verified'] += 1
+        self.stats['error_sum'] += error
+        self.stats['max_error'] = max(self.stats['max_error'], error)
+
+    def put(self, key: Tuple, value: float):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def clear(self):
+        self.entries.clear()
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Доля попаданий и ожидаемая ошибка по проверенным попаданиям"""
+        lookups = self.stats['hits'] + self.stats['misses']
+        verified = self.stats['verified']
+
+        return {
+            'hits': self.stats['hits'],
+            'misses': self.stats['misses'],
+            'evictions': self.stats['evictions'],
+            'entries': len(self.entries),
+            'max_entries': self.max_entries,
+            'tolerance': self.tolerance,
+            'hit_rate': self.stats['hits'] / lookups if lookups else 0.0,
+            'verified': verified,
+            'expected_error': self.stats['error_sum'] / verified if verified else 0.0,
+            'max_error': self.stats['max_error']
+        }
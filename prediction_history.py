@@ -0,0 +1,108 @@
+"""
+История предсказаний AI модели
+Кольцевой буфер фиксированной емкости с агрегатами, обновляемыми при добавлении
+"""
+
+import logging
+from typing import Optional
+
+import numpy as np
+
+from model_store import HISTORY_DTYPE
+
+logger = logging.getLogger(__name__)
+
+
+class PredictionHistory:
+    """Последние capacity результатов предсказаний одного ключа (или всей модели)
+
+    Суммы точности и ошибки по буферу и по окну последних recent_window записей
+    обновляются при добавлении, поэтому чтение агрегатов не зависит от длины истории.
+    При каждом обороте буфера суммы пересчитываются заново, чтобы ошибка округления не накапливалась.
+    """
+
+    def __init__(self, capacity: int, recent_window: int = 10):
+        if not 0 < recent_window < capacity:
+            raise ValueError(f"Окно {recent_window} должно быть меньше емкости {capacity}")
+
+        self.capacity = capacity
+        self.recent_window = recent_window
+        self.records = np.zeros(capacity, dtype=HISTORY_DTYPE)
+
+        self.head = 0   # позиция следующей записи
+        self.count = 0
+        self.total = 0  # записей за все время
+
+        self.accuracy_sum = 0.0
+        self.error_sum = 0.0
+        self.recent_sum = 0.0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def append(self, timestamp: float, prediction: float, actual: float, accuracy: float, error: float, key: int = 0):
+        """Добавление результата с вытеснением самого старого при заполнении"""
+        accuracies = self.records['accuracy']
+
+        # Запись, покидающая окно последних результатов
+        if self.count >= self.recent_window:
+            self.recent_sum -= accuracies[(self.head - self.recent_window) % self.capacity]
+
+        if self.count == self.capacity:
+            self.accuracy_sum -= accuracies[self.head]
+            self.error_sum -= self.records['error'][self.head]
+        else:
+            self.count += 1
+
+        self.records[self.head] = (key, timestamp, prediction, actual, accuracy, error)
+
+        self.accuracy_sum += accuracy
+        self.error_sum += error
+        self.recent_sum += accuracy
+
+        self.head = (self.head + 1) % self.capacity
+        self.total += 1
+
+        if self.head == 0:
+            self._recompute()
+
+    def _recompute(self):
+        """Точный пересчет сумм по содержимому буфера"""
+        records = self.to_array()
+        self.accuracy_sum = float(records['accuracy'].sum())
+        self.error_sum = float(records['error'].sum())
+        self.recent_sum = float(records['accuracy'][-self.recent_window:].sum())
+
+    def mean_accuracy(self) -> float:
+        return self.accuracy_sum / self.count if self.count else 0.0
+
+    def mean_error(self) -> float:
+        return self.error_sum / self.count if self.count else 0.0
+
+    def recent_accuracy(self) -> float:
+        """Средняя точность последних recent_window результатов"""
+        window = min(self.count, self.recent_window)
+        return self.recent_sum / window if window else 0.0
+
+    def last_accuracy(self, offset: int = 1) -> Optional[float]:
+        """Точность offset-го с конца результата"""
+        if offset > self.count:
+            return None
+        return float(self.records['accuracy'][(self.head - offset) % self.capacity])
+
+    def to_array(self) -> np.ndarray:
+        """Записи от старых к новым (копия)"""
+        if self.count < self.capacity:
+            return self.records[:self.count].copy()
+        return np.concatenate((self.records[self.head:], self.records[:self.head]))
+
+    def extend(self, records: np.ndarray):
+        """Загрузка записей HISTORY_DTYPE (от старых к новым) в пустой буфер"""
+        records = records[-self.capacity:]
+
+        self.records[:len(records)] = records
+        self.count = len(records)
+        self.head = self.count % self.capacity
+        self.total += self.count
+
+        self._recompute()
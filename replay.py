@@ -0,0 +1,403 @@
+"""
+Модуль записи и воспроизведения потока рыночных данных
+Воспроизводимые прогоны торгового дня через SignalAnalyzer
+"""
+
+import asyncio
+import logging
+import json
+import os
+import struct
+import time
+from collections import deque
+from typing import Dict, List, Any
+
+import numpy as np
+import pandas as pd
+
+from globals import REPLAY_CONFIG
+from latency import LatencyTracker, STAGE_STRATEGY_DONE
+from websocket import BinanceWebSocket, HISTORY_CANDLES
+
+logger = logging.getLogger(__name__)
+
+# Формат файла: заголовок + записи фиксированной длины
+FEED_MAGIC = b'QPFEED01'
+FEED_VERSION = 1
+
+# Типы событий
+EVENT_SNAPSHOT = 0  # Историческая свеча при старте
+EVENT_UPDATE = 1    # Обновление свечи из потока
+
+# kind, pair, timeframe, pad, event_ns, candle_ts_ms, open, high, low, close, volume
+RECORD_STRUCT = struct.Struct('<BBBxqq5d')
+RECORD_DTYPE = np.dtype([
+    ('kind', 'u1'),
+    ('pair', 'u1'),
+    ('timeframe', 'u1'),
+    ('pad', 'u1'),
+    ('event_ns', '<i8'),
+    ('ts_ms', '<i8'),
+    ('open', '<f8'),
+    ('high', '<f8'),
+    ('low', '<f8'),
+    ('close', '<f8'),
+    ('volume', '<f8')
+])
+
+
+def _timestamp_to_ms(value) -> int:
+    """Преобразование времени свечи в epoch-ms"""
+    return int(pd.Timestamp(value).to_datetime64().astype('datetime64[ms]').astype('int64'))
+
+
+class FeedRecorder:
+    """Запись сырых событий потока в компактный append-only файл"""
+
+    def __init__(self, filepath: str, pairs: List[str], timeframes: List[str], flush_every: int = None):
+        self.filepath = filepath
+        self.pairs = list(pairs)
+        self.timeframes = list(timeframes)
+        self.pair_index = {pair: i for i, pair in enumerate(self.pairs)}
+        self.timeframe_index = {tf: i for i, tf in enumerate(self.timeframes)}
+        self.flush_every = flush_every or REPLAY_CONFIG['flush_every']
+
+        self.file = None
+        self.buffer = bytearray()
+        self.buffered_events = 0
+        self.events_written = 0
+
+    def _session_path(self) -> str:
+        """Путь файла сеанса: record_path или, если он уже занят, путь с меткой времени запуска
+
+        Каждый сеанс пишется в отдельный файл: снимок истории и отсчет времени событий
+        относятся к одному запуску, поэтому дописывать их к прежней записи нельзя.
+        """
+        if not os.path.exists(self.filepath) or os.path.getsize(self.filepath) == 0:
+            return self.filepath
+
+        root, ext = os.path.splitext(self.filepath)
+        stamp = time.strftime('%Y%m%d_%H%M%S')
+        path = f"{root}_{stamp}{ext}"
+        suffix = 1
+        while os.path.exists(path):
+            path = f"{root}_{stamp}_{suffix}{ext}"
+            suffix += 1
+        return path
+
+    def open(self):
+        """Открытие нового файла записи с заголовком"""
+        try:
+            directory = os.path.dirname(self.filepath)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            self.filepath = self._session_path()
+            self.file = open(self.filepath, 'wb')
+
+            meta = json.dumps({'pairs': self.pairs, 'timeframes': self.timeframes}).encode('utf-8')
+            self.file.write(FEED_MAGIC)
+            self.file.write(struct.pack('<HI', FEED_VERSION, len(meta)))
+            self.file.write(meta)
+            self.file.flush()
+
+            logger.info(f"🎙 Запись потока данных: {self.filepath}")
+
+        except Exception as e:
+            logger.error(f"Ошибка открытия файла записи потока: {e}")
+            raise
+
+    def record_snapshot(self, market_data: Dict[str, Dict[str, pd.DataFrame]]):
+        """Запись исторических свечей, загруженных при старте"""
+        try:
+            event_ns = time.time_ns()
+
+            for pair, timeframes in market_data.items():
+                for timeframe, df in timeframes.items():
+                    if len(df) == 0:
+                        continue
+
+                    ts_ms = pd.to_datetime(df['timestamp']).to_numpy().astype('datetime64[ms]').astype('int64')
+                    values = df[['open', 'high', 'low', 'close', 'volume']].to_numpy(dtype=float)
+
+                    records = np.zeros(len(df), dtype=RECORD_DTYPE)
+                    records['kind'] = EVENT_SNAPSHOT
+                    records['pair'] = self.pair_index[pair]
+                    records['timeframe'] = self.timeframe_index[timeframe]
+                    records['event_ns'] = event_ns
+                    records['ts_ms'] = ts_ms
+                    records['open'] = values[:, 0]
+                    records['high'] = values[:, 1]
+                    records['low'] = values[:, 2]
+                    records['close'] = values[:, 3]
+                    records['volume'] = values[:, 4]
+
+                    self.buffer.extend(records.tobytes())
+                    self.buffered_events += len(records)
+
+            self.flush()
+
+        except Exception as e:
+            logger.error(f"Ошибка записи снимка данных: {e}")
+
+    def record_update(self, pair: str, timeframe: str, timestamp, open_price: float,
+                      high: float, low: float, close: float, volume: float, event_ns: int = None):
+        """Запись одного обновления свечи"""
+        try:
+            self.buffer.extend(RECORD_STRUCT.pack(
+                EVENT_UPDATE,
+                self.pair_index[pair],
+                self.timeframe_index[timeframe],
+                event_ns if event_ns is not None else time.time_ns(),
+                _timestamp_to_ms(timestamp),
+                open_price, high, low, close, volume
+            ))
+            self.buffered_events += 1
+
+            if self.buffered_events >= self.flush_every:
+                self.flush()
+
+        except Exception as e:
+            logger.error(f"Ошибка записи события {pair} {timeframe}: {e}")
+
+    def flush(self):
+        """Сброс буфера на диск"""
+        if not self.file or not self.buffer:
+            return
+
+        self.file.write(self.buffer)
+        self.file.flush()
+        self.events_written += self.buffered_events
+        self.buffer.clear()
+        self.buffered_events = 0
+
+    def close(self):
+        """Закрытие файла записи"""
+        try:
+            self.flush()
+            if self.file:
+                self.file.close()
+                self.file = None
+                logger.info(f"🎙 Запись потока завершена: {self.events_written} событий")
+        except Exception as e:
+            logger.error(f"Ошибка закрытия файла записи: {e}")
+
+
+def read_feed_header(filepath: str) -> Dict[str, Any]:
+    """Чтение заголовка файла потока"""
+    with open(filepath, 'rb') as f:
+        magic = f.read(len(FEED_MAGIC))
+        if magic != FEED_MAGIC:
+            raise ValueError(f"Неизвестный формат файла потока: {filepath}")
+
+        version, meta_len = struct.unpack('<HI', f.read(6))
+        if version != FEED_VERSION:
+            raise ValueError(f"Неподдерживаемая версия файла потока: {version}")
+
+        meta = json.loads(f.read(meta_len).decode('utf-8'))
+
+    meta['version'] = version
+    meta['data_offset'] = len(FEED_MAGIC) + 6 + meta_len
+    return meta
+
+
+def load_feed(filepath: str):
+    """Загрузка всех записей файла потока в структурированный массив"""
+    header = read_feed_header(filepath)
+
+    data_size = os.path.getsize(filepath) - header['data_offset']
+    count = data_size // RECORD_DTYPE.itemsize  # Недописанная последняя запись отбрасывается
+
+    records = np.fromfile(filepath, dtype=RECORD_DTYPE, count=count, offset=header['data_offset'])
+    return header, records
+
+
+class ReplayWebSocket(BinanceWebSocket):
+    """Источник данных, воспроизводящий записанный поток с тем же интерфейсом, что и BinanceWebSocket"""
+
+    def __init__(self, filepath: str = None, speed: float = None):
+        super().__init__()
+        self.filepath = filepath or REPLAY_CONFIG['replay_path']
+        # speed: 1.0 - реальное время, N - ускорение в N раз, 0 - максимальная скорость
+        self.speed = REPLAY_CONFIG['replay_speed'] if speed is None else speed
+
+        self.updates = None
+        self.events_replayed = 0
+        self.replay_started = None
+        self.replay_finished = None
+        # Отставание применения события от расписания записи (успевает ли воспроизведение)
+        self.lag_samples = deque(maxlen=REPLAY_CONFIG['latency_window'])
+        # Задержки стадий конвейера в воспроизводимых циклах анализа
+        self.latency_tracker = None
+
+    def attach_latency_tracker(self, tracker: LatencyTracker):
+        """Трекер, в который анализ записывает задержки стадий"""
+        self.latency_tracker = tracker
+
+    async def _fetch_historical_data(self):
+        """Загрузка снимка исторических данных из файла потока"""
+        try:
+            logger.info(f"📼 Загрузка записанного потока: {self.filepath}")
+
+            header, records = load_feed(self.filepath)
+
+            self.pairs = header['pairs']
+            self.timeframes = header['timeframes']
+            self.market_data = {}
+            self._initialize_market_data()
+
+            snapshot = records[records['kind'] == EVENT_SNAPSHOT]
+            self.updates = records[records['kind'] == EVENT_UPDATE]
+
+            for pair_id, pair in enumerate(self.pairs):
+                for tf_id, timeframe in enumerate(self.timeframes):
+                    rows = snapshot[(snapshot['pair'] == pair_id) & (snapshot['timeframe'] == tf_id)]
+                    if len(rows) == 0:
+                        continue
+
+                    self.market_data[pair][timeframe] = pd.DataFrame({
+                        'timestamp': pd.to_datetime(rows['ts_ms'], unit='ms'),
+                        'open': rows['open'],
+                        'high': rows['high'],
+                        'low': rows['low'],
+                        'close': rows['close'],
+                        'volume': rows['volume']
+                    })
+
+            logger.info(f"✅ Снимок загружен: {len(snapshot)} свечей, {len(self.updates)} событий для воспроизведения")
+
+        except Exception as e:
+            logger.error(f"Ошибка загрузки записанного потока: {e}")
+            raise
+
+    async def _create_websocket_connections(self):
+        """Воспроизведение не требует сетевых соединений"""
+        self.connections['replay'] = self.filepath
+
+    async def start_data_stream(self):
+        """Запуск воспроизведения потока"""
+        try:
+            if self.is_running:
+                return
+
+            self.is_running = True
+            logger.info(f"▶️ Воспроизведение потока: скорость {'max' if self.speed <= 0 else f'{self.speed}x'}")
+
+            await self._replay_updates()
+
+        except Exception as e:
+            logger.error(f"Ошибка воспроизведения потока: {e}")
+            raise
+        finally:
+            self.is_running = False
+
+    async def _replay_updates(self):
+        """Применение записанных событий с заданной скоростью"""
+        updates = self.updates if self.updates is not None else np.zeros(0, dtype=RECORD_DTYPE)
+        if len(updates) == 0:
+            logger.warning("⚠️ В записи нет событий для воспроизведения")
+            return
+
+        self.replay_started = time.perf_counter()
+        first_event_ns = int(updates['event_ns'][0])
+
+        for i in range(len(updates)):
+            if not self.is_running:
+                break
+
+            event = updates[i]
+
+            if self.speed > 0:
+                due = self.replay_started + (int(event['event_ns']) - first_event_ns) / 1e9 / self.speed
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            else:
+                due = time.perf_counter()
+                # Отдаем управление циклу событий, чтобы не блокировать анализ
+                if i % REPLAY_CONFIG['yield_every'] == 0:
+                    await asyncio.sleep(0)
+
+            # Момент события в записи, перенесенный на текущее время воспроизведения
+            received = time.time()
+            exchange_ts = received - (time.perf_counter() - due)
+            
+            self._apply_event(event, exchange_ts, received)
+            self.events_replayed += 1
+            self.lag_samples.append(time.perf_counter() - due)
+
+        self.replay_finished = time.perf_counter()
+
+        stats = self.get_replay_statistics()
+        strategy = stats['latency_ms'].get('stages', {}).get(STAGE_STRATEGY_DONE, {})
+        logger.info(
+            f"⏹ Воспроизведение завершено: {stats['events_replayed']} событий, "
+            f"{stats['events_per_second']:.0f} событий/с, "
+            f"событие -> стратегия p50={strategy.get('p50', 0.0):.2f}мс p99={strategy.get('p99', 0.0):.2f}мс"
+        )
+
+    def _apply_event(self, event, exchange_ts: float, received_ts: float):
+        """Применение одного события к рыночным данным"""
+        pair = self.pairs[event['pair']]
+        timeframe = self.timeframes[event['timeframe']]
+        df = self.market_data[pair][timeframe]
+
+        timestamp = pd.Timestamp(int(event['ts_ms']), unit='ms')
+        values = [event['open'], event['high'], event['low'], event['close'], event['volume']]
+
+        if len(df) > 0 and df['timestamp'].iloc[-1] == timestamp:
+            # Обновление текущей свечи
+            df.iloc[-1, 1:] = values
+        else:
+            # Новая свеча: серия ограничена тем же окном, что и в живом потоке
+            keep = min(len(df), HISTORY_CANDLES - 1)
+            times = df['timestamp'].to_numpy()[len(df) - keep:]
+            prices = df.iloc[len(df) - keep:, 1:].to_numpy(dtype=np.float64)
+
+            columns = {'timestamp': np.append(times, timestamp.to_datetime64())}
+            for i, column in enumerate(df.columns[1:]):
+                columns[column] = np.append(prices[:, i], values[i])
+            df = pd.DataFrame(columns)
+            self.market_data[pair][timeframe] = df
+
+        self._on_candle_update(pair, timeframe, df, exchange_ts, received_ts)
+
+    def get_replay_statistics(self) -> Dict[str, Any]:
+        """Статистика воспроизведения: скорость, задержки стадий конвейера и отставание от расписания"""
+        if self.replay_started is None:
+            elapsed = 0.0
+        else:
+            elapsed = (self.replay_finished or time.perf_counter()) - self.replay_started
+
+        if self.lag_samples:
+            lags = np.array(self.lag_samples) * 1000
+            schedule_lag = {
+                'p50': float(np.percentile(lags, 50)),
+                'p95': float(np.percentile(lags, 95)),
+                'p99': float(np.percentile(lags, 99)),
+                'max': float(lags.max())
+            }
+        else:
+            schedule_lag = {'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0}
+
+        total = len(self.updates) if self.updates is not None else 0
+
+        return {
+            'filepath': self.filepath,
+            'speed': self.speed,
+            'events_total': total,
+            'events_replayed': self.events_replayed,
+            'progress': (self.events_replayed / total * 100) if total > 0 else 0.0,
+            'elapsed_seconds': elapsed,
+            'events_per_second': (self.events_replayed / elapsed) if elapsed > 0 else 0.0,
+            # От события записи до индикаторов, стратегии, доставки и сохранения сигнала
+            'latency_ms': self.latency_tracker.get_histograms() if self.latency_tracker else {},
+            'schedule_lag_ms': schedule_lag
+        }
+
+    def get_connection_status(self) -> Dict[str, Any]:
+        """Статус источника данных с информацией о воспроизведении"""
+        status = super().get_connection_status()
+        status['mode'] = 'replay'
+        status['replay'] = self.get_replay_statistics()
+        return status
@@ -0,0 +1,130 @@
+"""
+Хранение истории в базе данных
+Устаревшие сигналы и свечи удаляются порциями по расписанию, освобожденное место возвращается постепенно
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Dict, Any
+
+from globals import RETENTION_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Значения PRAGMA auto_vacuum
+AUTO_VACUUM_INCREMENTAL = 2
+AUTO_VACUUM_MODES = {0: 'NONE', 1: 'FULL', 2: 'INCREMENTAL'}
+
+
+class RetentionManager:
+    """Удаление устаревших строк короткими транзакциями
+
+    Каждая порция - отдельный запрос в потоке базы данных, между порциями цикл событий
+    и другие запросы получают управление, поэтому удаление не держит блокировку записи.
+    """
+
+    def __init__(self, database, config: Dict[str, Any] = None):
+        self.database = database
+        self.config = config or RETENTION_CONFIG
+
+        self.stats = {
+            'runs': 0,
+            'signals_deleted': 0,
+            'market_data_deleted': 0,
+            'freed_pages': 0,
+            'busy_ms': 0.0,
+            'last_run': None,
+            'auto_vacuum': None
+        }
+        self.last_run = {}
+
+    async def _delete_in_chunks(self, delete, days: int) -> Dict[str, Any]:
+        """Вызов delete(days, chunk_rows), пока удаляется полная порция"""
+        limit = self.config['chunk_rows']
+        deleted = 0
+        chunks = 0
+        busy = 0.0
+
+        while True:
+            started = time.perf_counter()
+            count = await delete(days, limit)
+            busy += time.perf_counter() - started
+
+            deleted += count
+            chunks += 1
+            if count < limit:
+                break
+
+            await asyncio.sleep(self.config['chunk_pause'])
+
+        return {'deleted': deleted, 'chunks': chunks, 'busy_ms': busy * 1000}
+
+    async def _ensure_incremental_vacuum(self):
+        """Проверка режима auto_vacuum; база, созданная без INCREMENTAL, переводится одним VACUUM"""
+        mode = await self.database.get_auto_vacuum_mode()
+
+        if mode != AUTO_VACUUM_INCREMENTAL:
+            if self.config['convert_auto_vacuum']:
+                logger.warning("⚠️ База создана без auto_vacuum = INCREMENTAL - выполняется однократный VACUUM")
+                started = time.perf_counter()
+                mode = await self.database.convert_to_incremental_vacuum()
+                logger.info(f"🗜 VACUUM выполнен за {(time.perf_counter() - started) * 1000:.0f}мс")
+            else:
+                logger.warning(
+                    "⚠️ auto_vacuum базы не INCREMENTAL: освобожденное место не возвращается файлу. "
+                    "Остановите бота и выполните: python database.py vacuum"
+                )
+
+        self.stats['auto_vacuum'] = AUTO_VACUUM_MODES.get(mode, mode)
+
+    async def run_once(self) -> Dict[str, Any]:
+        """Один проход хранения: сигналы, свечи, затем incremental_vacuum порциями"""
+        started = time.perf_counter()
+
+        if self.stats['auto_vacuum'] is None:
+            await self._ensure_incremental_vacuum()
+
+        signals = await self._delete_in_chunks(self.database.delete_expired_signals, self.config['signals_days'])
+        market_data = await self._delete_in_chunks(self.database.delete_expired_market_data, self.config['market_data_days'])
+
+        freed = 0
+        vacuum_busy = 0.0
+        while True:
+            vacuum_start = time.perf_counter()
+            vacuum = await self.database.incremental_vacuum(self.config['vacuum_pages'])
+            vacuum_busy += time.perf_counter() - vacuum_start
+
+            freed += vacuum['freed_pages']
+            if not vacuum['incremental'] or not vacuum['free_pages'] or not vacuum['freed_pages']:
+                break
+
+            await asyncio.sleep(self.config['chunk_pause'])
+
+        busy_ms = signals['busy_ms'] + market_data['busy_ms'] + vacuum_busy * 1000
+        result = {
+            'signals_deleted': signals['deleted'],
+            'market_data_deleted': market_data['deleted'],
+            'chunks': signals['chunks'] + market_data['chunks'],
+            'freed_pages': freed,
+            'busy_ms': busy_ms,
+            'elapsed_ms': (time.perf_counter() - started) * 1000
+        }
+
+        self.stats['runs'] += 1
+        self.stats['signals_deleted'] += signals['deleted']
+        self.stats['market_data_deleted'] += market_data['deleted']
+        self.stats['freed_pages'] += freed
+        self.stats['busy_ms'] += busy_ms
+        self.stats['last_run'] = datetime.now().isoformat()
+        self.last_run = result
+
+        logger.info(
+            f"🗑 Очистка истории: сигналов {signals['deleted']}, свечей {market_data['deleted']}, "
+            f"освобождено страниц {freed}, {busy_ms:.0f}мс в базе"
+        )
+        return result
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {**self.stats, 'last': self.last_run}
@@ -0,0 +1,232 @@
+"""
+Планировщик анализа серий
+Каждый таймфрейм анализируется со своей периодичностью, по закрытию свечи
+или при заметном движении цены, в пределах общего бюджета времени и дедлайна цикла
+"""
+
+import logging
+import time
+from typing import Dict, List, Any, Optional, Tuple
+
+import pandas as pd
+
+from globals import SCHEDULER_CONFIG, STRATEGY_CONFIG, TIMEFRAMES
+
+logger = logging.getLogger(__name__)
+
+# Причины запуска анализа серии в порядке приоритета
+TRIGGER_FIRST_RUN = 'first_run'
+TRIGGER_CANDLE_CLOSE = 'candle_close'
+TRIGGER_PRICE_MOVE = 'price_move'
+TRIGGER_INTERVAL = 'interval'
+
+TRIGGERS = [TRIGGER_FIRST_RUN, TRIGGER_CANDLE_CLOSE, TRIGGER_PRICE_MOVE, TRIGGER_INTERVAL]
+
+# Базовый приоритет причины запуска
+TRIGGER_PRIORITY = {
+    TRIGGER_FIRST_RUN: 3.0,
+    TRIGGER_CANDLE_CLOSE: 2.0,
+    TRIGGER_PRICE_MOVE: 1.0,
+    TRIGGER_INTERVAL: 0.0
+}
+
+# Ограничение вклада каждого слагаемого приоритета
+PRIORITY_COMPONENT_LIMIT = 5.0
+
+# Окно среднего объема для приоритета
+PRIORITY_VOLUME_WINDOW = 20
+
+# Коэффициент скользящего среднего стоимости анализа серии
+COST_SMOOTHING = 0.2
+
+
+class AnalysisScheduler:
+    """Выбор серий, которые нужно анализировать в текущем цикле"""
+
+    def __init__(self, config: Dict[str, Any] = None):
+        self.config = config or SCHEDULER_CONFIG
+
+        # (pair, timeframe) -> время анализа, время открытия последней свечи и цена на момент анализа
+        self.series_state = {}
+        self.pending = {}
+
+        # Оценка стоимости анализа одной серии, секунд
+        self.series_cost = None
+
+        self.timeframe_stats = {tf: self._empty_stats() for tf in TIMEFRAMES}
+        self.cycles = 0
+
+    @staticmethod
+    def _empty_stats() -> Dict[str, Any]:
+        return {
+            'analyzed': 0,
+            'skipped': 0,
+            'deferred': 0,
+            'failed': 0,
+            'triggers': {trigger: 0 for trigger in TRIGGERS}
+        }
+
+    def get_interval(self, pair: str, timeframe: str) -> float:
+        """Максимальный интервал между анализами серии, секунд"""
+        pair_intervals = self.config['pair_intervals'].get(pair, {})
+        if timeframe in pair_intervals:
+            return pair_intervals[timeframe]
+        return self.config['timeframe_intervals'].get(timeframe, STRATEGY_CONFIG['update_interval'])
+
+    def get_budget(self) -> float:
+        """Бюджет времени анализа на цикл, секунд"""
+        return self.config['cpu_budget'] * STRATEGY_CONFIG['update_interval']
+
+    def _check_trigger(self, pair: str, timeframe: str, candle_time: Any, price: float, now: float) -> Tuple[Optional[str], float]:
+        """Причина анализа серии (None - анализ не нужен) и степень просрочки"""
+        state = self.series_state.get((pair, timeframe))
+        if state is None:
+            return TRIGGER_FIRST_RUN, PRIORITY_COMPONENT_LIMIT
+
+        analyzed_at, last_candle_time, last_price = state
+        overdue = (now - analyzed_at) / max(self.get_interval(pair, timeframe), 1e-9)
+
+        # Открытие новой свечи означает закрытие предыдущей
+        if self.config['trigger_on_candle_close'] and candle_time != last_candle_time:
+            return TRIGGER_CANDLE_CLOSE, overdue
+
+        min_move = self.config['min_price_move'].get(timeframe)
+        if min_move and last_price and abs(price / last_price - 1) >= min_move:
+            return TRIGGER_PRICE_MOVE, overdue
+
+        if overdue >= 1:
+            return TRIGGER_INTERVAL, overdue
+
+        return None, overdue
+
+    def _priority(self, trigger: str, overdue: float, data: pd.DataFrame, pair: str, timeframe: str, price: float) -> float:
+        """Дешевая оценка приоритета серии: причина, объем, движение цены и давность анализа"""
+        weights = self.config['priority_weights']
+        limit = PRIORITY_COMPONENT_LIMIT
+
+        volumes = data['volume'].to_numpy()[-PRIORITY_VOLUME_WINDOW:]
+        mean_volume = volumes.mean()
+        volume_ratio = volumes[-1] / mean_volume if mean_volume > 0 else 0.0
+
+        # Движение с прошлого анализа в единицах порога min_price_move
+        state = self.series_state.get((pair, timeframe))
+        reference = state[2] if state else float(data['close'].iloc[-2]) if len(data) > 1 else price
+        min_move = self.config['min_price_move'].get(timeframe) or 0.001
+        move = abs(price / reference - 1) / min_move if reference else 0.0
+
+        return (
+            TRIGGER_PRIORITY[trigger] * weights['trigger'] +
+            min(volume_ratio, limit) * weights['volume_ratio'] +
+            min(move, limit) * weights['price_change'] +
+            min(overdue, limit) * weights['staleness']
+        )
+
+    def select_due(self, market_data: Dict[str, Dict[str, pd.DataFrame]]) -> Dict[str, Dict[str, pd.DataFrame]]:
+        """Подмножество рыночных данных с сериями, подлежащими анализу в этом цикле"""
+        try:
+            now = time.monotonic()
+            candidates = []
+
+            for pair, timeframes in market_data.items():
+                for timeframe, data in timeframes.items():
+                    if len(data) == 0:
+                        continue
+
+                    candle_time = data['timestamp'].iloc[-1]
+                    price = float(data['close'].iloc[-1])
+                    trigger, overdue = self._check_trigger(pair, timeframe, candle_time, price, now)
+                    stats = self.timeframe_stats.setdefault(timeframe, self._empty_stats())
+
+                    if trigger is None:
+                        stats['skipped'] += 1
+                        continue
+
+                    priority = self._priority(trigger, overdue, data, pair, timeframe, price)
+                    candidates.append((priority, pair, timeframe, trigger, candle_time, price))
+
+            # Серии с большим приоритетом получают бюджет первыми
+            candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+
+            budget = self.get_budget()
+            spent = 0.0
+            selected = {}
+            self.pending = {}
+
+            for _, pair, timeframe, trigger, candle_time, price in candidates:
+                stats = self.timeframe_stats[timeframe]
+
+                if self.series_cost is not None and self.pending and spent + self.series_cost > budget:
+                    stats['deferred'] += 1
+                    continue
+
+                spent += self.series_cost or 0.0
+                selected.setdefault(pair, {})[timeframe] = market_data[pair][timeframe]
+                self.pending[(pair, timeframe)] = (trigger, candle_time, price)
+
+            return selected
+
+        except Exception as e:
+            logger.error(f"Ошибка планирования анализа: {e}")
+            return market_data
+
+    def get_order(self) -> List[Tuple[str, str]]:
+        """Выбранные серии в порядке убывания приоритета"""
+        return list(self.pending)
+
+    def get_deadline(self, cycle_start: float) -> float:
+        """Дедлайн анализа цикла (time.monotonic)"""
+        return cycle_start + self.config['cycle_deadline']
+
+    def record_cycle(self, elapsed: float, analyzed: List[Tuple[str, str]] = None, deferred: List[Tuple[str, str]] = None):
+        """Учет выполненного цикла: состояние серий и оценка стоимости анализа
+
+        analyzed - серии, прошедшие стадию стратегии. Только они получают новое состояние;
+        отложенные по дедлайну и не проанализированные (короткая история, сбой пакета)
+        сохраняют прежнее и остаются к анализу, их приоритет растет вместе с давностью анализа.
+        """
+        try:
+            now = time.monotonic()
+            analyzed_series = set(analyzed or [])
+            deferred = set(deferred or [])
+            analyzed = 0
+
+            for (pair, timeframe), (trigger, candle_time, price) in self.pending.items():
+                stats = self.timeframe_stats[timeframe]
+
+                if (pair, timeframe) in deferred:
+                    stats['deferred'] += 1
+                    continue
+
+                if (pair, timeframe) not in analyzed_series:
+                    stats['failed'] += 1
+                    continue
+
+                self.series_state[(pair, timeframe)] = (now, candle_time, price)
+                stats['analyzed'] += 1
+                stats['triggers'][trigger] += 1
+                analyzed += 1
+
+            if analyzed:
+                cost = elapsed / analyzed
+                if self.series_cost is None:
+                    self.series_cost = cost
+                else:
+                    self.series_cost += (cost - self.series_cost) * COST_SMOOTHING
+
+            self.pending = {}
+            self.cycles += 1
+
+        except Exception as e:
+            logger.error(f"Ошибка учета цикла планировщика: {e}")
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Число анализов, пропусков и отложенных серий по таймфреймам"""
+        return {
+            'cycles': self.cycles,
+            'budget_seconds': self.get_budget(),
+            'series_cost_ms': (self.series_cost or 0.0) * 1000,
+            'timeframes': {
+                timeframe: {**stats, 'triggers': dict(stats['triggers'])}
+                for timeframe, stats in self.timeframe_stats.items()
+            }
+        }
@@ -0,0 +1,199 @@
+"""
+Теневые модели ИИ
+Кандидаты оценивают ту же матрицу признаков, что и основная модель, без влияния на сигналы
+"""
+
+import logging
+import time
+from typing import Dict, List, Any, Tuple
+
+import numpy as np
+
+from globals import SHADOW_CONFIG
+from ai_model import AIPredictor
+from prediction_history import PredictionHistory
+
+logger = logging.getLogger(__name__)
+
+# Имя основной модели в статистике результатов
+LIVE_MODEL = 'live'
+
+# Коэффициент скользящего среднего времени оценки
+COST_SMOOTHING = 0.2
+
+
+class ShadowModels:
+    """Реестр теневых моделей, их предсказания и сравнение с результатами сигналов"""
+
+    def __init__(self, live_predictor: AIPredictor, config: Dict[str, Any] = None):
+        self.live = live_predictor
+        self.config = config or SHADOW_CONFIG
+
+        self.models = {}  # name -> AIPredictor
+        self.stats = {}
+        self.outcomes = {LIVE_MODEL: self._new_outcomes()}
+
+        # Бюджет задержки текущего цикла анализа (см. begin_cycle)
+        self.cycle_spent = 0.0
+        self.cycle_scored = set()
+        self.cycle_skipped = set()
+
+        for spec in self.config['models']:
+            self.register_spec(spec)
+
+    def _new_outcomes(self) -> PredictionHistory:
+        return PredictionHistory(self.config['outcome_window'])
+
+    def register(self, name: str, predictor: AIPredictor):
+        """Регистрация теневой модели (любой объект с predict_batch)"""
+        self.models[name] = predictor
+        self.stats[name] = {
+            'cycles': 0,
+            'scored': 0,
+            'skipped_cycles': 0,
+            'avg_ms': None,
+            'disabled': False,
+            'agreement': 0.0,
+            'mean_abs_diff': 0.0
+        }
+        self.outcomes[name] = self._new_outcomes()
+        logger.info(f"👥 Зарегистрирована теневая модель: {name}")
+
+    def register_spec(self, spec: Dict[str, Any]):
+        """Регистрация по описанию из SHADOW_CONFIG['models']: альтернативные веса или файл модели"""
+        try:
+            predictor = AIPredictor()
+
+            if spec.get('model_path'):
+                predictor.load_model(spec['model_path'])
+            if spec.get('weights'):
+                predictor.model_weights = {**predictor.model_weights, **spec['weights']}
+
+            self.register(spec['name'], predictor)
+
+        except Exception as e:
+            logger.error(f"Ошибка регистрации теневой модели {spec.get('name')}: {e}")
+
+    def unregister(self, name: str):
+        self.models.pop(name, None)
+        self.stats.pop(name, None)
+        self.outcomes.pop(name, None)
+
+    def begin_cycle(self):
+        """Начало цикла анализа: лимит задержки общий для всех вызовов score в цикле"""
+        self.cycle_spent = 0.0
+        self.cycle_scored = set()
+        self.cycle_skipped = set()
+
+    def _skip(self, name: str):
+        if name not in self.cycle_skipped:
+            self.cycle_skipped.add(name)
+            self.stats[name]['skipped_cycles'] += 1
+
+    def score(self, features: np.ndarray, keys: List[Tuple[str, str]], live_scores: np.ndarray) -> Dict[str, np.ndarray]:
+        """Предсказания теневых моделей для строк, оцененных основной моделью
+
+        Модели оцениваются по очереди, пока ожидаемое время укладывается в остаток
+        SHADOW_CONFIG['latency_cap_ms'] на цикл анализа (пакетный путь вызывает score один раз
+        за цикл, скалярный - для каждой серии); модель, которая в среднем сама дольше лимита, отключается.
+        """
+        results = {}
+        if not self.config['enabled'] or not self.models or not len(keys):
+            return results
+
+        remaining = self.config['latency_cap_ms'] / 1000 - self.cycle_spent
+        started = time.perf_counter()
+
+        for name, predictor in self.models.items():
+            stats = self.stats[name]
+            if stats['disabled']:
+                continue
+
+            expected = (stats['avg_ms'] or 0.0) / 1000
+            if time.perf_counter() - started + expected > remaining:
+                self._skip(name)
+                continue
+
+            try:
+                # История коррекций общая с основной моделью: различаются только веса и модель
+                predictor.historical_data = self.live.historical_data
+
+                model_start = time.perf_counter()
+                scores = predictor.predict_batch(features, keys)
+                cost_ms = (time.perf_counter() - model_start) * 1000
+
+            except Exception as e:
+                logger.error(f"Ошибка теневой модели {name}: {e}")
+                self._skip(name)
+                continue
+
+            stats['avg_ms'] = cost_ms if stats['avg_ms'] is None else stats['avg_ms'] + (cost_ms - stats['avg_ms']) * COST_SMOOTHING
+            if stats['avg_ms'] > self.config['latency_cap_ms']:
+                stats['disabled'] = True
+                logger.warning(f"⚠️ Теневая модель {name} отключена: {stats['avg_ms']:.2f}мс на оценку")
+
+            # Совпадение направления и расхождение с основной моделью (накопительное среднее)
+            n = stats['scored']
+            m = len(scores)
+            agreement = float(np.mean((scores > 0.5) == (live_scores > 0.5)))
+            diff = float(np.mean(np.abs(scores - live_scores)))
+            stats['agreement'] = (stats['agreement'] * n + agreement * m) / (n + m)
+            stats['mean_abs_diff'] = (stats['mean_abs_diff'] * n + diff * m) / (n + m)
+            stats['scored'] += m
+            if name not in self.cycle_scored:
+                self.cycle_scored.add(name)
+                stats['cycles'] += 1
+
+            logger.debug(f"Теневая модель {name}: {m} серий, совпадение {agreement:.0%}, расхождение {diff:.3f}")
+            results[name] = scores
+
+        self.cycle_spent += time.perf_counter() - started
+        return results
+
+    def record_outcome(self, signal: Dict[str, Any], actual: float):
+        """Сравнение предсказаний основной и теневых моделей с результатом сигнала"""
+        try:
+            timestamp = time.time()
+            scores = {LIVE_MODEL: signal.get('ai_score', 50) / 100, **(signal.get('shadow_scores') or {})}
+
+            for name, prediction in scores.items():
+                outcomes = self.outcomes.get(name)
+                if outcomes is None:
+                    continue
+
+                error = abs(prediction - actual)
+                outcomes.append(timestamp, prediction, actual, 1.0 if error < 0.2 else 0.0, error)
+
+        except Exception as e:
+            logger.error(f"Ошибка учета результата теневых моделей: {e}")
+
+    def promote(self, name: str) -> bool:
+        """Перевод теневой модели в основную: веса и обученная модель публикуются новой версией"""
+        predictor = self.models.get(name)
+        if predictor is None:
+            return False
+
+        self.live.model_weights = dict(predictor.model_weights)
+        if predictor.trained_model is not None:
+            self.live.registry.publish(predictor.trained_model.copy(), f'shadow:{name}')
+
+        self.unregister(name)
+        logger.info(f"⬆️ Теневая модель {name} переведена в основную")
+        return True
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Время, совпадение с основной моделью и точность по результатам сигналов"""
+        def outcome_stats(outcomes: PredictionHistory) -> Dict[str, Any]:
+            return {
+                'outcomes': len(outcomes),
+                'accuracy': outcomes.mean_accuracy(),
+                'error': outcomes.mean_error()
+            }
+
+        return {
+            'live': outcome_stats(self.outcomes[LIVE_MODEL]),
+            'models': {
+                name: {**stats, **outcome_stats(self.outcomes[name])}
+                for name, stats in self.stats.items()
+            }
+        }
@@ -0,0 +1,273 @@
+"""
+Модуль хранения свечей в разделяемой памяти
+Рабочие процессы читают массивы без сериализации DataFrame
+"""
+
+import json
+import logging
+import os
+import struct
+import time
+import multiprocessing
+from multiprocessing import shared_memory, resource_tracker
+from typing import Dict, List, Any, Optional
+
+import numpy as np
+import pandas as pd
+
+from globals import SHARED_MEMORY_CONFIG
+
+logger = logging.getLogger(__name__)
+
+SHM_MAGIC = b'QPSHM001'
+SHM_LAYOUT_VERSION = 1
+
+# Поля свечи в порядке хранения; время хранится как epoch-ms в float64
+CANDLE_FIELDS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+
+# magic, версия раскладки, пар, таймфреймов, емкость, полей, длина метаданных
+HEADER_STRUCT = struct.Struct('<8sIIIIII')
+HEADER_SIZE = 4096  # Заголовок с JSON-метаданными
+ALIGNMENT = 64
+
+
+def _align(value: int) -> int:
+    return (value + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def segment_name(pid: int = None) -> str:
+    """Имя сегмента экземпляра бота: у каждого процесса-владельца свой сегмент"""
+    return f"{SHARED_MEMORY_CONFIG['name']}_{pid or os.getpid()}"
+
+
+class SharedCandleStore:
+    """Свечи всех пар и таймфреймов в одном сегменте разделяемой памяти
+
+    Раскладка сегмента:
+    - заголовок (HEADER_SIZE байт): HEADER_STRUCT + JSON со списками пар, таймфреймов и полей
+    - таблица серий int64[n_series, 2]: длина серии и счетчик версии (seqlock)
+    - данные float64[n_series, capacity, n_fields]
+
+    Писатель один (процесс с потоком данных). Счетчик версии нечетный во время записи,
+    читатель повторяет чтение, если версия изменилась или нечетна.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, pairs: List[str], timeframes: List[str],
+                 capacity: int, owner: bool):
+        self.shm = shm
+        self.name = shm.name
+        self.pairs = list(pairs)
+        self.timeframes = list(timeframes)
+        self.capacity = capacity
+        self.fields = list(CANDLE_FIELDS)
+        self.owner = owner
+
+        # Статистика чтения снимков в этом процессе
+        self.read_stats = {'reads': 0, 'retries': 0, 'failed_reads': 0}
+
+        self.pair_index = {pair: i for i, pair in enumerate(self.pairs)}
+        self.timeframe_index = {tf: i for i, tf in enumerate(self.timeframes)}
+        self.n_series = len(self.pairs) * len(self.timeframes)
+
+        table_offset = HEADER_SIZE
+        data_offset = _align(table_offset + self.n_series * 2 * 8)
+
+        self.series_table = np.ndarray((self.n_series, 2), dtype=np.int64, buffer=shm.buf, offset=table_offset)
+        self.data = np.ndarray(
+            (self.n_series, capacity, len(self.fields)), dtype=np.float64, buffer=shm.buf, offset=data_offset
+        )
+
+    @staticmethod
+    def required_size(n_series: int, capacity: int) -> int:
+        """Размер сегмента для заданного числа серий"""
+        data_offset = _align(HEADER_SIZE + n_series * 2 * 8)
+        return data_offset + n_series * capacity * len(CANDLE_FIELDS) * 8
+
+    @classmethod
+    def create(cls, pairs: List[str], timeframes: List[str], capacity: int = None, name: str = None) -> 'SharedCandleStore':
+        """Создание сегмента (процесс-владелец потока данных)"""
+        capacity = capacity or SHARED_MEMORY_CONFIG['capacity']
+        name = name or segment_name()
+
+        meta = json.dumps({'pairs': list(pairs), 'timeframes': list(timeframes), 'fields': CANDLE_FIELDS}).encode('utf-8')
+        if HEADER_STRUCT.size + len(meta) > HEADER_SIZE:
+            raise ValueError("Метаданные не помещаются в заголовок сегмента")
+
+        size = cls.required_size(len(pairs) * len(timeframes), capacity)
+
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Чужой сегмент не удаляется: его могут читать воркеры другого экземпляра
+            raise FileExistsError(f"Сегмент разделяемой памяти {name} уже существует") from None
+
+        HEADER_STRUCT.pack_into(
+            shm.buf, 0, SHM_MAGIC, SHM_LAYOUT_VERSION,
+            len(pairs), len(timeframes), capacity, len(CANDLE_FIELDS), len(meta)
+        )
+        shm.buf[HEADER_STRUCT.size:HEADER_STRUCT.size + len(meta)] = meta
+
+        store = cls(shm, pairs, timeframes, capacity, owner=True)
+        store.series_table[:] = 0
+
+        logger.info(f"🧠 Сегмент разделяемой памяти создан: {name} ({size / 1024:.0f} КБ)")
+        return store
+
+    @classmethod
+    def attach(cls, name: str = None) -> 'SharedCandleStore':
+        """Подключение к существующему сегменту (рабочий процесс; по умолчанию - сегмент родителя)"""
+        name = name or segment_name(os.getppid())
+        shm = shared_memory.SharedMemory(name=name)
+
+        # Читатель не владеет сегментом: собственный трекер ресурсов удалил бы его при выходе.
+        # Дочерние процессы владельца используют его трекер, там регистрацию не снимаем
+        if multiprocessing.parent_process() is None:
+            try:
+                resource_tracker.unregister(shm._name, 'shared_memory')
+            except Exception:
+                pass
+
+        magic, version, n_pairs, n_timeframes, capacity, n_fields, meta_len = HEADER_STRUCT.unpack_from(shm.buf, 0)
+
+        if magic != SHM_MAGIC:
+            shm.close()
+            raise ValueError(f"Сегмент {name} не является хранилищем свечей")
+
+        if version != SHM_LAYOUT_VERSION or n_fields != len(CANDLE_FIELDS):
+            shm.close()
+            raise ValueError(f"Несовместимая версия раскладки сегмента {name}: {version}")
+
+        meta = json.loads(bytes(shm.buf[HEADER_STRUCT.size:HEADER_STRUCT.size + meta_len]).decode('utf-8'))
+
+        return cls(shm, meta['pairs'], meta['timeframes'], capacity, owner=False)
+
+    def _series_id(self, pair: str, timeframe: str) -> int:
+        return self.pair_index[pair] * len(self.timeframes) + self.timeframe_index[timeframe]
+
+    def write_frame(self, pair: str, timeframe: str, df: pd.DataFrame):
+        """Полная запись серии (последние capacity свечей)"""
+        series_id = self._series_id(pair, timeframe)
+        tail = df.iloc[-self.capacity:]
+        length = len(tail)
+
+        block = self.data[series_id]
+        self.series_table[series_id, 1] += 1  # Начало записи
+
+        block[:length, 0] = tail['timestamp'].to_numpy().astype('datetime64[ms]').astype('int64')
+        block[:length, 1:] = tail[CANDLE_FIELDS[1:]].to_numpy(dtype=np.float64)
+        self.series_table[series_id, 0] = length
+
+        self.series_table[series_id, 1] += 1  # Конец записи
+
+    def update_series(self, pair: str, timeframe: str, df: pd.DataFrame):
+        """Синхронизация серии после обновления: только последняя свеча, если она не сменилась"""
+        try:
+            series_id = self._series_id(pair, timeframe)
+            length = int(self.series_table[series_id, 0])
+
+            last = df.iloc[-1]
+            last_ts = pd.Timestamp(last['timestamp']).to_datetime64().astype('datetime64[ms]').astype('int64')
+
+            # Новая свеча или сдвиг окна - полная перезапись серии
+            if length == 0 or length != min(len(df), self.capacity) or self.data[series_id, length - 1, 0] != last_ts:
+                self.write_frame(pair, timeframe, df)
+                return
+
+            self.series_table[series_id, 1] += 1
+            self.data[series_id, length - 1, 1:] = [last[field] for field in CANDLE_FIELDS[1:]]
+            self.series_table[series_id, 1] += 1
+
+        except Exception as e:
+            logger.error(f"Ошибка обновления разделяемой памяти {pair} {timeframe}: {e}")
+
+    def write_all(self, market_data: Dict[str, Dict[str, pd.DataFrame]]):
+        """Запись всех серий"""
+        for pair, timeframes in market_data.items():
+            if pair not in self.pair_index:
+                continue
+            for timeframe, df in timeframes.items():
+                if timeframe in self.timeframe_index and len(df) > 0:
+                    self.write_frame(pair, timeframe, df)
+
+    def get_arrays(self, pair: str, timeframe: str) -> Dict[str, np.ndarray]:
+        """Представления полей серии без копирования (может прочитать незавершенную запись)"""
+        series_id = self._series_id(pair, timeframe)
+        length = int(self.series_table[series_id, 0])
+        block = self.data[series_id, :length]
+        return {field: block[:, i] for i, field in enumerate(self.fields)}
+
+    def get_version(self, pair: str, timeframe: str) -> int:
+        """Счетчик версии серии (меняется при каждой записи)"""
+        return int(self.series_table[self._series_id(pair, timeframe), 1])
+
+    def read_snapshot(self, pair: str, timeframe: str, retries: int = None) -> Optional[np.ndarray]:
+        """Согласованная копия серии float64[length, n_fields]
+
+        Пока писатель держит версию нечетной, читатель уступает процессор (sleep(0)),
+        после нескольких неудач ждет с растущей паузой до retry_max_sleep.
+        """
+        series_id = self._series_id(pair, timeframe)
+        retries = retries or SHARED_MEMORY_CONFIG['read_retries']
+        spin = SHARED_MEMORY_CONFIG['retry_spin']
+        pause = SHARED_MEMORY_CONFIG['retry_sleep']
+        self.read_stats['reads'] += 1
+
+        for attempt in range(retries):
+            if attempt:
+                self.read_stats['retries'] += 1
+                if attempt <= spin:
+                    time.sleep(0)
+                else:
+                    time.sleep(pause)
+                    pause = min(pause * 2, SHARED_MEMORY_CONFIG['retry_max_sleep'])
+
+            version = int(self.series_table[series_id, 1])
+            if version % 2:
+                continue
+
+            length = int(self.series_table[series_id, 0])
+            snapshot = self.data[series_id, :length].copy()
+
+            if int(self.series_table[series_id, 1]) == version:
+                return snapshot
+
+        self.read_stats['failed_reads'] += 1
+        logger.warning(f"⚠️ Не удалось получить согласованный снимок {pair} {timeframe}")
+        return None
+
+    def read_frame(self, pair: str, timeframe: str) -> Optional[pd.DataFrame]:
+        """Серия в виде DataFrame с теми же колонками, что и у BinanceWebSocket"""
+        snapshot = self.read_snapshot(pair, timeframe)
+        if snapshot is None:
+            return None
+
+        frame = pd.DataFrame(snapshot[:, 1:], columns=CANDLE_FIELDS[1:])
+        frame.insert(0, 'timestamp', pd.to_datetime(snapshot[:, 0].astype('int64'), unit='ms'))
+        return frame
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Статистика сегмента"""
+        return {
+            'name': self.name,
+            'layout_version': SHM_LAYOUT_VERSION,
+            'series': self.n_series,
+            'capacity': self.capacity,
+            'size_bytes': self.shm.size,
+            'owner': self.owner,
+            'reads': dict(self.read_stats)
+        }
+
+    def close(self):
+        """Отключение от сегмента; владелец также удаляет его"""
+        try:
+            # Представления должны быть освобождены до закрытия буфера
+            self.series_table = None
+            self.data = None
+            self.shm.close()
+
+            if self.owner:
+                self.shm.unlink()
+                logger.info(f"🧠 Сегмент разделяемой памяти удален: {self.name}")
+
+        except Exception as e:
+            logger.error(f"Ошибка закрытия сегмента разделяемой памяти: {e}")
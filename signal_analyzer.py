@@ -5,53 +5,130 @@
 
 import asyncio
 import logging
+import multiprocessing
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any, Tuple
 
-from globals import STRATEGY_CONFIG, INDICATOR_WEIGHTS, TRADING_PAIRS, TIMEFRAMES
+from globals import (
+    STRATEGY_CONFIG, INDICATOR_WEIGHTS, TRADING_PAIRS, TIMEFRAMES,
+    ANALYSIS_CONFIG, SHARED_MEMORY_CONFIG, INDICATOR_CACHE_CONFIG
+)
 from indicators import TechnicalIndicators
+from shared_market_data import segment_name
+from analysis_workers import compute_indicators_chunk, init_worker, MIN_SERIES_LENGTH, STRATEGY_TAIL_ROWS
+from indicator_cache import IndicatorCache, series_version
 from ai_model import AIPredictor
+from shadow_models import ShadowModels
+from ai_features import FeatureMatrix, FEATURE_COUNT, FEATURE_DTYPE, write_features
+from strategy_batch import BatchStrategyEvaluator
+from latency import stamp, CANDLE_STAGES, STAGE_INDICATORS_DONE, STAGE_STRATEGY_DONE
 
 logger = logging.getLogger(__name__)
 
+# Коэффициент скользящего среднего времени уровней
+LEVEL_TIME_SMOOTHING = 0.1
+
 class SignalAnalyzer:
-    def __init__(self, telegram_bot, database):
+    def __init__(self, telegram_bot, database, latency_tracker=None, ai_predictor: Optional[AIPredictor] = None):
         self.telegram = telegram_bot
         self.database = database
+        self.latency_tracker = latency_tracker
         self.indicators = TechnicalIndicators()
-        self.ai_predictor = AIPredictor()
+        
+        # Общий с торговым ядром предсказатель: загруженная и переобученная модель сразу обслуживает анализ
+        self.ai_predictor = ai_predictor or AIPredictor()
+        self.shadow_models = ShadowModels(self.ai_predictor)
+        self.batch_evaluator = BatchStrategyEvaluator(STRATEGY_CONFIG)
+        
+        # Признаки ИИ всех серий цикла (заполняются стадией индикаторов)
+        self.feature_matrix = FeatureMatrix(len(TRADING_PAIRS) * len(TIMEFRAMES))
         
         self.config = STRATEGY_CONFIG
         self.weights = INDICATOR_WEIGHTS
+        self.analysis_config = ANALYSIS_CONFIG
+        
+        # Пул исполнителей для расчета индикаторов (создается при первом цикле)
+        self.executor = None
+        self.executor_stats = {
+            'cycles': 0,
+            'chunks': 0,
+            'timeouts': 0,
+            'errors': 0,
+            'deferred': 0,
+            'overruns': 0,
+            'shared_read_failures': 0,
+            'last_cycle_seconds': 0.0
+        }
+        self.last_deferred = []
+        self.last_analyzed = []
+        
+        # Индикаторы серий, не изменившихся с прошлого цикла
+        self.indicator_cache = IndicatorCache() if INDICATOR_CACHE_CONFIG['enabled'] else None
+        
+        # Статистика вычисления и пропуска уровней верификации
+        self.level_stats = {
+            level: {'evaluated': 0, 'skipped': 0, 'avg_ms': 0.0, 'saved_ms': 0.0}
+            for level in ('level1', 'level2', 'level3', 'patterns')
+        }
         
         # Кэш для хранения данных
         self.market_data_cache = {}
         self.last_signals = {}
         self.signal_history = []
         
-    async def analyze_all_pairs(self, market_data: Dict[str, Dict[str, pd.DataFrame]]) -> List[Dict[str, Any]]:
-        """Анализ всех пар на всех таймфреймах"""
+    async def analyze_all_pairs(self, market_data: Dict[str, Dict[str, pd.DataFrame]],
+                                order: Optional[List[Tuple[str, str]]] = None,
+                                deadline: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Анализ всех пар на всех таймфреймах
+        
+        order - порядок серий по убыванию приоритета, deadline - время (time.monotonic),
+        после которого расчет индикаторов оставшихся серий откладывается (см. last_deferred).
+        """
         try:
             logger.info("🔍 Начинаем анализ всех пар...")
             
             signals = []
-            tasks = []
-            
-            # Создаем задачи для параллельного анализа
-            for pair in TRADING_PAIRS:
-                for timeframe in TIMEFRAMES:
-                    if pair in market_data and timeframe in market_data[pair]:
-                        task = self._analyze_pair_timeframe(
-                            pair, 
-                            timeframe, 
-                            market_data[pair][timeframe]
-                        )
-                        tasks.append(task)
-            
-            # Выполняем все задачи параллельно
-            results = await asyncio.gather(*tasks, return_exceptions=True)
+            cycle_start = time.perf_counter()
+            self.last_deferred = []
+            self.last_analyzed = []
+            self.feature_matrix.reset()
+            self.shadow_models.begin_cycle()
+            
+            series = self._collect_series(market_data, order)
+            
+            if self.analysis_config['executor_mode'] == 'sequential':
+                entries, results = self._compute_indicators_sequential(series, deadline), []
+            else:
+                # Индикаторы считаются в пуле, стратегия - в цикле событий
+                entries, results = await self._compute_indicators_with_executor(series, deadline)
+                
+            if self.analysis_config['batch_strategy']:
+                results.extend(await self._evaluate_batch(entries))
+            else:
+                for pair, timeframe, data, indicators, timestamps in entries:
+                    try:
+                        results.append(await self._evaluate_series(pair, timeframe, data, indicators, timestamps))
+                    except Exception as e:
+                        logger.error(f"Ошибка анализа {pair} {timeframe}: {e}")
+                
+            # Серии, дошедшие до стадии стратегии (без индикаторов стратегия не оценивается)
+            self.last_analyzed = [(pair, timeframe) for pair, timeframe, _, indicators, _ in entries if indicators]
+            
+            self.executor_stats['cycles'] += 1
+            self.executor_stats['last_cycle_seconds'] = time.perf_counter() - cycle_start
+            self.executor_stats['deferred'] += len(self.last_deferred)
+            
+            if deadline is not None and time.monotonic() > deadline:
+                self.executor_stats['overruns'] += 1
+                logger.warning(f"⏱️ Анализ превысил дедлайн цикла: {self.executor_stats['last_cycle_seconds']:.2f}с")
+                
+            if self.last_deferred:
+                logger.info(f"⏳ Отложено до следующего цикла: {len(self.last_deferred)} серий")
             
             # Собираем результаты
             for result in results:
@@ -71,38 +148,340 @@ class SignalAnalyzer:
             logger.error(f"Ошибка анализа всех пар: {e}")
             return []
             
-    async def _analyze_pair_timeframe(self, pair: str, timeframe: str, data: pd.DataFrame) -> Dict[str, Any]:
-        """Анализ конкретной пары на конкретном таймфрейме"""
-        try:
-            if len(data) < 200:  # Недостаточно данных
-                return {}
-                
-            # Расчет всех индикаторов
+    def _collect_series(self, market_data: Dict[str, Dict[str, pd.DataFrame]],
+                        order: Optional[List[Tuple[str, str]]] = None) -> List[Tuple[str, str, pd.DataFrame]]:
+        """Серии с достаточной историей в порядке анализа"""
+        if order is None:
+            order = [(pair, timeframe) for pair in TRADING_PAIRS for timeframe in TIMEFRAMES]
+            
+        series = []
+        
+        for pair, timeframe in order:
+            if pair in market_data and timeframe in market_data[pair]:
+                data = market_data[pair][timeframe]
+                if len(data) >= MIN_SERIES_LENGTH:  # Иначе недостаточно данных
+                    series.append((pair, timeframe, data))
+                    
+        return series
+        
+    async def _evaluate_series(self, pair: str, timeframe: str, data: pd.DataFrame, indicators: Dict[str, Any], timestamps: Dict[str, float]) -> Dict[str, Any]:
+        """Стадия стратегии для серии с рассчитанными индикаторами"""
+        if not indicators:
+            return {}
+            
+        # Применение стратегии "Quantum Precision V2"
+        signal_data = await self._apply_quantum_precision_v2(pair, timeframe, data, indicators)
+        stamp(timestamps, STAGE_STRATEGY_DONE)
+        
+        if self.latency_tracker:
+            self.latency_tracker.record(timestamps, timeframe, CANDLE_STAGES)
+            
+        if signal_data:
+            signal_data['latency'] = timestamps
+        
+        return signal_data
+        
+    def _calculate_indicators(self, pair: str, timeframe: str, data: pd.DataFrame) -> Dict[str, Any]:
+        """Расчет индикаторов серии с использованием кэша"""
+        if self.indicator_cache is None:
+            return self.indicators.calculate_all_indicators(data)
+            
+        version = series_version(data)
+        indicators = self.indicator_cache.get(pair, timeframe, version)
+        
+        if indicators is None:
             indicators = self.indicators.calculate_all_indicators(data)
+            self.indicator_cache.put(pair, timeframe, version, indicators)
             
-            if not indicators:
-                return {}
+        return indicators
+        
+    def _get_executor(self):
+        """Пул исполнителей согласно ANALYSIS_CONFIG['executor_mode']"""
+        if self.executor is None:
+            mode = self.analysis_config['executor_mode']
+            max_workers = self.analysis_config['max_workers'] or multiprocessing.cpu_count()
+            
+            if mode == 'process':
+                shared_name = segment_name() if SHARED_MEMORY_CONFIG['enabled'] else None
+                self.executor = ProcessPoolExecutor(
+                    max_workers=max_workers,
+                    mp_context=multiprocessing.get_context(self.analysis_config['process_start_method']),
+                    initializer=init_worker,
+                    initargs=(shared_name,)
+                )
+            elif mode == 'thread':
+                self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='analysis')
+            else:
+                raise ValueError(f"Неизвестный режим исполнителя: {mode}")
                 
-            # Применение стратегии "Quantum Precision V2"
-            signal_data = await self._apply_quantum_precision_v2(pair, timeframe, data, indicators)
+            logger.info(f"⚙️ Пул анализа: {mode}, воркеров: {max_workers}")
+            
+        return self.executor
+        
+    def _add_entry(self, entries: List[Tuple], pair: str, timeframe: str, data: pd.DataFrame,
+                   indicators: Dict[str, Any], timestamps: Dict[str, float]):
+        """Результат стадии индикаторов: запись для стратегии и строка матрицы признаков"""
+        entries.append((pair, timeframe, data, indicators, timestamps))
+        
+        if indicators:
+            self.feature_matrix.add(pair, timeframe, data, indicators)
+            
+    def _compute_indicators_sequential(self, series: List[Tuple[str, str, pd.DataFrame]], deadline: Optional[float] = None) -> List[Tuple]:
+        """Расчет индикаторов серий в текущем потоке
+        
+        Возвращает записи (pair, timeframe, data, indicators, timestamps) для стадии стратегии.
+        """
+        entries = []
+        
+        for position, (pair, timeframe, data) in enumerate(series):
+            if deadline is not None and time.monotonic() >= deadline:
+                self.last_deferred.extend((p, tf) for p, tf, _ in series[position:])
+                break
+                
+            try:
+                timestamps = dict(data.attrs.get('latency', {}))
+                indicators = self._calculate_indicators(pair, timeframe, data)
+                stamp(timestamps, STAGE_INDICATORS_DONE)
+                
+                self._add_entry(entries, pair, timeframe, data, indicators, timestamps)
+                
+            except Exception as e:
+                logger.error(f"Ошибка анализа {pair} {timeframe}: {e}")
+                
+        return entries
+        
+    async def _compute_indicators_with_executor(self, series: List[Tuple[str, str, pd.DataFrame]], deadline: Optional[float] = None) -> Tuple[List[Tuple], List[Any]]:
+        """Расчет индикаторов пакетами в пуле исполнителей
+        
+        Возвращает записи (pair, timeframe, tail, indicators, timestamps) и ошибки пакетов.
+        """
+        executor = self._get_executor()
+        
+        # В режиме процессов с разделяемой памятью серии читаются воркерами напрямую
+        use_shared_memory = self.analysis_config['executor_mode'] == 'process' and SHARED_MEMORY_CONFIG['enabled']
+        
+        jobs = []
+        timestamps = {}
+        versions = {}
+        entries = []
+        
+        for pair, timeframe, data in series:
+            series_timestamps = dict(data.attrs.get('latency', {}))
             
-            return signal_data
+            if self.indicator_cache is not None:
+                version = series_version(data)
+                indicators = self.indicator_cache.get(pair, timeframe, version)
+                
+                if indicators is not None:
+                    stamp(series_timestamps, STAGE_INDICATORS_DONE)
+                    tail = data.iloc[-STRATEGY_TAIL_ROWS:].reset_index(drop=True)
+                    self._add_entry(entries, pair, timeframe, tail, indicators, series_timestamps)
+                    continue
+                    
+                versions[(pair, timeframe)] = version
+                
+            timestamps[(pair, timeframe)] = series_timestamps
+            # Снимок серии: поток данных продолжает обновлять исходный DataFrame
+            jobs.append((pair, timeframe, None if use_shared_memory else data.copy()))
+            
+        # Пакеты отправляются в порядке приоритета серий
+        chunk_size = max(1, self.analysis_config['chunk_size'])
+        chunks = [jobs[i:i + chunk_size] for i in range(0, len(jobs), chunk_size)]
+        
+        loop = asyncio.get_running_loop()
+        tasks = [
+            asyncio.ensure_future(asyncio.wait_for(
+                loop.run_in_executor(executor, compute_indicators_chunk, chunk),
+                timeout=self.analysis_config['task_timeout']
+            ))
+            for chunk in chunks
+        ]
+        
+        if tasks:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            _, pending = await asyncio.wait(tasks, timeout=remaining)
+            
+            # Незавершенные к дедлайну пакеты отменяются (не начатые задания пула не выполняются)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        
+        self.executor_stats['chunks'] += len(chunks)
+        
+        errors = []
+        
+        for chunk, task in zip(chunks, tasks):
+            if task.cancelled():
+                self.last_deferred.extend((p, tf) for p, tf, _ in chunk)
+                continue
+                
+            chunk_result = task.exception() or task.result()
+            
+            if isinstance(chunk_result, asyncio.TimeoutError):
+                self.executor_stats['timeouts'] += 1
+                # Серии пакета не проанализированы - они будут посчитаны в следующем цикле
+                self.last_deferred.extend((p, tf) for p, tf, _ in chunk)
+                logger.warning(f"⏱️ Превышено время расчета пакета: {[(p, tf) for p, tf, _ in chunk]}")
+                continue
+                
+            if isinstance(chunk_result, Exception):
+                self.executor_stats['errors'] += 1
+                self.last_deferred.extend((p, tf) for p, tf, _ in chunk)
+                if isinstance(chunk_result, BrokenProcessPool):
+                    # Пул будет пересоздан в следующем цикле
+                    self.executor = None
+                errors.append(chunk_result)
+                continue
+                
+            for pair, timeframe, indicators, tail in chunk_result:
+                if indicators is None:
+                    # Писатель не отпустил серию - она будет посчитана в следующем цикле
+                    self.executor_stats['shared_read_failures'] += 1
+                    self.last_deferred.append((pair, timeframe))
+                    continue
+                    
+                if (pair, timeframe) in versions:
+                    self.indicator_cache.put(pair, timeframe, versions[(pair, timeframe)], indicators)
+                    
+                series_timestamps = timestamps[(pair, timeframe)]
+                stamp(series_timestamps, STAGE_INDICATORS_DONE)
+                
+                # Стадия стратегии использует хвост той же серии, на которой считались индикаторы
+                self._add_entry(entries, pair, timeframe, tail, indicators, series_timestamps)
+                
+        return entries, errors
+        
+    async def _evaluate_batch(self, entries: List[Tuple]) -> List[Dict[str, Any]]:
+        """Стадия стратегии для всех серий цикла операциями над массивами"""
+        entries = [entry for entry in entries if entry[3]]
+        if not entries:
+            return []
+            
+        try:
+            count = len(entries)
+            evaluator = self.batch_evaluator
+            
+            # Уровни 1 и 2 считаются одной операцией, время делится между ними поровну
+            level_start = time.perf_counter()
+            matrix = evaluator.build_matrix([entry[3] for entry in entries])
+            prices = evaluator.build_price_features([entry[2] for entry in entries])
+            levels = evaluator.evaluate_cheap_levels(matrix, prices)
+            cheap_seconds = (time.perf_counter() - level_start) / 2
+            self._record_batch_time('level1', cheap_seconds, count)
+            self._record_batch_time('level2', cheap_seconds, count)
+            
+            # ИИ-предсказание только для серий, где уровень 3 может изменить решение
+            ai_scores = np.zeros(count)
+            model_version = self.ai_predictor.model_version
+            shadow_scores = {}
+            need_rows = np.flatnonzero(levels['need_level3'])
+            
+            if len(need_rows):
+                # Все серии цикла оцениваются одним вызовом по строкам матрицы признаков
+                level_start = time.perf_counter()
+                keys = [entries[row][:2] for row in need_rows]
+                features = self.feature_matrix.take(keys)
+                ai_scores[need_rows] = self.ai_predictor.predict_batch(features, keys, model_version)
+                self._record_batch_time('level3', time.perf_counter() - level_start, len(need_rows))
+                
+                # Теневые модели оценивают те же строки; на решение не влияют
+                for name, scores in self.shadow_models.score(features, keys, ai_scores[need_rows]).items():
+                    shadow_scores[name] = np.full(count, np.nan)
+                    shadow_scores[name][need_rows] = scores
+                
+            for _ in range(count - len(need_rows)):
+                self._record_level_skip('level3')
+                
+            level_start = time.perf_counter()
+            patterns = evaluator.evaluate_patterns(matrix, prices)
+            decision = evaluator.finalize(levels, ai_scores, patterns)
+            
+            # Паттерны учитываются там, где скалярный путь вызвал бы их детекцию
+            pattern_rows = int(np.count_nonzero(levels['require_level3_valid'] & decision['level3_candidate']))
+            if pattern_rows:
+                self._record_batch_time('patterns', time.perf_counter() - level_start, pattern_rows)
+            for _ in range(count - pattern_rows):
+                self._record_level_skip('patterns')
+                
+            signals = []
+            
+            for row, (pair, timeframe, data, indicators, timestamps) in enumerate(entries):
+                stamp(timestamps, STAGE_STRATEGY_DONE)
+                
+                if self.latency_tracker:
+                    self.latency_tracker.record(timestamps, timeframe, CANDLE_STAGES)
+                    
+                if not decision['passed'][row]:
+                    continue
+                    
+                signal = self._build_signal(
+                    pair, timeframe, data, indicators,
+                    decision['final_score'][row],
+                    "BUY" if decision['buy'][row] else "SELL",
+                    float(ai_scores[row]),
+                    model_version
+                )
+                signal['latency'] = timestamps
+                if shadow_scores:
+                    signal['shadow_scores'] = {name: float(scores[row]) for name, scores in shadow_scores.items()}
+                signals.append(signal)
+                
+            return signals
             
         except Exception as e:
-            logger.error(f"Ошибка анализа {pair} {timeframe}: {e}")
-            return {}
+            logger.error(f"Ошибка пакетной оценки стратегии: {e}")
+            # Скалярный путь по сериям
+            return [
+                await self._evaluate_series(pair, timeframe, data, indicators, timestamps)
+                for pair, timeframe, data, indicators, timestamps in entries
+            ]
+        
+    def get_analysis_stats(self) -> Dict[str, Any]:
+        """Статистика циклов анализа"""
+        return {
+            'executor_mode': self.analysis_config['executor_mode'],
+            'executor': dict(self.executor_stats),
+            'indicator_cache': self.indicator_cache.get_statistics() if self.indicator_cache else None,
+            'shadow_models': self.shadow_models.get_statistics(),
+            'levels': {level: dict(stats) for level, stats in self.level_stats.items()}
+        }
+        
+    def shutdown(self):
+        """Остановка пула исполнителей"""
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
             
     async def _apply_quantum_precision_v2(self, pair: str, timeframe: str, data: pd.DataFrame, indicators: Dict[str, Any]) -> Dict[str, Any]:
         """Применение стратегии Quantum Precision V2"""
         try:
             # Для демонстрации - снижаем требования
-            # Трехуровневая верификация сигналов
-            level1_result = await self._level1_momentum_impulse(data, indicators)
+            # Трехуровневая верификация сигналов в порядке стоимости:
+            # конвергенция (значения индикаторов), импульс (изменение цены), ИИ и паттерны
+            level_start = time.perf_counter()
             level2_result = await self._level2_indicator_convergence(data, indicators)
-            level3_result = await self._level3_ai_prediction(pair, timeframe, data, indicators)
+            self._record_level_time('level2', level_start)
+            
+            level_start = time.perf_counter()
+            level1_result = await self._level1_momentum_impulse(data, indicators)
+            self._record_level_time('level1', level_start)
+            
+            cheap_valid = int(level1_result['valid']) + int(level2_result['valid'])
+            
+            # Для демонстрации - если хотя бы 2 уровня подтверждают сигнал.
+            # Без обоих дешевых уровней правило 2 из 3 уже невыполнимо, а если даже
+            # максимальный скор уровня 3 не дает проходного финального скора - сигнала не будет
+            if cheap_valid == 0 or self._max_final_score(level1_result, level2_result) < self.config['min_final_score']:
+                self._record_level_skip('level3')
+                self._record_level_skip('patterns')
+                return {}
+                
+            # Если оба дешевых уровня валидны, от уровня 3 нужен только скор
+            level3_result = await self._level3_ai_prediction(
+                pair, timeframe, data, indicators, require_valid=cheap_valid < 2
+            )
             
-            # Для демонстрации - если хотя бы 2 уровня подтверждают сигнал
-            valid_levels = sum([level1_result['valid'], level2_result['valid'], level3_result['valid']])
+            valid_levels = cheap_valid + int(level3_result['valid'])
             
             if valid_levels < 2:
                 return {}
@@ -111,42 +490,54 @@ class SignalAnalyzer:
             final_score = self._calculate_final_score(level1_result, level2_result, level3_result)
             
             # Для демонстрации - снижаем порог до 70%
-            if final_score < 0.70:
+            if final_score < self.config['min_final_score']:
                 return {}
                 
             # Определение направления
             direction = self._determine_direction(level1_result, level2_result, level3_result)
             
-            # Расчет времени удержания
-            hold_duration = self._calculate_hold_duration(timeframe, final_score)
-            
-            # Создание сигнала
-            signal = {
-                'signal': True,
-                'pair': pair,
-                'timeframe': timeframe,
-                'direction': direction,
-                'accuracy': round(final_score * 100, 2),
-                'entry_time': datetime.now().strftime('%H:%M:%S'),
-                'hold_duration': hold_duration,
-                'vwap_gradient': indicators.get('vwap_gradient', 0),
-                'volume_tsunami': indicators.get('volume_tsunami', 0),
-                'neural_macd': indicators.get('neural_macd', 0),
-                'quantum_rsi': indicators.get('quantum_rsi', 0),
-                'ai_score': round(level3_result['score'] * 100, 2),
-                'current_price': data['close'].iloc[-1],
-                'timestamp': datetime.now().isoformat(),
-                'indicators': indicators
-            }
-            
-            logger.info(f"✅ Сигнал сгенерирован: {pair} {timeframe} - {final_score:.2%}")
-            
+            signal = self._build_signal(pair, timeframe, data, indicators, final_score, direction, level3_result['score'])
+            if level3_result.get('shadow_scores'):
+                signal['shadow_scores'] = level3_result['shadow_scores']
             return signal
             
         except Exception as e:
             logger.error(f"Ошибка применения стратегии: {e}")
             return {}
             
+    def _build_signal(self, pair: str, timeframe: str, data: pd.DataFrame, indicators: Dict[str, Any],
+                      final_score: float, direction: str, ai_score: float, model_version: Optional[int] = None) -> Dict[str, Any]:
+        """Создание сигнала по результатам верификации
+        
+        Сигнал несет признаки ИИ и версию модели, по которым он был оценен.
+        """
+        # Расчет времени удержания
+        hold_duration = self._calculate_hold_duration(timeframe, final_score)
+        
+        signal = {
+            'signal': True,
+            'pair': pair,
+            'timeframe': timeframe,
+            'direction': direction,
+            'accuracy': round(final_score * 100, 2),
+            'entry_time': datetime.now().strftime('%H:%M:%S'),
+            'hold_duration': hold_duration,
+            'vwap_gradient': indicators.get('vwap_gradient', 0),
+            'volume_tsunami': indicators.get('volume_tsunami', 0),
+            'neural_macd': indicators.get('neural_macd', 0),
+            'quantum_rsi': indicators.get('quantum_rsi', 0),
+            'ai_score': round(ai_score * 100, 2),
+            'current_price': data['close'].iloc[-1],
+            'timestamp': datetime.now().isoformat(),
+            'indicators': indicators,
+            'features': self._get_ai_features(pair, timeframe, data, indicators).tolist(),
+            'model_version': self.ai_predictor.model_version if model_version is None else model_version
+        }
+        
+        logger.info(f"✅ Сигнал сгенерирован: {pair} {timeframe} - {final_score:.2%}")
+        
+        return signal
+        
     async def _level1_momentum_impulse(self, data: pd.DataFrame, indicators: Dict[str, Any]) -> Dict[str, Any]:
         """Уровень 1: Моментальный импульс"""
         try:
@@ -235,23 +626,45 @@ class SignalAnalyzer:
             logger.error(f"Ошибка Level 2: {e}")
             return {'valid': False, 'score': 0.0}
             
-    async def _level3_ai_prediction(self, pair: str, timeframe: str, data: pd.DataFrame, indicators: Dict[str, Any]) -> Dict[str, Any]:
-        """Уровень 3: ИИ-предсказание"""
+    async def _level3_ai_prediction(self, pair: str, timeframe: str, data: pd.DataFrame, indicators: Dict[str, Any], require_valid: bool = True) -> Dict[str, Any]:
+        """Уровень 3: ИИ-предсказание
+        
+        require_valid=False - валидность уровня не влияет на решение, детекция паттернов пропускается.
+        """
         try:
+            level_start = time.perf_counter()
+            
             # Подготовка данных для ИИ
-            features = self._prepare_ai_features(data, indicators)
+            features = self._get_ai_features(pair, timeframe, data, indicators)
             
             # Получение предсказания от ИИ
             ai_prediction = await self.ai_predictor.predict(features, pair, timeframe)
+            self._record_level_time('level3', level_start)
+            
+            # Теневые модели оценивают ту же серию, как и в пакетном пути; на решение не влияют
+            shadow_scores = {
+                name: float(scores[0])
+                for name, scores in self.shadow_models.score(
+                    np.asarray(features).reshape(1, -1), [(pair, timeframe)], np.array([ai_prediction])
+                ).items()
+            }
             
             # Условие: AI предсказание >= 0.87
             ai_condition = ai_prediction >= self.config['signal_threshold']
             
             # Дополнительные проверки
             confidence_condition = ai_prediction >= 0.80
-            pattern_condition = await self._detect_patterns(data, indicators)
             
-            valid = ai_condition and confidence_condition and pattern_condition
+            if require_valid and ai_condition and confidence_condition:
+                level_start = time.perf_counter()
+                pattern_condition = await self._detect_patterns(data, indicators)
+                self._record_level_time('patterns', level_start)
+            else:
+                # Результат паттернов не может изменить решение
+                self._record_level_skip('patterns')
+                pattern_condition = None
+            
+            valid = bool(ai_condition and confidence_condition and pattern_condition)
             
             return {
                 'valid': valid,
@@ -259,7 +672,8 @@ class SignalAnalyzer:
                 'ai_prediction': ai_prediction,
                 'confidence': ai_prediction,
                 'pattern_detected': pattern_condition,
-                'ai_condition': ai_condition
+                'ai_condition': ai_condition,
+                'shadow_scores': shadow_scores
             }
             
         except Exception as e:
@@ -267,37 +681,17 @@ class SignalAnalyzer:
             # Fallback на упрощенную логику
             return await self._fallback_prediction(data, indicators)
             
+    def _get_ai_features(self, pair: str, timeframe: str, data: pd.DataFrame, indicators: Dict[str, Any]) -> np.ndarray:
+        """Признаки серии из матрицы цикла (или расчет, если серии в матрице нет)"""
+        features = self.feature_matrix.get(pair, timeframe)
+        if features is None:
+            features = self._prepare_ai_features(data, indicators)
+        return features
+        
     def _prepare_ai_features(self, data: pd.DataFrame, indicators: Dict[str, Any]) -> np.ndarray:
-        """Подготовка признаков для ИИ"""
-        try:
-            features = []
-            
-            # Ценовые данные
-            features.extend([
-                data['close'].iloc[-1],
-                data['high'].iloc[-1],
-                data['low'].iloc[-1],
-                data['volume'].iloc[-1],
-                data['close'].pct_change().iloc[-1]
-            ])
-            
-            # Индикаторы
-            key_indicators = [
-                'rsi', 'macd', 'macd_histogram', 'bb_position',
-                'volume_ratio', 'vwap_gradient', 'quantum_rsi',
-                'neural_macd', 'volume_tsunami', 'stoch_k',
-                'williams_r', 'cci', 'adx', 'atr'
-            ]
-            
-            for indicator in key_indicators:
-                features.append(indicators.get(indicator, 0))
-                
-            return np.array(features, dtype=float)
-            
-        except Exception as e:
-            logger.error(f"Ошибка подготовки признаков: {e}")
-            return np.zeros(20)
-            
+        """Подготовка признаков для ИИ по схеме ai_features.FEATURE_SCHEMA"""
+        return write_features(np.empty(FEATURE_COUNT, dtype=FEATURE_DTYPE), data, indicators)
+        
     async def _detect_patterns(self, data: pd.DataFrame, indicators: Dict[str, Any]) -> bool:
         """Детекция графических паттернов"""
         try:
@@ -417,6 +811,38 @@ class SignalAnalyzer:
             logger.error(f"Ошибка расчета финального скора: {e}")
             return 0.0
             
+    def _max_final_score(self, level1: Dict[str, Any], level2: Dict[str, Any]) -> float:
+        """Верхняя граница финального скора при максимальном скоре уровня 3"""
+        return self._calculate_final_score(level1, level2, {'score': 1.0})
+        
+    def _record_level_time(self, level: str, started: float):
+        """Учет времени вычисления уровня (скользящее среднее)"""
+        stats = self.level_stats[level]
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        
+        stats['evaluated'] += 1
+        if stats['evaluated'] == 1:
+            stats['avg_ms'] = elapsed_ms
+        else:
+            stats['avg_ms'] += (elapsed_ms - stats['avg_ms']) * LEVEL_TIME_SMOOTHING
+            
+    def _record_batch_time(self, level: str, elapsed: float, count: int):
+        """Учет времени уровня, вычисленного сразу для count серий"""
+        stats = self.level_stats[level]
+        elapsed_ms = elapsed * 1000 / count
+        
+        if stats['evaluated'] == 0:
+            stats['avg_ms'] = elapsed_ms
+        else:
+            stats['avg_ms'] += (elapsed_ms - stats['avg_ms']) * LEVEL_TIME_SMOOTHING
+        stats['evaluated'] += count
+        
+    def _record_level_skip(self, level: str):
+        """Учет пропуска уровня и оценка сэкономленного времени"""
+        stats = self.level_stats[level]
+        stats['skipped'] += 1
+        stats['saved_ms'] += stats['avg_ms']
+        
     def _determine_direction(self, level1: Dict[str, Any], level2: Dict[str, Any], level3: Dict[str, Any]) -> str:
         """Определение направления сигнала"""
         try:
@@ -0,0 +1,218 @@
+"""
+Векторизованная оценка стратегии "Quantum Precision V2"
+Все уровни верификации для всех серий цикла считаются операциями над массивами
+"""
+
+import logging
+from typing import Dict, List, Any
+
+import numpy as np
+import pandas as pd
+
+from globals import STRATEGY_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Индикаторы, используемые стратегией, и значения по умолчанию при их отсутствии
+# (совпадают с indicators.get(..., default) в скалярных уровнях)
+STRATEGY_COLUMNS = [
+    ('volume_tsunami', 0.0),
+    ('roc', 0.0),
+    ('atr', 0.0),
+    ('tsunami_strength', 0.0),
+    ('macd_histogram', 0.0),
+    ('vwap_gradient', 0.0),
+    ('quantum_rsi', 50.0),
+    ('bb_position', 0.5),
+    ('stoch_crossover', 0.0),
+    ('volume_ratio', 1.0),
+    ('rsi_divergence', 0.0),
+    ('bb_squeeze', 0.0),
+    ('volume_tsunami_signal', 0.0)
+]
+
+COLUMN_INDEX = {name: i for i, (name, _) in enumerate(STRATEGY_COLUMNS)}
+
+# Окно уровней поддержки/сопротивления для детекции пробоя
+BREAKOUT_WINDOW = 20
+
+
+def py_min(values: np.ndarray, limit: float) -> np.ndarray:
+    """Поэлементный аналог min(value, limit) с семантикой Python для NaN"""
+    return np.where(limit < values, limit, values)
+
+
+class BatchStrategyEvaluator:
+    """Оценка уровней стратегии по матрице (серии x индикаторы)"""
+
+    def __init__(self, config: Dict[str, Any] = None):
+        self.config = config or STRATEGY_CONFIG
+
+    def build_matrix(self, indicators_list: List[Dict[str, Any]]) -> np.ndarray:
+        """Матрица индикаторов стратегии float64[N, len(STRATEGY_COLUMNS)]"""
+        matrix = np.empty((len(indicators_list), len(STRATEGY_COLUMNS)), dtype=np.float64)
+
+        for row, indicators in enumerate(indicators_list):
+            matrix[row] = [indicators.get(name, default) for name, default in STRATEGY_COLUMNS]
+
+        return matrix
+
+    def build_price_features(self, frames: List[pd.DataFrame]) -> Dict[str, np.ndarray]:
+        """Ценовые величины последней свечи, нужные уровням 1 и 3"""
+        n = len(frames)
+        close = np.empty(n)
+        prev_close = np.empty(n)
+        resistance = np.empty(n)
+        support = np.empty(n)
+
+        for row, data in enumerate(frames):
+            closes = data['close'].to_numpy(dtype=np.float64)
+            close[row] = closes[-1]
+            prev_close[row] = closes[-2] if len(closes) > 1 else np.nan
+
+            # rolling(20).max()/min() последней свечи: NaN, если в окне есть пропуски
+            if len(closes) >= BREAKOUT_WINDOW:
+                resistance[row] = data['high'].to_numpy(dtype=np.float64)[-BREAKOUT_WINDOW:].max()
+                support[row] = data['low'].to_numpy(dtype=np.float64)[-BREAKOUT_WINDOW:].min()
+            else:
+                resistance[row] = np.nan
+                support[row] = np.nan
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            price_change = np.abs(close / prev_close - 1)
+
+        return {
+            'close': close,
+            'price_change': price_change,
+            'resistance': resistance,
+            'support': support
+        }
+
+    def evaluate_cheap_levels(self, matrix: np.ndarray, prices: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """Уровни 1 и 2 и решение о необходимости уровня 3"""
+        col = lambda name: matrix[:, COLUMN_INDEX[name]]
+
+        with np.errstate(invalid='ignore'):
+            # Уровень 1: Моментальный импульс
+            volume_tsunami = col('volume_tsunami')
+            roc = col('roc')
+            price_change = prices['price_change']
+
+            volume_condition = volume_tsunami > 2.0
+            price_condition = price_change > 0.002
+            momentum_condition = roc > 0.1
+            volatility_condition = col('atr') > 0
+
+            level1_valid = (
+                volume_condition.astype(int) + price_condition.astype(int) +
+                momentum_condition.astype(int) + volatility_condition.astype(int)
+            ) >= 2
+
+            impulse_strength = (
+                py_min(volume_tsunami, 5.0) * 0.4 +
+                py_min(price_change * 100, 2.0) * 0.3 +
+                py_min(np.abs(roc), 2.0) * 0.2 +
+                py_min(col('tsunami_strength'), 3.0) * 0.1
+            )
+            level1_score = py_min(impulse_strength / 3.0, 1.0)
+
+            # Уровень 2: Конвергенция индикаторов
+            bb_position = col('bb_position')
+
+            macd_condition = col('macd_histogram') > 0
+            vwap_condition = col('vwap_gradient') > self.config['vwap_gradient_threshold']
+            rsi_condition = col('quantum_rsi') < self.config['rsi_upper_limit']
+            bollinger_condition = (bb_position > 0.2) & (bb_position < 0.8)
+            stoch_condition = col('stoch_crossover') == 1
+            volume_ratio_condition = col('volume_ratio') > 1.2
+
+            basic_valid = macd_condition & vwap_condition & rsi_condition
+            additional_valid = (
+                bollinger_condition.astype(int) + stoch_condition.astype(int) + volume_ratio_condition.astype(int)
+            ) >= 2
+            level2_valid = basic_valid & additional_valid
+
+            level2_score = (
+                macd_condition.astype(float) * 0.3 +
+                vwap_condition.astype(float) * 0.3 +
+                rsi_condition.astype(float) * 0.2 +
+                bollinger_condition.astype(float) * 0.1 +
+                stoch_condition.astype(float) * 0.05 +
+                volume_ratio_condition.astype(float) * 0.05
+            )
+
+            cheap_valid = level1_valid.astype(int) + level2_valid.astype(int)
+
+            # Уровень 3 нужен, если правило 2 из 3 еще выполнимо и проходной скор достижим
+            max_final_score = self.final_score(level1_score, level2_score, np.ones(len(matrix)))
+            need_level3 = (cheap_valid > 0) & ~(max_final_score < self.config['min_final_score'])
+
+        return {
+            'level1_valid': level1_valid,
+            'level1_score': level1_score,
+            'impulse_strength': impulse_strength,
+            'level2_valid': level2_valid,
+            'level2_score': level2_score,
+            'macd_condition': macd_condition,
+            'cheap_valid': cheap_valid,
+            'need_level3': need_level3,
+            # Валидность уровня 3 влияет на решение только при одном валидном дешевом уровне
+            'require_level3_valid': need_level3 & (cheap_valid < 2)
+        }
+
+    def evaluate_patterns(self, matrix: np.ndarray, prices: Dict[str, np.ndarray]) -> np.ndarray:
+        """Детекция паттернов (пробой, дивергенция, консолидация, объемный всплеск)"""
+        col = lambda name: matrix[:, COLUMN_INDEX[name]]
+
+        with np.errstate(invalid='ignore'):
+            bb_position = col('bb_position')
+            close = prices['close']
+
+            breakout = (
+                (bb_position > 0.9) | (bb_position < 0.1) |
+                (close > prices['resistance'] * 1.001) |
+                (close < prices['support'] * 0.999)
+            )
+
+            return (
+                breakout |
+                (col('rsi_divergence') > 0.5) |
+                (col('bb_squeeze') == 1) |
+                (col('volume_tsunami_signal') == 1)
+            )
+
+    def final_score(self, level1_score: np.ndarray, level2_score: np.ndarray, level3_score: np.ndarray) -> np.ndarray:
+        """Финальный скор с бонусом за сильную конвергенцию"""
+        with np.errstate(invalid='ignore'):
+            score = level1_score * 0.3 + level2_score * 0.3 + level3_score * 0.4
+
+            strong = (level1_score > 0.8) & (level2_score > 0.8) & (level3_score > 0.8)
+            score = np.where(strong, score + 0.05, score)
+
+            return py_min(score, 1.0)
+
+    def finalize(self, levels: Dict[str, np.ndarray], ai_scores: np.ndarray, patterns: np.ndarray) -> Dict[str, np.ndarray]:
+        """Решение по сериям: прохождение, финальный скор и направление"""
+        with np.errstate(invalid='ignore'):
+            ai_condition = ai_scores >= self.config['signal_threshold']
+            confidence_condition = ai_scores >= 0.80
+            level3_candidate = ai_condition & confidence_condition
+            level3_valid = level3_candidate & patterns
+
+            valid_levels = levels['cheap_valid'] + level3_valid.astype(int)
+            final_score = self.final_score(levels['level1_score'], levels['level2_score'], ai_scores)
+
+            passed = levels['need_level3'] & (valid_levels >= 2) & ~(final_score < self.config['min_final_score'])
+
+            bullish = (
+                (levels['impulse_strength'] > 0).astype(int) +
+                levels['macd_condition'].astype(int) +
+                (ai_scores > 0.5).astype(int)
+            )
+
+        return {
+            'passed': passed,
+            'final_score': final_score,
+            'buy': bullish > (3 - bullish),
+            'level3_candidate': level3_candidate
+        }
@@ -0,0 +1,41 @@
+"""
+Общие данные тестов: модули бота импортируются из корня репозитория
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Служебные поля сигнала, зависящие от времени выполнения
+VOLATILE_SIGNAL_FIELDS = ('entry_time', 'timestamp', 'latency')
+
+
+def make_candles(rng: np.random.Generator, length: int, start_price: float = 100.0) -> pd.DataFrame:
+    """Случайное блуждание цены в колонках BinanceWebSocket"""
+    close = start_price * np.cumprod(1 + rng.normal(0, 0.004, length))
+    spread = np.abs(rng.normal(0, 0.002, length))
+    return pd.DataFrame({
+        'timestamp': pd.date_range('2024-01-01', periods=length, freq='min'),
+        'open': np.concatenate(([start_price], close[:-1])),
+        'high': close * (1 + spread),
+        'low': close * (1 - spread),
+        'close': close,
+        'volume': rng.uniform(1, 10, length)
+    })
+
+
+def strip_signal(signal: dict) -> str:
+    """Представление сигнала без полей времени для точного сравнения"""
+    return repr({key: value for key, value in signal.items() if key not in VOLATILE_SIGNAL_FIELDS})
+
+
+@pytest.fixture
+def fixed_time_correction(monkeypatch):
+    """Коррекция по часу суток не должна меняться между сравниваемыми прогонами"""
+    from ai_model import AIPredictor
+    monkeypatch.setattr(AIPredictor, '_get_time_correction', lambda self: 0.6)
@@ -0,0 +1,64 @@
+"""
+Пакетное предсказание должно совпадать с predict для каждой строки
+"""
+
+import asyncio
+
+import numpy as np
+import pytest
+
+from ai_features import FEATURE_COUNT, FEATURE_INDEX
+from ai_model import AIPredictor
+
+KEYS = [('BTCUSDT', '1m'), ('ETHUSDT', '5m'), ('XRPUSDT', '1h')]
+
+
+def random_features(rng: np.random.Generator, rows: int) -> np.ndarray:
+    """Признаки разного масштаба с пропусками, неположительной ценой и пустыми строками"""
+    scales = rng.choice([0.01, 1.0, 100.0, 1000.0], FEATURE_COUNT)
+    features = rng.normal(0, 1, (rows, FEATURE_COUNT)) * scales
+
+    close = FEATURE_INDEX['close']
+    features[:, close] = np.abs(features[:, close]) * 100
+    features[rng.random(rows) < 0.05, close] *= -1
+    features[:, FEATURE_INDEX['bb_position']] = rng.uniform(-0.5, 1.5, rows)
+    features[:, FEATURE_INDEX['rsi']] = rng.uniform(0, 100, rows)
+
+    features[rng.random((rows, FEATURE_COUNT)) < 0.03] = np.nan
+    features[::97] = np.nan
+    return features
+
+
+async def make_predictor(cache_enabled: bool) -> AIPredictor:
+    """Предсказатель с одинаковой историей; история есть не у всех ключей"""
+    rng = np.random.default_rng(7)
+    predictor = AIPredictor()
+    if not cache_enabled:
+        predictor.prediction_cache = None
+
+    for pair, timeframe in KEYS[:2]:
+        for _ in range(8):
+            await predictor.update_model_performance(pair, timeframe, float(rng.random()), float(rng.random()))
+    return predictor
+
+
+@pytest.mark.parametrize('cache_enabled', [True, False])
+def test_predict_batch_matches_predict(cache_enabled, fixed_time_correction, caplog):
+    features = random_features(np.random.default_rng(3), 500)
+    keys = [KEYS[row % len(KEYS)] for row in range(len(features))]
+
+    async def run():
+        # Отдельные экземпляры: кэш предсказаний не должен отдавать одному пути результат другого
+        scalar_predictor = await make_predictor(cache_enabled)
+        batch_predictor = await make_predictor(cache_enabled)
+
+        scalar = np.array([await scalar_predictor.predict(features[row], *keys[row]) for row in range(len(features))])
+        return scalar, batch_predictor.predict_batch(features, keys)
+
+    scalar, batch = asyncio.run(run())
+
+    # Оба пути при ошибке возвращают 0.5 - совпадение таких значений ничего не доказывает
+    assert 'Ошибка' not in caplog.text
+    # Результаты должны совпадать побитово, а не с допуском
+    assert scalar.tobytes() == batch.tobytes()
+    assert np.abs(scalar - batch).max() == 0.0
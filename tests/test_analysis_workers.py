@@ -0,0 +1,167 @@
+"""
+Расчет индикаторов в пуле должен давать те же записи и сигналы, что и последовательный
+"""
+
+import asyncio
+import math
+
+import numpy as np
+import pytest
+
+import signal_analyzer
+from conftest import make_candles, strip_signal
+from signal_analyzer import SignalAnalyzer
+
+PAIRS = ['BTCUSDT', 'ETHUSDT', 'SOLUSDT']
+TIMEFRAMES = ['1m', '5m', '1h']
+
+
+def make_market_data(seed: int) -> dict:
+    rng = np.random.default_rng(seed)
+    return {
+        pair: {timeframe: make_candles(rng, int(rng.integers(200, 400))) for timeframe in TIMEFRAMES}
+        for pair in PAIRS
+    }
+
+
+def same_value(left, right) -> bool:
+    if isinstance(left, float) and isinstance(right, float) and math.isnan(left) and math.isnan(right):
+        return True
+    return repr(left) == repr(right)
+
+
+def make_analyzer(mode: str) -> SignalAnalyzer:
+    analyzer = SignalAnalyzer(None, None)
+    analyzer.analysis_config = {**analyzer.analysis_config, 'executor_mode': mode, 'max_workers': 2}
+    # Кэш индикаторов не должен подменять расчет в пуле
+    analyzer.indicator_cache = None
+    return analyzer
+
+
+async def collect(analyzer: SignalAnalyzer, market_data: dict):
+    """Записи стадии индикаторов и результаты стратегии по каждой серии"""
+    series = analyzer._collect_series(market_data)
+
+    if analyzer.analysis_config['executor_mode'] == 'sequential':
+        entries = analyzer._compute_indicators_sequential(series)
+    else:
+        entries, errors = await analyzer._compute_indicators_with_executor(series)
+        assert not errors
+
+    results = {}
+    for pair, timeframe, data, indicators, timestamps in entries:
+        # Уровни стратегии сравниваются отдельно: на случайных данных сигналы редки
+        levels = (
+            await analyzer._level1_momentum_impulse(data, indicators),
+            await analyzer._level2_indicator_convergence(data, indicators),
+            await analyzer._level3_ai_prediction(pair, timeframe, data, indicators),
+            await analyzer._detect_patterns(data, indicators)
+        )
+        signal = await analyzer._evaluate_series(pair, timeframe, data, indicators, dict(timestamps))
+        results[(pair, timeframe)] = (indicators, repr(levels), strip_signal(signal) if signal else None)
+    return results
+
+
+@pytest.fixture
+def analysis_pairs(monkeypatch):
+    monkeypatch.setattr(signal_analyzer, 'TRADING_PAIRS', PAIRS)
+    monkeypatch.setattr(signal_analyzer, 'TIMEFRAMES', TIMEFRAMES)
+
+
+@pytest.mark.parametrize('mode', ['thread', 'process'])
+def test_pool_matches_sequential(mode, analysis_pairs, fixed_time_correction):
+    sequential = make_analyzer('sequential')
+    pool = make_analyzer(mode)
+
+    async def run():
+        try:
+            for seed in range(3):
+                market_data = make_market_data(seed)
+                expected = await collect(sequential, market_data)
+                actual = await collect(pool, market_data)
+
+                assert actual.keys() == expected.keys()
+                for key, (indicators, levels, signal) in expected.items():
+                    pool_indicators, pool_levels, pool_signal = actual[key]
+                    assert pool_indicators.keys() == indicators.keys(), key
+                    assert all(same_value(pool_indicators[name], indicators[name]) for name in indicators), key
+                    # Стратегия в пуле видит только хвост серии - результат должен совпадать
+                    assert pool_levels == levels, key
+                    assert pool_signal == signal, key
+        finally:
+            pool.shutdown()
+
+    asyncio.run(run())
+
+
+def test_analyze_all_pairs_matches_sequential(analysis_pairs, fixed_time_correction):
+    sequential = make_analyzer('sequential')
+    pool = make_analyzer('thread')
+
+    async def run():
+        try:
+            for seed in range(3):
+                market_data = make_market_data(seed)
+                expected = await sequential.analyze_all_pairs(market_data)
+                actual = await pool.analyze_all_pairs(market_data)
+                assert [strip_signal(signal) for signal in actual] == [strip_signal(signal) for signal in expected]
+        finally:
+            pool.shutdown()
+
+    asyncio.run(run())
+
+
+def test_failed_chunks_are_deferred(analysis_pairs, monkeypatch):
+    analyzer = make_analyzer('thread')
+    analyzer.analysis_config['chunk_size'] = 1
+    compute = signal_analyzer.compute_indicators_chunk
+
+    def failing_chunk(jobs):
+        if jobs[0][0] == 'ETHUSDT':
+            raise RuntimeError('сбой воркера')
+        return compute(jobs)
+
+    monkeypatch.setattr(signal_analyzer, 'compute_indicators_chunk', failing_chunk)
+
+    async def run():
+        try:
+            series = analyzer._collect_series(make_market_data(0))
+            return await analyzer._compute_indicators_with_executor(series)
+        finally:
+            analyzer.shutdown()
+
+    entries, errors = asyncio.run(run())
+
+    failed = [('ETHUSDT', timeframe) for timeframe in TIMEFRAMES]
+    assert len(errors) == len(failed)
+    assert analyzer.last_deferred == failed
+    assert all(pair != 'ETHUSDT' for pair, *_ in entries)
+
+
+def test_process_pool_reads_shared_memory(analysis_pairs, fixed_time_correction, monkeypatch):
+    from globals import SHARED_MEMORY_CONFIG
+    from shared_market_data import SharedCandleStore
+
+    monkeypatch.setitem(SHARED_MEMORY_CONFIG, 'enabled', True)
+    store = SharedCandleStore.create(PAIRS, TIMEFRAMES)
+    sequential = make_analyzer('sequential')
+    pool = make_analyzer('process')
+
+    async def run():
+        try:
+            market_data = make_market_data(0)
+            store.write_all(market_data)
+
+            expected = await collect(sequential, market_data)
+            actual = await collect(pool, market_data)
+            assert pool.executor_stats['shared_read_failures'] == 0
+            assert actual.keys() == expected.keys()
+            for key, (indicators, levels, signal) in expected.items():
+                pool_indicators, pool_levels, pool_signal = actual[key]
+                assert all(same_value(pool_indicators[name], indicators[name]) for name in indicators), key
+                assert (pool_levels, pool_signal) == (levels, signal), key
+        finally:
+            pool.shutdown()
+            store.close()
+
+    asyncio.run(run())
@@ -0,0 +1,72 @@
+"""
+Кэш индикаторов возвращает тот же результат, что и новый расчет, и промахивается после изменения серии
+"""
+
+import math
+
+import numpy as np
+
+from conftest import make_candles
+from indicator_cache import IndicatorCache
+from indicators import TechnicalIndicators
+from signal_analyzer import SignalAnalyzer
+
+
+def same_indicators(left: dict, right: dict) -> bool:
+    if left.keys() != right.keys():
+        return False
+    for key in left:
+        a, b = left[key], right[key]
+        if isinstance(a, float) and isinstance(b, float) and math.isnan(a) and math.isnan(b):
+            continue
+        if repr(a) != repr(b):
+            return False
+    return True
+
+
+def make_analyzer() -> SignalAnalyzer:
+    analyzer = SignalAnalyzer(None, None)
+    analyzer.indicator_cache = IndicatorCache(max_entries=8)
+    return analyzer
+
+
+def test_hit_matches_fresh_calculation():
+    data = make_candles(np.random.default_rng(11), 300)
+    analyzer = make_analyzer()
+
+    first = analyzer._calculate_indicators('BTCUSDT', '1m', data)
+    cached = analyzer._calculate_indicators('BTCUSDT', '1m', data)
+    fresh = TechnicalIndicators().calculate_all_indicators(data)
+
+    stats = analyzer.indicator_cache.get_statistics()
+    assert stats['hits'] == 1 and stats['misses'] == 1
+    assert same_indicators(cached, fresh)
+    assert same_indicators(first, fresh)
+
+    # Изменение выданной копии не портит запись кэша
+    cached.clear()
+    again = analyzer._calculate_indicators('BTCUSDT', '1m', data)
+    assert same_indicators(again, fresh)
+
+
+def test_series_change_misses():
+    rng = np.random.default_rng(12)
+    data = make_candles(rng, 301)
+    analyzer = make_analyzer()
+    cache = analyzer.indicator_cache
+
+    analyzer._calculate_indicators('ETHUSDT', '5m', data.iloc[:-1].copy())
+
+    # Обновление последней свечи потока
+    updated = data.iloc[:-1].copy()
+    updated.loc[updated.index[-1], 'close'] *= 1.001
+    result = analyzer._calculate_indicators('ETHUSDT', '5m', updated)
+    assert cache.stats['misses'] == 2 and cache.stats['invalidations'] == 1
+    assert same_indicators(result, TechnicalIndicators().calculate_all_indicators(updated))
+
+    # Новая свеча
+    result = analyzer._calculate_indicators('ETHUSDT', '5m', data)
+    assert cache.stats['misses'] == 3 and cache.stats['invalidations'] == 2
+    assert cache.stats['hits'] == 0
+    assert same_indicators(result, TechnicalIndicators().calculate_all_indicators(data))
+
@@ -0,0 +1,40 @@
+"""
+Порядок стадий задержки совпадает с реальным конвейером
+"""
+
+from latency import (
+    LatencyTracker, LATENCY_STAGES, CANDLE_STAGES, SIGNAL_STAGES,
+    STAGE_EXCHANGE_EVENT, STAGE_STRATEGY_DONE, STAGE_DELIVERED, STAGE_PERSISTED
+)
+
+
+def test_signal_stages_follow_pipeline_order():
+    # bot_control сохраняет сигнал в базу только после успешной доставки
+    assert SIGNAL_STAGES == [STAGE_DELIVERED, STAGE_PERSISTED]
+    assert LATENCY_STAGES.index(STAGE_DELIVERED) < LATENCY_STAGES.index(STAGE_PERSISTED)
+    assert LATENCY_STAGES[-len(SIGNAL_STAGES):] == SIGNAL_STAGES
+    assert LATENCY_STAGES[1:1 + len(CANDLE_STAGES)] == CANDLE_STAGES
+
+
+def test_stage_deltas_are_measured_from_previous_stage():
+    tracker = LatencyTracker(window=8)
+    timestamps = {
+        STAGE_EXCHANGE_EVENT: 100.0,
+        'received': 100.010,
+        'decoded': 100.012,
+        'indicators_done': 100.050,
+        STAGE_STRATEGY_DONE: 100.060,
+        STAGE_DELIVERED: 100.500,
+        STAGE_PERSISTED: 100.520
+    }
+
+    tracker.record(timestamps, '1m', CANDLE_STAGES)
+    tracker.record(timestamps, '1m', SIGNAL_STAGES)
+    histograms = tracker.get_histograms()
+
+    deltas = {stage: round(summary['p50'], 3) for stage, summary in histograms['stage_deltas'].items()}
+    assert deltas == {
+        'received': 10.0, 'decoded': 2.0, 'indicators_done': 38.0, 'strategy_done': 10.0,
+        'delivered': 440.0, 'persisted': 20.0
+    }
+    assert round(histograms['stages'][STAGE_PERSISTED]['p50'], 3) == 520.0
@@ -0,0 +1,91 @@
+"""
+Попадание в кэш предсказаний отличается от расчета без кэша не больше документированной ошибки
+"""
+
+import asyncio
+
+import numpy as np
+
+from ai_features import FEATURE_COUNT, FEATURE_INDEX
+from ai_model import AIPredictor, LogisticModel, train_model_snapshot
+from globals import AI_MODEL_CONFIG
+from prediction_cache import PredictionCache
+
+KEYS = [('BTCUSDT', '1m'), ('ETHUSDT', '5m'), ('SOLUSDT', '1h')]
+
+# Доля базового предсказания в итоговом (AIPredictor.predict)
+BASE_WEIGHT = 0.6
+
+
+def base_features(rng: np.random.Generator, rows: int) -> np.ndarray:
+    features = rng.normal(0, 1, (rows, FEATURE_COUNT))
+    close = rng.uniform(50, 150, rows)
+    features[:, FEATURE_INDEX['close']] = close
+    features[:, FEATURE_INDEX['high']] = close * 1.01
+    features[:, FEATURE_INDEX['low']] = close * 0.99
+    features[:, FEATURE_INDEX['volume']] = close * rng.uniform(100, 1000, rows)
+    features[:, FEATURE_INDEX['rsi']] = rng.uniform(0, 100, rows)
+    return features
+
+
+def trained_model(rng: np.random.Generator) -> LogisticModel:
+    features = base_features(rng, 2000)
+    labels = (features[:, FEATURE_INDEX['macd']] + rng.normal(0, 0.5, len(features)) > 0).astype(float)
+    return LogisticModel.from_dict(train_model_snapshot(features, labels, AI_MODEL_CONFIG)['model'])
+
+
+def test_cached_predictions_stay_within_documented_error(fixed_time_correction):
+    rng = np.random.default_rng(5)
+    model = trained_model(rng)
+
+    cache = PredictionCache({'tolerance': 0.001, 'max_entries': 1024, 'verify_every': 1})
+    cached = AIPredictor()
+    cached.prediction_cache = cache
+    cached.registry.publish(model.copy(), 'test')
+
+    uncached = AIPredictor()
+    uncached.prediction_cache = None
+    uncached.registry.publish(model.copy(), 'test')
+
+    features = base_features(rng, len(KEYS))
+    differences = []
+
+    async def run():
+        for _ in range(200):
+            # Малые колебания признаков между циклами: большинство строк остается в своей ячейке
+            jittered = features * (1 + rng.uniform(-1e-4, 1e-4, features.shape))
+            for row, (pair, timeframe) in enumerate(KEYS):
+                expected = await uncached.predict(jittered[row], pair, timeframe)
+                actual = await cached.predict(jittered[row], pair, timeframe)
+                differences.append(abs(actual - expected))
+
+    asyncio.run(run())
+
+    stats = cache.get_statistics()
+    bound = cache.max_hit_error(model)
+
+    assert stats['hit_rate'] > 0.5
+    assert stats['verified'] > 0
+    assert stats['max_error'] <= bound
+    assert max(differences) <= BASE_WEIGHT * bound + 1e-12
+    # Ошибка действительно возникает - иначе проверка границы ничего не доказывает
+    assert max(differences) > 0.0
+
+
+def test_identical_features_hit_exactly(fixed_time_correction):
+    rng = np.random.default_rng(6)
+    cached = AIPredictor()
+    cached.prediction_cache = PredictionCache({'tolerance': 0.001, 'max_entries': 16, 'verify_every': 0})
+    uncached = AIPredictor()
+    uncached.prediction_cache = None
+
+    features = base_features(rng, 1)[0]
+
+    async def run():
+        first = await cached.predict(features, *KEYS[0])
+        second = await cached.predict(features, *KEYS[0])
+        return first, second, await uncached.predict(features, *KEYS[0])
+
+    first, second, expected = asyncio.run(run())
+    assert first == second == expected
+    assert cached.prediction_cache.get_statistics()['hits'] == 1
@@ -0,0 +1,80 @@
+"""
+Агрегаты кольцевого буфера истории совпадают с пересчетом по полному списку результатов
+"""
+
+import numpy as np
+import pytest
+
+from prediction_history import PredictionHistory
+
+CAPACITY = 50
+RECENT_WINDOW = 10
+
+
+def check_aggregates(history: PredictionHistory, results: list):
+    tail = results[-CAPACITY:]
+    accuracies = [accuracy for _, _, _, accuracy, _, _ in tail]
+    errors = [error for _, _, _, _, error, _ in tail]
+    recent = accuracies[-RECENT_WINDOW:]
+
+    assert len(history) == len(tail)
+    assert history.total == len(results)
+    assert history.mean_accuracy() == pytest.approx(sum(accuracies) / len(tail), abs=1e-12)
+    assert history.mean_error() == pytest.approx(sum(errors) / len(tail), abs=1e-12)
+    assert history.recent_accuracy() == pytest.approx(sum(recent) / len(recent), abs=1e-12)
+
+    for offset in {1, min(2, len(tail)), min(RECENT_WINDOW, len(tail)), len(tail)}:
+        assert history.last_accuracy(offset) == accuracies[-offset]
+    assert history.last_accuracy(len(tail) + 1) is None
+
+    records = history.to_array()
+    assert records['accuracy'].tolist() == accuracies
+    assert records['error'].tolist() == errors
+    assert records['timestamp'].tolist() == [timestamp for timestamp, *_ in tail]
+    assert records['key'].tolist() == [key for *_, key in tail]
+
+
+def random_result(rng: np.random.Generator, index: int) -> tuple:
+    prediction, actual = rng.uniform(0, 1, 2)
+    error = abs(prediction - actual)
+    return float(index), float(prediction), float(actual), 1.0 - error, error, int(rng.integers(0, 5))
+
+
+def test_aggregates_match_full_list():
+    rng = np.random.default_rng(21)
+    history = PredictionHistory(CAPACITY, RECENT_WINDOW)
+    results = []
+
+    assert history.mean_accuracy() == 0.0 and history.recent_accuracy() == 0.0
+    assert history.last_accuracy() is None
+
+    # Несколько оборотов буфера, проверка на каждом шаге
+    for index in range(CAPACITY * 4 + 7):
+        result = random_result(rng, index)
+        history.append(*result)
+        results.append(result)
+        check_aggregates(history, results)
+
+
+@pytest.mark.parametrize('loaded', [7, CAPACITY, CAPACITY * 2 + 3])
+def test_extend_matches_full_list(loaded):
+    rng = np.random.default_rng(22 + loaded)
+    source = PredictionHistory(CAPACITY * 3, RECENT_WINDOW)
+    results = []
+    for index in range(loaded):
+        result = random_result(rng, index)
+        source.append(*result)
+        results.append(result)
+
+    history = PredictionHistory(CAPACITY, RECENT_WINDOW)
+    history.extend(source.to_array())
+    # Счетчик total после загрузки равен числу загруженных записей
+    check_aggregates(history, results[-CAPACITY:])
+
+    # Добавления после загрузки продолжают кольцо с правильной позиции
+    loaded_results = results[-CAPACITY:]
+    for index in range(loaded, loaded + CAPACITY + 5):
+        result = random_result(rng, index)
+        history.append(*result)
+        loaded_results.append(result)
+        check_aggregates(history, loaded_results)
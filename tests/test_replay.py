@@ -0,0 +1,62 @@
+"""
+Воспроизведение записанного потока: окно серии и задержки стадий анализа
+"""
+
+import asyncio
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('aiohttp')
+pytest.importorskip('websockets')
+
+from conftest import make_candles
+from latency import LatencyTracker, CANDLE_STAGES, STAGE_STRATEGY_DONE, stamp
+from replay import FeedRecorder, ReplayWebSocket
+from websocket import HISTORY_CANDLES
+
+
+def test_replay_keeps_live_window_and_reports_stage_latency(tmp_path):
+    rng = np.random.default_rng(0)
+    candles = make_candles(rng, HISTORY_CANDLES)
+
+    recorder = FeedRecorder(str(tmp_path / 'feed.qpf'), ['BTCUSDT'], ['1m'])
+    recorder.open()
+    recorder.record_snapshot({'BTCUSDT': {'1m': candles}})
+
+    # Каждое второе событие открывает новую свечу
+    timestamp = candles['timestamp'].iloc[-1]
+    for i in range(2 * HISTORY_CANDLES):
+        if i % 2:
+            timestamp += pd.Timedelta(minutes=1)
+        price = 100.0 + i
+        recorder.record_update('BTCUSDT', '1m', timestamp, price, price + 1, price - 1, price, 1.0)
+    recorder.close()
+
+    replay = ReplayWebSocket(recorder.filepath, speed=0)
+    tracker = LatencyTracker()
+    replay.attach_latency_tracker(tracker)
+
+    async def run():
+        await replay._fetch_historical_data()
+        await replay.start_data_stream()
+
+        # Стадии анализа, как их отмечает SignalAnalyzer для серии цикла
+        data = replay.get_market_data()['BTCUSDT']['1m']
+        timestamps = dict(data.attrs['latency'])
+        stamp(timestamps, 'indicators_done')
+        stamp(timestamps, STAGE_STRATEGY_DONE)
+        tracker.record(timestamps, '1m', CANDLE_STAGES)
+
+    asyncio.run(run())
+
+    data = replay.get_market_data()['BTCUSDT']['1m']
+    assert len(data) == HISTORY_CANDLES
+    assert data['timestamp'].iloc[-1] == timestamp
+    assert data['close'].iloc[-1] == 100.0 + 2 * HISTORY_CANDLES - 1
+    assert data['timestamp'].is_monotonic_increasing
+
+    stats = replay.get_replay_statistics()
+    assert stats['events_replayed'] == 2 * HISTORY_CANDLES
+    assert stats['latency_ms']['stages'][STAGE_STRATEGY_DONE]['count'] == 1
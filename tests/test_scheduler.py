@@ -0,0 +1,43 @@
+"""
+Планировщик отмечает проанализированными только серии, прошедшие стадию стратегии
+"""
+
+import asyncio
+
+import numpy as np
+
+import signal_analyzer
+from conftest import make_candles
+from scheduler import AnalysisScheduler, TRIGGER_FIRST_RUN
+from signal_analyzer import SignalAnalyzer
+
+
+def test_only_evaluated_series_are_recorded(monkeypatch):
+    monkeypatch.setattr(signal_analyzer, 'TRADING_PAIRS', ['BTCUSDT', 'ETHUSDT'])
+    monkeypatch.setattr(signal_analyzer, 'TIMEFRAMES', ['1m'])
+
+    rng = np.random.default_rng(0)
+    market_data = {
+        'BTCUSDT': {'1m': make_candles(rng, 300)},
+        # Короткая история: серия отбрасывается анализатором до расчета индикаторов
+        'ETHUSDT': {'1m': make_candles(rng, 50)}
+    }
+
+    scheduler = AnalysisScheduler()
+    analyzer = SignalAnalyzer(None, None)
+
+    due = scheduler.select_due(market_data)
+    assert set(scheduler.get_order()) == {('BTCUSDT', '1m'), ('ETHUSDT', '1m')}
+
+    asyncio.run(analyzer.analyze_all_pairs(due, order=scheduler.get_order()))
+    scheduler.record_cycle(0.1, analyzer.last_analyzed, analyzer.last_deferred)
+
+    assert analyzer.last_analyzed == [('BTCUSDT', '1m')]
+    assert ('BTCUSDT', '1m') in scheduler.series_state
+    assert ('ETHUSDT', '1m') not in scheduler.series_state
+    assert scheduler.timeframe_stats['1m']['failed'] == 1
+
+    # Непроанализированная серия остается к анализу в следующем цикле
+    scheduler.select_due(market_data)
+    assert scheduler.pending[('ETHUSDT', '1m')][0] == TRIGGER_FIRST_RUN
+    assert ('BTCUSDT', '1m') not in scheduler.pending
@@ -0,0 +1,48 @@
+"""
+Лимит задержки теневых моделей действует на весь цикл анализа
+"""
+
+import time
+
+import numpy as np
+
+from ai_features import FEATURE_COUNT
+from ai_model import AIPredictor
+from shadow_models import ShadowModels
+
+
+class SlowPredictor:
+    """Теневая модель с фиксированным временем оценки"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.historical_data = {}
+
+    def predict_batch(self, features, keys):
+        time.sleep(self.delay)
+        return np.full(len(keys), 0.6)
+
+
+def test_latency_cap_is_shared_by_all_calls_in_cycle():
+    config = {'enabled': True, 'latency_cap_ms': 20.0, 'outcome_window': 16, 'models': []}
+    shadows = ShadowModels(AIPredictor(), config)
+    shadows.register('slow', SlowPredictor(0.002))
+
+    features = np.zeros((1, FEATURE_COUNT))
+    keys = [('BTCUSDT', '1m')]
+
+    for _ in range(3):
+        shadows.begin_cycle()
+        started = time.perf_counter()
+        # Скалярный путь: score вызывается для каждой серии цикла
+        scored = sum(bool(shadows.score(features, keys, np.array([0.5]))) for _ in range(40))
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        assert 0 < scored < 40
+        # Добавка ограничена лимитом цикла (с запасом на одну оценку и планировщик ОС)
+        assert elapsed_ms < 2 * config['latency_cap_ms']
+
+    stats = shadows.get_statistics()['models']['slow']
+    assert stats['cycles'] == 3
+    assert stats['skipped_cycles'] == 3
+    assert not stats['disabled']
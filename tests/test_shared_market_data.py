@@ -0,0 +1,43 @@
+"""
+Сегмент разделяемой памяти принадлежит одному экземпляру и отдает согласованные снимки
+"""
+
+import numpy as np
+import pytest
+
+from conftest import make_candles
+from shared_market_data import SharedCandleStore, segment_name
+
+
+def test_segment_is_not_replaced_by_second_instance():
+    store = SharedCandleStore.create(['BTCUSDT'], ['1m'], capacity=64)
+    try:
+        assert store.name.endswith(segment_name())
+
+        candles = make_candles(np.random.default_rng(0), 100)
+        store.write_frame('BTCUSDT', '1m', candles)
+
+        # Второй экземпляр с тем же именем не должен удалить живой сегмент
+        with pytest.raises(FileExistsError):
+            SharedCandleStore.create(['BTCUSDT'], ['1m'], capacity=64, name=segment_name())
+
+        frame = store.read_frame('BTCUSDT', '1m')
+        assert len(frame) == 64
+        assert np.array_equal(frame['close'].to_numpy(), candles['close'].to_numpy()[-64:])
+    finally:
+        store.close()
+
+
+def test_failed_snapshot_reads_are_counted():
+    store = SharedCandleStore.create(['BTCUSDT'], ['1m'], capacity=16, name=f"{segment_name()}_reads")
+    try:
+        store.write_frame('BTCUSDT', '1m', make_candles(np.random.default_rng(1), 16))
+
+        # Нечетная версия - писатель не завершил запись
+        store.series_table[0, 1] += 1
+        assert store.read_snapshot('BTCUSDT', '1m', retries=5) is None
+
+        reads = store.get_statistics()['reads']
+        assert reads == {'reads': 1, 'retries': 4, 'failed_reads': 1}
+    finally:
+        store.close()
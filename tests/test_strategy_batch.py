@@ -0,0 +1,87 @@
+"""
+Пакетная оценка стратегии должна давать те же сигналы, что и оценка по сериям
+"""
+
+import asyncio
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import strip_signal
+from signal_analyzer import SignalAnalyzer
+
+# Диапазоны индикаторов, при которых срабатывают все уровни стратегии
+INDICATOR_RANGES = {
+    'volume_tsunami': (0, 5), 'roc': (-1, 2), 'atr': (0, 1), 'tsunami_strength': (0, 3),
+    'macd_histogram': (-1, 1), 'vwap_gradient': (-0.01, 0.02), 'quantum_rsi': (20, 80),
+    'bb_position': (-0.2, 1.2), 'volume_ratio': (0, 3), 'rsi': (10, 90), 'macd': (-2, 2),
+    'neural_macd': (-1, 1), 'stoch_k': (0, 100), 'williams_r': (-100, 0), 'cci': (-200, 200),
+    'adx': (0, 60), 'rsi_divergence': (0, 1)
+}
+FLAG_INDICATORS = ('stoch_crossover', 'bb_squeeze', 'volume_tsunami_signal')
+
+
+def random_indicators(rng: np.random.Generator) -> dict:
+    """Индикаторы с пропусками (NaN) и отсутствующими ключами"""
+    indicators = {name: rng.uniform(low, high) for name, (low, high) in INDICATOR_RANGES.items()}
+    indicators.update({name: int(rng.integers(0, 2)) for name in FLAG_INDICATORS})
+
+    for name in list(indicators):
+        draw = rng.random()
+        if draw < 0.03:
+            indicators[name] = float('nan')
+        elif draw < 0.08:
+            del indicators[name]
+    return indicators
+
+
+def random_tail(rng: np.random.Generator) -> pd.DataFrame:
+    """Хвост серии разной длины, иногда с пропущенными ценами"""
+    length = int(rng.choice([5, 25, 60]))
+    close = 100 * np.cumprod(1 + rng.normal(0, 0.004, length))
+    high = close * 1.002
+    low = close * 0.998
+    if rng.random() < 0.05:
+        close[-1] = np.nan
+    if rng.random() < 0.05:
+        high[-3] = np.nan
+    return pd.DataFrame({'open': close, 'high': high, 'low': low, 'close': close,
+                         'volume': rng.uniform(1, 10, length)})
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_batch_matches_scalar_path(seed, fixed_time_correction, caplog):
+    rng = np.random.default_rng(seed)
+    analyzer = SignalAnalyzer(None, None)
+
+    async def run():
+        produced = 0
+        for _ in range(20):
+            entries = [
+                (f'P{i}', '1h' if i % 2 else '5m', random_tail(rng), random_indicators(rng), {})
+                for i in range(40)
+            ]
+
+            analyzer.feature_matrix.reset()
+            for pair, timeframe, data, indicators, _ in entries:
+                analyzer.feature_matrix.add(pair, timeframe, data, indicators)
+
+            scalar = [
+                await analyzer._evaluate_series(pair, timeframe, data, indicators, dict(timestamps))
+                for pair, timeframe, data, indicators, timestamps in entries
+            ]
+            batch = await analyzer._evaluate_batch([
+                (pair, timeframe, data, indicators, dict(timestamps))
+                for pair, timeframe, data, indicators, timestamps in entries
+            ])
+
+            expected = [strip_signal(signal) for signal in scalar if signal]
+            assert [strip_signal(signal) for signal in batch] == expected
+            produced += len(expected)
+        return produced
+
+    # Сравнение не имеет смысла, если ни одна серия не дала сигнала
+    assert asyncio.run(run()) > 0
+    # Пакетный путь при ошибке переходит на скалярный - это не должно маскировать расхождения
+    assert 'Ошибка пакетной оценки' not in caplog.text
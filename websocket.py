@@ -6,6 +6,7 @@
 import asyncio
 import logging
 import json
+import time
 import websockets
 import pandas as pd
 from datetime import datetime, timedelta
@@ -13,10 +14,14 @@ from typing import Dict, List, Any, Optional
 import aiohttp
 from urllib.parse import urlencode
 
-from globals import BINANCE_WS_URL, TRADING_PAIRS, TIMEFRAMES, SAFETY_LIMITS
+from globals import BINANCE_WS_URL, TRADING_PAIRS, TIMEFRAMES, SAFETY_LIMITS, SHARED_MEMORY_CONFIG
+from latency import STAGE_EXCHANGE_EVENT, STAGE_RECEIVED, STAGE_DECODED
 
 logger = logging.getLogger(__name__)
 
+# Окно свечей серии: столько загружается при старте и хранится в памяти
+HISTORY_CANDLES = 500
+
 class BinanceWebSocket:
     def __init__(self):
         self.ws_url = BINANCE_WS_URL
@@ -25,6 +30,8 @@ class BinanceWebSocket:
         self.connections = {}
         self.market_data = {}
         self.is_running = False
+        self.recorder = None
+        self.shared_store = None
         
         # Инициализация структуры данных
         self._initialize_market_data()
@@ -46,6 +53,17 @@ class BinanceWebSocket:
             # Получение исторических данных
             await self._fetch_historical_data()
             
+            # Запись снимка исторических данных
+            if self.recorder:
+                self.recorder.record_snapshot(self.market_data)
+                
+            # Зеркало свечей в разделяемой памяти для рабочих процессов
+            if SHARED_MEMORY_CONFIG['enabled']:
+                from shared_market_data import SharedCandleStore
+                
+                self.shared_store = SharedCandleStore.create(self.pairs, self.timeframes)
+                self.shared_store.write_all(self.market_data)
+            
             # Создание WebSocket соединений
             await self._create_websocket_connections()
             
@@ -87,7 +105,7 @@ class BinanceWebSocket:
                 }.get(pair, 100)
                 
                 for timeframe in self.timeframes:
-                    # Генерация 500 исторических свечей
+                    # Генерация исторических свечей
                     df_data = []
                     current_time = datetime.now()
                     
@@ -104,7 +122,7 @@ class BinanceWebSocket:
                     
                     price = base_price
                     
-                    for i in range(500):
+                    for i in range(HISTORY_CANDLES):
                         # Генерация случайного движения цены
                         price_change = random.uniform(-0.05, 0.05)  # ±5%
                         price = price * (1 + price_change)
@@ -143,7 +161,7 @@ class BinanceWebSocket:
             params = {
                 'symbol': pair,
                 'interval': timeframe,
-                'limit': 500
+                'limit': HISTORY_CANDLES
             }
             
             url = f"{base_url}?{urlencode(params)}"
@@ -217,6 +235,9 @@ class BinanceWebSocket:
                             df = self.market_data[pair][timeframe]
                             
                             if len(df) > 0:
+                                # В симуляции биржевое событие совпадает с моментом получения
+                                event_ts = time.time()
+                                
                                 # Получение последней свечи
                                 last_candle = df.iloc[-1].copy()
                                 
@@ -230,6 +251,8 @@ class BinanceWebSocket:
                                 df.iloc[-1, df.columns.get_loc('low')] = min(last_candle['low'], new_close)
                                 df.iloc[-1, df.columns.get_loc('volume')] = last_candle['volume'] + random.uniform(10, 100)
                                 
+                                self._on_candle_update(pair, timeframe, df, event_ts, event_ts)
+                                
                                 logger.debug(f"📊 Симуляция обновления: {pair} {timeframe} - {new_close:.4f}")
                 
                 # Пауза между обновлениями
@@ -239,6 +262,36 @@ class BinanceWebSocket:
             logger.error(f"Ошибка симуляции обновления данных: {e}")
             self.is_running = False
             
+    def _on_candle_update(self, pair: str, timeframe: str, df: pd.DataFrame, exchange_ts: float, received_ts: float):
+        """Общая обработка обновления свечи: запись, разделяемая память, отметки времени"""
+        if self.recorder:
+            self._record_last_candle(pair, timeframe, df)
+            
+        if self.shared_store:
+            self.shared_store.update_series(pair, timeframe, df)
+            
+        self._stamp_update(df, exchange_ts, received_ts)
+        
+    def _stamp_update(self, df: pd.DataFrame, exchange_ts: float, received_ts: float):
+        """Отметки времени последнего обновления свечи (переносятся вместе с DataFrame)"""
+        df.attrs['latency'] = {
+            STAGE_EXCHANGE_EVENT: exchange_ts,
+            STAGE_RECEIVED: received_ts,
+            STAGE_DECODED: time.time()
+        }
+        
+    def attach_recorder(self, recorder):
+        """Подключение записи сырых событий потока"""
+        self.recorder = recorder
+        
+    def _record_last_candle(self, pair: str, timeframe: str, df: pd.DataFrame):
+        """Запись текущего состояния последней свечи"""
+        candle = df.iloc[-1]
+        self.recorder.record_update(
+            pair, timeframe, candle['timestamp'],
+            candle['open'], candle['high'], candle['low'], candle['close'], candle['volume']
+        )
+        
     def get_market_data(self) -> Dict[str, Dict[str, pd.DataFrame]]:
         """Получение рыночных данных"""
         return self.market_data.copy()
@@ -285,6 +338,13 @@ class BinanceWebSocket:
                     
             self.connections.clear()
             
+            if self.recorder:
+                self.recorder.close()
+                
+            if self.shared_store:
+                self.shared_store.close()
+                self.shared_store = None
+            
             logger.info("✅ Все WebSocket соединения закрыты")
             
         except Exception as e:
@@ -297,7 +357,8 @@ class BinanceWebSocket:
             'connections_count': len(self.connections),
             'pairs_count': len(self.pairs),
             'timeframes_count': len(self.timeframes),
-            'total_streams': len(self.pairs) * len(self.timeframes)
+            'total_streams': len(self.pairs) * len(self.timeframes),
+            'shared_memory': self.shared_store.get_statistics() if self.shared_store else None
         }
         
     def get_data_statistics(self) -> Dict[str, Any]: